@@ -0,0 +1,59 @@
+"""Measure how the time to get a letter's contact details scales with resume size.
+
+Compares reading only `<contact>` (what `stitch letter` does) with parsing
+the full resume, and times building the letter's TeX as a whole.
+
+Usage: python benchmarks/bench_contact.py [--sizes N,N,...] [--repeat N]
+"""
+
+import argparse
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from synthetic import resume_xml
+from stitchjob.stitch_letter import stitch_letter
+from stitchjob.stitch_resume import Contact, Resume
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000,100000",
+                        help="comma-separated numbers of bullets")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    letter = Path(__file__).parent.parent / "tests/data/letter.md"
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "letter.md").write_bytes(letter.read_bytes())
+        print(f"{'bullets':>8} {'size':>9} {'contact':>10} {'full parse':>11} {'letter':>10}")
+        for bullets in (int(n) for n in args.sizes.split(",")):
+            resume = tmp / "resume.xml"
+            resume.write_text(resume_xml(bullets), encoding="utf-8")
+            contact = best(lambda: Contact(resume), args.repeat)
+            full = best(lambda: Resume(resume).contact, args.repeat)
+            build = best(lambda: stitch_letter(letter_args(tmp)), args.repeat)
+            print(f"{bullets:8} {resume.stat().st_size / 1e6:7.2f} MB "
+                  f"{contact * 1e3:7.2f} ms {full * 1e3:8.1f} ms {build * 1e3:7.1f} ms")
+
+def letter_args(tmp: Path) -> argparse.Namespace:
+    return argparse.Namespace(input=tmp / "letter.md", resume=tmp / "resume.xml",
+                              signature=False, signature_image=None, output=None,
+                              template_dir=None, pdf=False, openpdf=False, force=True,
+                              cache_stats=False, draft=False)
+
+def best(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+if __name__ == "__main__":
+    main()
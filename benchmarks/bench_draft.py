@@ -0,0 +1,50 @@
+"""Compare pdflatex compile times of draft and final builds.
+
+Usage: python benchmarks/bench_draft.py [--repeat N] [RESUME_XML]
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from stitchjob.latex_format import tex_version
+from stitchjob.shared import compile_pdf, latex_metadata
+from stitchjob.stitch_resume import Resume, ensure_latex_class_available
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("resume", nargs="?",
+                        default=Path(__file__).parent.parent / "resume/example.xml")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if tex_version() is None:
+        sys.exit("pdflatex is not available")
+
+    resume = Resume(Path(args.resume))
+    times = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, draft in (("final", False), ("draft", True)):
+            tex_path = Path(tmp) / f"{mode}.tex"
+            tex_path.write_text(latex_metadata(draft) + resume.to_latex(), encoding="utf-8")
+            ensure_latex_class_available(tex_path)
+            times[mode] = timed(lambda: compile_pdf(tex_path), args.repeat)
+
+    print(f"final compile: {times['final']:.3f} s")
+    print(f"draft compile: {times['draft']:.3f} s "
+          f"({times['final'] / times['draft']:.1f}x)")
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Measure `escape_tex()` throughput on the bullets of a synthetic resume.
+
+Usage: python benchmarks/bench_escape.py [--bullets N] [--repeat N]
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from synthetic import resume_xml
+from stitchjob.shared import escape_tex
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bullets", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    root = ET.fromstring(resume_xml(args.bullets))
+    texts = [item.text for item in root.iter("item")]
+    size = sum(len(text) for text in texts)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for text in texts:
+            escape_tex(text, smarten_quotes=True)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"{len(texts)} bullets, {size / 1e6:.2f} MB: "
+          f"{best * 1e3:.1f} ms, {len(texts) / best:,.0f} bullets/s, "
+          f"{size / best / 1e6:.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
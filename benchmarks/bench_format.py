@@ -0,0 +1,58 @@
+"""Compare pdflatex compile times with and without a precompiled format.
+
+Usage: python benchmarks/bench_format.py [--repeat N] [RESUME_XML]
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from stitchjob.latex_format import ensure_format, tex_version
+from stitchjob.shared import compile_pdf, latex_metadata
+from stitchjob.stitch_resume import (RESUME_LATEX_CLASS, Resume,
+                                     ensure_latex_class_available, resume_preamble)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("resume", nargs="?",
+                        default=Path(__file__).parent.parent / "resume/example.xml")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if tex_version() is None:
+        sys.exit("pdflatex is not available")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tex_path = Path(tmp) / "resume.tex"
+        with tex_path.open("w", encoding="utf-8") as out:
+            out.write(latex_metadata())
+            Resume(Path(args.resume)).write_latex(out, format_marker=True)
+        ensure_latex_class_available(tex_path)
+
+        start = time.perf_counter()
+        fmt_path = ensure_format("stitched", resume_preamble(), [RESUME_LATEX_CLASS])
+        dump = time.perf_counter() - start
+        if fmt_path is None:
+            sys.exit("Cannot precompile the format")
+
+        cold = timed(lambda: compile_pdf(tex_path), args.repeat)
+        cached = timed(lambda: compile_pdf(tex_path, fmt_path), args.repeat)
+
+    print(f"format dump (one-time): {dump:.3f} s")
+    print(f"cold compile:           {cold:.3f} s")
+    print(f"format-cached compile:  {cached:.3f} s ({cold / cached:.1f}x)")
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure the memory held by a parsed resume and by variants selected from it.
+
+Parses a synthetic resume with tagged bullets, then selects several variants
+from it with `--select` queries, and reports the memory still allocated
+(measured with tracemalloc) for the master, for its selection index, and for
+each variant on top of them.
+Variants share the parts they keep with the master, so they should cost far
+less than the master does.
+
+Usage: python benchmarks/bench_memory.py [--bullets N,N,...] [--variants N]
+"""
+
+import argparse
+import gc
+import logging
+from pathlib import Path
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from synthetic import TAGS, resume_xml
+from stitchjob.selection import resume_index, select_resume
+from stitchjob.stitch_resume import Resume
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bullets", default="1000,10000,100000",
+                        help="comma-separated resume sizes in bullets")
+    parser.add_argument("--variants", type=int, default=len(TAGS),
+                        help=f"number of variants to select (default: {len(TAGS)})")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'bullets':>8} {'xml':>9} {'master':>10} {'per bullet':>11} {'index':>10} "
+          f"{'per variant':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "resume.xml"
+        for bullets in (int(n) for n in args.bullets.split(",")):
+            path.write_text(resume_xml(bullets, tags=0.8), encoding="utf-8")
+            master, resume = retained(lambda: Resume(path))
+            index, _ = retained(lambda: resume_index(resume))
+            queries = [TAGS[n % len(TAGS)] for n in range(args.variants)]
+            variants, _ = retained(lambda: [select_resume(resume, q) for q in queries])
+            print(f"{bullets:8} {path.stat().st_size / 1e6:7.2f} MB "
+                  f"{master / 1e6:7.2f} MB {master / bullets:9.0f} B "
+                  f"{index / 1e6:7.2f} MB "
+                  f"{variants / max(args.variants, 1) / 1e6:9.3f} MB")
+
+def retained(func) -> tuple[int, object]:
+    """Return the memory still allocated after calling FUNC, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Measure cold start time of `stitch` subcommands.
+
+Usage: python benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+COMMANDS = {
+    "stitch resume --help": ["resume", "--help"],
+    "stitch resume": ["resume", "{dir}/resume.xml"],
+    "stitch letter": ["letter", "{dir}/letter.md", "-r", "{dir}/resume.xml"],
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    data = Path(__file__).parent.parent / "tests/data"
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("resume.xml", "letter.md"):
+            (Path(tmp) / name).write_bytes((data / name).read_bytes())
+        for label, argv in COMMANDS.items():
+            argv = [arg.format(dir=tmp) for arg in argv]
+            wall = min(run(argv) for _ in range(args.repeat))
+            imports = import_time(argv)
+            print(f"{label:24} {wall * 1e3:6.1f} ms wall, {imports / 1e3:6.1f} ms importing")
+
+def run(argv: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "stitchjob.stitch", *argv],
+                   check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def import_time(argv: list[str]) -> int:
+    """Return microseconds spent importing modules, per `python -X importtime`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "stitchjob.stitch", *argv],
+                            check=True, capture_output=True, text=True)
+    return sum(int(line.split("|")[0].split(":")[1])
+               for line in result.stderr.splitlines()
+               if line.startswith("import time:") and "self [us]" not in line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Run the benchmark suite on synthetic resumes and letters of several sizes.
+
+For each size, measures the best time over several runs and the peak Python
+memory of parsing (`Resume()`), `to_latex()`, `escape_tex()` on every bullet,
+`render_tex()` of a letter, and end-to-end `stitch resume` and `stitch letter`
+builds (without PDF). Results are printed as a table and can be written as
+JSON and compared with an earlier run, to track regressions across releases.
+
+Usage: python benchmarks/run.py [--bullets N,N,...] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from synthetic import letter_md, resume_xml
+from stitchjob.shared import escape_tex
+from stitchjob.stitch_letter import Letter, load_template, render_tex, stitch_letter
+from stitchjob.stitch_resume import Resume, latex_fragment, latex_item, stitch_resume
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bullets", default="100,1000,10000",
+                        help="comma-separated resume sizes in bullets (default: 100,1000,10000)")
+    parser.add_argument("--sections", type=int, default=3,
+                        help="experience sections to spread the bullets over")
+    parser.add_argument("--per-experience", type=int, default=10,
+                        help="bullets per experience")
+    parser.add_argument("--specials", type=float, default=1.5,
+                        help="average LaTeX special characters per bullet")
+    parser.add_argument("--math", type=float, default=0.1,
+                        help="fraction of bullets with inline math")
+    parser.add_argument("--paragraphs", type=int, default=5,
+                        help="paragraphs in the letter")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", type=Path, help="write results as JSON to FILE")
+    parser.add_argument("--compare", type=Path, help="compare with results in FILE")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = {
+        "stitchjob": package_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "parameters": {key: val for key, val in vars(args).items()
+                       if key not in ("output", "compare")},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the snapshots and compiled templates out of the user's cache
+        os.environ["XDG_CACHE_HOME"] = str(Path(tmp) / "cache")
+        for bullets in (int(n) for n in args.bullets.split(",")):
+            run = run_suite(Path(tmp), bullets, args)
+            results["runs"].append(run)
+            print_run(run)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        print_comparison(json.loads(args.compare.read_text()), results)
+
+def run_suite(tmp: Path, bullets: int, args: argparse.Namespace) -> dict:
+    resume_path = tmp / "resume.xml"
+    resume_path.write_text(resume_xml(bullets, args.per_experience, args.sections,
+                                      args.specials, args.math), encoding="utf-8")
+    letter_path = tmp / "letter.md"
+    letter_path.write_text(letter_md(args.paragraphs, args.specials, args.math),
+                           encoding="utf-8")
+
+    resume = Resume(resume_path)
+    texts = [item for sec in resume.sections for exp in sec.children
+             for item in getattr(exp, "items", [])]
+    letter = Letter.from_file(letter_path)
+    letter.contact = resume.contact
+    template = load_template()
+
+    benchmarks = {
+        "parse": lambda: Resume(resume_path),
+        "to_latex": resume.to_latex,
+        "escape_tex": lambda: [escape_tex(text, smarten_quotes=True) for text in texts],
+        "render_tex": lambda: render_tex(letter, template),
+        "build_resume": lambda: stitch_resume(build_args(input=resume_path, precompile=False)),
+        "build_letter": lambda: stitch_letter(build_args(
+            input=letter_path, resume=resume_path, output=None, signature=False,
+            signature_image=None, template_dir=None)),
+    }
+    # Rendering is measured cold, as the fragment caches would otherwise
+    # answer every repeat after the first
+    setups = {"to_latex": clear_latex_caches, "build_resume": clear_latex_caches}
+    return {"bullets": bullets,
+            "xml_bytes": resume_path.stat().st_size,
+            "benchmarks": {name: measure(func, args.repeat, setups.get(name))
+                           for name, func in benchmarks.items()}}
+
+def build_args(**kwargs) -> argparse.Namespace:
+    # force=True so that the build cache doesn't skip the work after the first
+    # run, and snapshot=False so that the resume is parsed each time
+    return argparse.Namespace(pdf=False, openpdf=False, force=True, cache_stats=False,
+                              draft=False, snapshot=False, **kwargs)
+
+def clear_latex_caches() -> None:
+    latex_fragment.cache_clear()
+    latex_item.cache_clear()
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """Return the best time of REPEAT calls of FUNC and the peak memory of one,
+    calling SETUP, untimed, before each."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    # Measured separately, as tracing allocations slows everything down
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": peak}
+
+def print_run(run: dict) -> None:
+    print(f"{run['bullets']} bullets ({run['xml_bytes'] / 1e6:.2f} MB):")
+    for name, result in run["benchmarks"].items():
+        print(f"  {name:14} {result['seconds'] * 1e3:9.2f} ms "
+              f"{result['peak_bytes'] / 1e6:9.2f} MB peak")
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    print(f"Compared with {baseline.get('stitchjob')} ({baseline.get('date')}):")
+    old_runs = {run["bullets"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = old_runs.get(run["bullets"])
+        if old is None:
+            continue
+        print(f"{run['bullets']} bullets:")
+        for name, result in run["benchmarks"].items():
+            if name in old["benchmarks"]:
+                ratio = result["seconds"] / old["benchmarks"][name]["seconds"]
+                print(f"  {name:14} {ratio:6.2f}x time")
+
+def package_version() -> str:
+    try:
+        return version("stitchjob")
+    except PackageNotFoundError:
+        return "unknown"
+
+if __name__ == "__main__":
+    main()
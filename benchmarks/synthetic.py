@@ -0,0 +1,119 @@
+"""Generate synthetic resumes and letters for benchmarking.
+
+The resumes conform to `resume/schema/resume.dtd`: besides the experience
+sections holding the bullets, each has a summary, a skills section, and an
+education section, so that every kind of element gets parsed and rendered.
+"""
+
+import random
+from xml.sax.saxutils import escape
+
+WORDS = ("managed designed implemented documented reduced improved launched "
+         "pipeline platform release workflow onboarding latency throughput "
+         "customers engineers API cloud service team quarterly revenue "
+         "migration automation infrastructure analytics editorial").split()
+
+SPECIALS = ("30%", "$1M", "R&D", "C#", "snake_case", "~2x", "x^2", '"best"',
+            "'agile'")
+
+TAGS = ("python", "backend", "infra", "frontend", "data", "writing")
+
+MATH = (r"$\leftarrow$", r"$O(n \log n)$", r"$\sim$10k", r"$2^{10}$")
+
+def bullet(rng: random.Random, words: int = 18, specials: float = 1.5,
+           math: float = 0.1) -> str:
+    """Return a sentence of WORDS words.
+
+    On average, SPECIALS tokens contain LaTeX special characters, and a
+    fraction MATH of sentences contain an inline math span."""
+    tokens = [rng.choice(WORDS) for _ in range(words)]
+    for _ in range(rng.randint(0, round(2 * specials))):
+        tokens.insert(rng.randrange(len(tokens)), rng.choice(SPECIALS))
+    if rng.random() < math:
+        tokens.insert(rng.randrange(len(tokens)), rng.choice(MATH))
+    text = " ".join(tokens)
+    return text[0].upper() + text[1:] + "."
+
+def resume_xml(bullets: int = 10_000, per_experience: int = 10, sections: int = 1,
+               specials: float = 1.5, math: float = 0.1, seed: int = 0,
+               tags: float = 0.0) -> str:
+    """Return XML for a resume with BULLETS bullets.
+
+    The bullets are spread over experiences of PER_EXPERIENCE bullets each,
+    which are spread over SECTIONS sections. SPECIALS and MATH are passed on
+    to `bullet()`. A fraction TAGS of the bullets get one or two of `TAGS`."""
+    rng = random.Random(seed)
+    text = lambda words: escape(bullet(rng, words, specials, math))
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<!DOCTYPE resume SYSTEM "resume.dtd">',
+           "<resume>",
+           "  <contact>",
+           "    <name>Synthetic Person</name>",
+           "    <email>synthetic@example.com</email>",
+           "    <phone>555-555-0100</phone>",
+           "    <location>Anywhere, USA</location>",
+           "    <website>https://synthetic.example.com</website>",
+           "  </contact>",
+           '  <section heading="Summary">',
+           f"    <description>{text(60)}</description>",
+           "  </section>",
+           '  <section heading="Skills">',
+           "    <skills>"]
+    out += [f"      <skill>{text(3)}</skill>" for _ in range(8)]
+    out += ["    </skills>",
+            "  </section>"]
+
+    experiences = -(-bullets // per_experience)
+    per_section = -(-experiences // max(sections, 1))
+    for n in range(experiences):
+        if n % per_section == 0:
+            if n:
+                out.append("  </section>")
+            out.append(f'  <section type="professional" heading="Experience {n // per_section + 1}">')
+        out.append('    <experience begin="Jan. 2020" end="present">')
+        out.append(f"      <title>{text(3)}</title>")
+        out.append(f"      <organization>{text(2)}</organization>")
+        out.append("      <location>Remote</location>")
+        if rng.random() < 0.3:
+            out.append(f"      <blurb>{text(12)}</blurb>")
+        out.append("      <items>")
+        for _ in range(min(per_experience, bullets - n * per_experience)):
+            attrs = ""
+            if tags and rng.random() < tags:
+                attrs = f' tags="{" ".join(rng.sample(TAGS, rng.randint(1, 2)))}"'
+            out.append(f"        <item{attrs}>{text(18)}</item>")
+        out.append("      </items>")
+        out.append("    </experience>")
+    if experiences:
+        out.append("  </section>")
+
+    out += ['  <section type="education" heading="Education">',
+            "    <degree>",
+            "      <date>2015</date>",
+            "      <type>B.A.</type>",
+            f"      <field>{text(2)}</field>",
+            "      <school>Synthetic University</school>",
+            "      <location>Anywhere, USA</location>",
+            "    </degree>",
+            "  </section>",
+            "</resume>",
+            ""]
+    return "\n".join(out)
+
+def letter_md(paragraphs: int = 5, specials: float = 1.5, math: float = 0.1,
+              seed: int = 0) -> str:
+    """Return Markdown with YAML front matter for a letter of PARAGRAPHS paragraphs."""
+    rng = random.Random(seed)
+    out = ["---",
+           "recipient: Hiring Committee",
+           "salutation: Dear Hiring Manager,",
+           "company: Synthetic R&D",
+           "address: 1 Example Way",
+           "location: Anywhere, USA",
+           "closing: Best regards,",
+           "---",
+           ""]
+    for _ in range(paragraphs):
+        out.append(" ".join(bullet(rng, 18, specials, math) for _ in range(5)))
+        out.append("")
+    return "\n".join(out)
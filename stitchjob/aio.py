@@ -0,0 +1,161 @@
+"""Asyncio API for building resumes and letters from memory.
+
+Meant for embedding Stitchjob in a service: an `AsyncStitcher` takes the XML
+and Markdown as strings and returns the TeX and PDF as a `StitchOutput`.
+`pdflatex` runs as an asyncio subprocess in a private scratch directory,
+supervised like `run_supervised()` does for the command line: with the
+limits of `pdflatex_limits`, in its own process group, and keeping only the
+last lines of its output. At most `concurrency` compiles run at once, and a
+compile that times out or is cancelled kills its `pdflatex` process group.
+Rendering the TeX is quick and runs on the event loop.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+import hashlib
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Iterable, Mapping
+
+from stitchjob.shared import *
+from stitchjob.stitch_letter import Letter, load_template, render_tex
+from stitchjob.stitch_resume import RESUME_LATEX_CLASS, Resume
+
+RESUME_CACHE_SIZE = 16
+
+# Longest line of pdflatex output read at once
+LINE_LIMIT = 1024 * 1024
+
+@dataclass
+class StitchOutput:
+    tex: str
+    pdf: bytes | None = None
+
+class AsyncStitcher:
+    """Builds resumes and letters, compiling at most CONCURRENCY at a time.
+
+    A compile taking longer than TIMEOUT seconds is killed and raises
+    `CannotCompilePDFError`; 0 means no time limit, and None the timeout of
+    `pdflatex_limits` (`--latex-timeout`). The most recently used resumes are
+    kept parsed, so that a master resume used for many letters is only
+    parsed once."""
+    def __init__(self, concurrency: int | None = None, timeout: float | None = None):
+        self.semaphore = asyncio.Semaphore(concurrency or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.queued = 0
+        self.running = 0
+        self.resumes: OrderedDict[str, Resume] = OrderedDict()
+
+    def parse_resume(self, xml: str | bytes) -> Resume:
+        key = hashlib.sha256(xml.encode() if isinstance(xml, str) else xml).hexdigest()
+        if key in self.resumes:
+            self.resumes.move_to_end(key)
+            return self.resumes[key]
+        resume = self.resumes[key] = Resume.from_string(xml, "resume.xml")
+        if len(self.resumes) > RESUME_CACHE_SIZE:
+            self.resumes.popitem(last=False)
+        return resume
+
+    async def stitch_resume(self, xml: str | bytes, pdf: bool = True,
+                            draft: bool = False) -> StitchOutput:
+        resume = self.parse_resume(xml)
+        tex = latex_metadata(draft) + resume.to_latex()
+        if not pdf:
+            return StitchOutput(tex)
+        return StitchOutput(tex, await self.compile(tex, "resume", [Path(RESUME_LATEX_CLASS)]))
+
+    async def stitch_letter(self, markdown: str, resume_xml: str | bytes,
+                            signature_image: tuple[str, bytes] | None = None,
+                            pdf: bool = True, draft: bool = False,
+                            template_dirs: Iterable[str | Path] = ()) -> StitchOutput:
+        """Build the letter in MARKDOWN with the contact details from RESUME_XML.
+
+        SIGNATURE_IMAGE, if given, is the file name and contents of the image
+        to sign the letter with."""
+        letter = Letter.from_string(markdown)
+        letter.contact = self.parse_resume(resume_xml).contact
+        files = {}
+        if signature_image:
+            name, data = signature_image
+            letter.signature_image = Path(Path(name).name)
+            files[letter.signature_image.name] = data
+        template = load_template(template_dirs=template_dirs)
+        tex = latex_metadata(draft) + render_tex(letter, template)
+        if not pdf:
+            return StitchOutput(tex)
+        return StitchOutput(tex, await self.compile(tex, "letter", files=files))
+
+    async def compile(self, tex: str, name: str = "document",
+                      assets: Iterable[Path] = (),
+                      files: Mapping[str, bytes] | None = None) -> bytes:
+        """Compile TEX with pdflatex and return the PDF.
+
+        ASSETS are linked into the scratch directory; FILES maps the names of
+        further files to create there to their contents."""
+        self.queued += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            with tempfile.TemporaryDirectory(prefix="stitchjob-", dir=scratch_root()) as scratch:
+                scratch = Path(scratch)
+                tex_path = scratch / f"{name}.tex"
+                tex_path.write_text(tex, encoding="utf-8")
+                for path in assets:
+                    link_or_copy(path, scratch / path.name)
+                for filename, data in (files or {}).items():
+                    (scratch / filename).write_bytes(data)
+                await self._run_pdflatex(tex_path)
+                return tex_path.with_suffix(".pdf").read_bytes()
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+
+    async def _run_pdflatex(self, tex_path: Path) -> None:
+        limits = pdflatex_limits
+        if self.timeout is not None:
+            limits = replace(limits, timeout=self.timeout or None)
+        logging.debug(f"Compiling '{tex_path.name}' in '{tex_path.parent}'")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *pdflatex_command(tex_path.name),
+                cwd=tex_path.parent,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+                limit=LINE_LIMIT,
+            )
+        except OSError as e:
+            raise CannotCompilePDFError(tex_path.name, f"Cannot run pdflatex: {e.strerror}") from e
+        limit_resources(process.pid, limits)
+        log = TexLog(limits.log_lines)
+
+        async def read_log() -> None:
+            async for raw in process.stdout:
+                log.add(raw)
+            await process.wait()
+
+        try:
+            await asyncio.wait_for(read_log(), limits.timeout)
+        except asyncio.TimeoutError:
+            await kill(process)
+            raise CannotCompilePDFError(tex_path.name, f"Timed out after {limits.timeout} s",
+                                        log=list(log.lines), timed_out=True)
+        except BaseException:
+            await kill(process)
+            raise
+        if process.returncode != 0:
+            raise CannotCompilePDFError(tex_path.name, log=list(log.lines),
+                                        tex_error=log.tex_error())
+
+async def kill(process: asyncio.subprocess.Process) -> None:
+    """Kill the process group of PROCESS, if still running, and reap it."""
+    if process.returncode is None:
+        kill_process_group(process)
+    await process.wait()
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from stitchjob.shared import *
+
+CACHE_DIRNAME = ".stitchjob-cache"
+
+class BuildCache:
+    """Content hashes of built outputs, kept in `.stitchjob-cache/`.
+
+    For every output file, the cache records the hash of everything the output
+    was built from together with the size and modification time the output had
+    afterwards. An output is fresh if it still has that size and modification
+    time and the hash of its current inputs matches the recorded one."""
+    def __init__(self, directory: Path, force: bool = False):
+        self.directory = Path(directory) / CACHE_DIRNAME
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+
+    def is_fresh(self, output: Path, key: str) -> bool:
+        entry = self._entry(output, key)
+        if not self.force and entry is not None and self._read(output) == entry:
+            logging.debug(f"Build cache hit for '{output.name}'")
+            self.hits += 1
+            return True
+        logging.debug(f"Build cache miss for '{output.name}'")
+        self.misses += 1
+        return False
+
+    def record(self, output: Path, key: str) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._path(output).write_text(json.dumps(self._entry(output, key)))
+        except OSError as e:
+            logging.debug(f"Cannot update build cache: {e}")
+
+    def stats(self) -> str:
+        return f"Build cache: {self.hits} hit(s), {self.misses} miss(es)"
+
+    def _path(self, output: Path) -> Path:
+        return self.directory / f"{output.name}.json"
+
+    def _read(self, output: Path) -> dict | None:
+        try:
+            return json.loads(self._path(output).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _entry(self, output: Path, key: str) -> dict | None:
+        try:
+            stat = output.stat()
+        except OSError:
+            return None
+        return {"key": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+class HashingWriter:
+    """Text stream that hashes everything written to it before passing it on."""
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.hash = hashlib.sha256()
+        self.key = None
+
+    def write(self, text: str) -> int:
+        self.hash.update(text.encode("utf-8"))
+        return self.out.write(text)
+
+def build_key(*parts: str | bytes | Path | None) -> str:
+    """Return a hash of PARTS, which are strings, bytes, or files to read.
+
+    Files that don't exist and None are hashed as empty."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b""
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            try:
+                part = part.read_bytes()
+            except FileNotFoundError:
+                part = b""
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+@contextmanager
+def open_cached_tex(tex_path: Path, cache: BuildCache,
+                    dependencies: Iterable[Path] = ()) -> Iterator[HashingWriter]:
+    """Like `open_tex()`, but leave TEX_PATH alone if the TeX is unchanged.
+
+    The TeX is streamed into a temporary file next to TEX_PATH while being
+    hashed; the hash, combined with the contents of DEPENDENCIES, becomes the
+    cache key, available as the `key` attribute of the yielded writer."""
+    try:
+        temp_path = make_temp_file(tex_path)
+    except PermissionError as e:
+        raise CannotWriteToTeXFileError(tex_path, "Permission denied") from e
+    with open_tex(temp_path) as f:
+        out = HashingWriter(f)
+        yield out
+
+    out.key = build_key(out.hash.hexdigest(), *dependencies)
+    if cache.is_fresh(tex_path, out.key):
+        temp_path.unlink()
+    else:
+        os.replace(temp_path, tex_path)
+        cache.record(tex_path, out.key)
+
+def maybe_compile_pdf_cached(tex_path: Path, cache: BuildCache, key: str,
+                             fmt: Path | None = None,
+                             assets: Iterable[Path] = ()) -> Path | None:
+    """Compile TEX_PATH to PDF with `maybe_compile_pdf()` unless already done for KEY."""
+    pdf_path = tex_path.with_suffix(".pdf")
+    if cache.is_fresh(pdf_path, key):
+        return pdf_path.resolve()
+    pdf_path = maybe_compile_pdf(tex_path, fmt, assets)
+    cache.record(pdf_path, key)
+    return pdf_path
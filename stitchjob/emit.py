@@ -0,0 +1,298 @@
+"""Plain text, JSON, and HTML versions of resumes, for applicant-tracking systems.
+
+`emit_resume()` walks the parsed resume once, handing each part to an emitter
+for every requested format; the LaTeX is still written by `build_resume()`,
+so that it keeps its build cache and can be compiled to PDF. Emitters
+subclass `Emitter` and register themselves with `@emitter(FORMAT)`.
+
+The text of a resume may contain simple LaTeX markup; `plain_text()` turns
+it into Unicode, or into HTML for the HTML emitter.
+"""
+
+import argparse
+from functools import lru_cache
+import html
+import json
+import logging
+from pathlib import Path
+import re
+
+from stitchjob.shared import *
+from stitchjob.stitch_resume import (Contact, Degree, Description, Experience, Resume, Section,
+                                     SkillSection)
+
+# Converted strings kept by plain_text()
+TEXT_CACHE_SIZE = 16384
+
+TEX_COMMAND_RE = re.compile(r"\\([a-zA-Z]+)\s*\{([^{}]*)\}")
+TEX_SYMBOL_RE = re.compile(r"\\([a-zA-Z]+)")
+TEX_NEWLINE_RE = re.compile(r"\s*\\\\\s*")
+TEX_SYMBOLS = {
+    "leftarrow": "←", "rightarrow": "→", "to": "→", "Leftarrow": "⇐",
+    "Rightarrow": "⇒", "leftrightarrow": "↔", "uparrow": "↑", "downarrow": "↓",
+    "times": "×", "cdot": "·", "pm": "±", "approx": "≈", "sim": "∼",
+    "le": "≤", "leq": "≤", "ge": "≥", "geq": "≥", "neq": "≠", "infty": "∞",
+    "mu": "μ", "pi": "π", "Delta": "Δ", "sum": "∑", "TeX": "TeX", "LaTeX": "LaTeX",
+}
+HTML_TAGS = {"emph": "em", "textit": "em", "textbf": "strong", "texttt": "code"}
+
+EMITTERS: dict[str, type["Emitter"]] = {}
+
+def emitter(format: str):
+    """Register the decorated `Emitter` subclass for FORMAT."""
+    def register(cls: type["Emitter"]) -> type["Emitter"]:
+        cls.format = format
+        EMITTERS[format] = cls
+        return cls
+    return register
+
+def parse_formats(text: str) -> list[str]:
+    """Return the formats in the comma-separated TEXT, for `--format`."""
+    formats = [format.strip().lower() for format in text.split(",") if format.strip()]
+    unknown = [format for format in formats if format != "tex" and format not in EMITTERS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"unknown format(s) {', '.join(unknown) or repr(text)}; "
+            f"choose from {', '.join(['tex', *EMITTERS])}")
+    return list(dict.fromkeys(formats))
+
+def resume_formats(args: argparse.Namespace) -> list[str]:
+    """Return the formats to build for ARGS, which may come from a manifest
+    or a daemon job instead of the CLI."""
+    formats = getattr(args, "format", None) or ["tex"]
+    if isinstance(formats, str):
+        try:
+            return parse_formats(formats)
+        except argparse.ArgumentTypeError as e:
+            raise CannotEmitError(formats, str(e)) from e
+    return formats
+
+def emit_resume(resume: Resume, formats: list[str]) -> dict[str, str]:
+    """Return RESUME in each of FORMATS but "tex", walking its parts once."""
+    emitters = [EMITTERS[format]() for format in formats if format != "tex"]
+    for out in emitters:
+        out.contact(resume.contact)
+    for section in resume.sections:
+        for out in emitters:
+            out.begin_section(section)
+        for child in section.children:
+            if isinstance(child, Experience):
+                method = "experience"
+            elif isinstance(child, Degree):
+                method = "degree"
+            elif isinstance(child, SkillSection):
+                method = "skills"
+            elif isinstance(child, Description):
+                method = "description"
+            else:
+                continue
+            for out in emitters:
+                getattr(out, method)(child)
+        for out in emitters:
+            out.end_section(section)
+    return {out.format: out.result() for out in emitters}
+
+def write_formats(resume: Resume, tex_path: Path, formats: list[str]) -> list[Path]:
+    """Write RESUME in each of FORMATS but "tex" next to TEX_PATH, returning
+    the paths written."""
+    paths = []
+    with span("emit"):
+        outputs = emit_resume(resume, formats)
+    for format, text in outputs.items():
+        path = tex_path.with_suffix(f".{format}")
+        logging.debug(f"Writing {format} file '{path}'")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding="utf-8")
+        except PermissionError as e:
+            raise CannotEmitError(path, "Permission denied") from e
+        paths.append(path)
+    return paths
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def plain_text(text: str | None, markup: bool = False) -> str:
+    """Return TEXT without its LaTeX markup, or with it turned into HTML if
+    MARKUP is true (in which case the rest of TEXT is escaped)."""
+    if not text:
+        return ""
+    if "$" in text:
+        # Odd-numbered parts are inline math; other dollar signs are text
+        parts = TEX_MATH.split(text)
+        parts[1::2] = [part[1:-1] for part in parts[1::2]]
+        text = "".join(parts)
+    if markup:
+        text = html.escape(text, quote=False)
+    text = TEX_NEWLINE_RE.sub("<br>" if markup else "\n", text)
+    while True:
+        replaced = TEX_COMMAND_RE.sub(lambda m: tex_command(m, markup), text)
+        if replaced == text:
+            break
+        text = replaced
+    text = TEX_SYMBOL_RE.sub(lambda m: TEX_SYMBOLS.get(m.group(1), ""), text)
+    text = text.replace("---", "—").replace("--", "–")
+    return re.sub(r"[{}]", "", text).strip()
+
+def tex_command(match: re.Match, markup: bool) -> str:
+    command, argument = match.groups()
+    if markup and command in HTML_TAGS:
+        return f"<{HTML_TAGS[command]}>{argument}</{HTML_TAGS[command]}>"
+    return argument
+
+def dates(part: Experience) -> str:
+    return plain_text(f"{part.begin} -- {part.end}")
+
+class Emitter:
+    """Base class of the emitters of a format, which `emit_resume()` hands
+    each part of the resume in turn and then asks for the `result()`."""
+    format = ""
+
+    def contact(self, contact: Contact) -> None:
+        pass
+
+    def begin_section(self, section: Section) -> None:
+        pass
+
+    def end_section(self, section: Section) -> None:
+        pass
+
+    def experience(self, experience: Experience) -> None:
+        pass
+
+    def degree(self, degree: Degree) -> None:
+        pass
+
+    def skills(self, skills: SkillSection) -> None:
+        pass
+
+    def description(self, description: Description) -> None:
+        pass
+
+    def result(self) -> str:
+        raise NotImplementedError
+
+@emitter("txt")
+class TextEmitter(Emitter):
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def contact(self, contact: Contact) -> None:
+        values = {key: plain_text(val) for key, val in contact.items()}
+        self.lines.append(values.pop("name", "").upper())
+        self.lines.append(" | ".join(val for val in values.values() if val))
+
+    def begin_section(self, section: Section) -> None:
+        heading = plain_text(section.heading).upper()
+        self.lines += ["", heading, "-" * len(heading)]
+
+    def experience(self, experience: Experience) -> None:
+        where = ", ".join(filter(None, (plain_text(experience.organization),
+                                         plain_text(experience.location))))
+        self.lines.append(f"{plain_text(experience.title)} — {where} ({dates(experience)})")
+        if experience.blurb:
+            self.lines.append(f"  {plain_text(experience.blurb)}")
+        self.lines += [f"  - {plain_text(item)}" for item in experience.items]
+
+    def degree(self, degree: Degree) -> None:
+        self.lines.append(f"{plain_text(degree.type)} in {plain_text(degree.field)}, "
+                          f"{plain_text(degree.school)}, {plain_text(degree.location)} "
+                          f"({plain_text(degree.date)})")
+
+    def skills(self, skills: SkillSection) -> None:
+        self.lines.append(" · ".join(plain_text(skill.name) for skill in skills.skills))
+
+    def description(self, description: Description) -> None:
+        self.lines.append(plain_text(description.text))
+
+    def result(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+@emitter("json")
+class JsonEmitter(Emitter):
+    def __init__(self):
+        self.data: dict = {"contact": {}, "sections": []}
+
+    def contact(self, contact: Contact) -> None:
+        self.data["contact"] = {key: plain_text(val) for key, val in contact.items()}
+
+    def begin_section(self, section: Section) -> None:
+        self.data["sections"].append({"heading": plain_text(section.heading),
+                                      "type": section.type, "children": []})
+
+    def add(self, child: dict) -> None:
+        self.data["sections"][-1]["children"].append(child)
+
+    def experience(self, experience: Experience) -> None:
+        self.add({"kind": "experience",
+                  "title": plain_text(experience.title),
+                  "organization": plain_text(experience.organization),
+                  "location": plain_text(experience.location),
+                  "blurb": plain_text(experience.blurb) or None,
+                  "begin": plain_text(experience.begin),
+                  "end": plain_text(experience.end),
+                  "items": [plain_text(item) for item in experience.items]})
+
+    def degree(self, degree: Degree) -> None:
+        self.add({"kind": "degree", **{name: plain_text(getattr(degree, name))
+                                       for name in ("date", "type", "field", "school",
+                                                    "location")}})
+
+    def skills(self, skills: SkillSection) -> None:
+        self.add({"kind": "skills", "skills": [plain_text(skill.name) for skill in skills.skills]})
+
+    def description(self, description: Description) -> None:
+        self.add({"kind": "description", "text": plain_text(description.text)})
+
+    def result(self) -> str:
+        return json.dumps(self.data, indent=2, ensure_ascii=False) + "\n"
+
+@emitter("html")
+class HtmlEmitter(Emitter):
+    def __init__(self):
+        self.parts: list[str] = []
+        self.title = ""
+
+    def contact(self, contact: Contact) -> None:
+        values = {key: plain_text(val, markup=True) for key, val in contact.items()}
+        self.title = values.pop("name", "")
+        self.parts.append(f"<header>\n<h1>{self.title}</h1>\n"
+                          f"<p>{' | '.join(val for val in values.values() if val)}</p>\n"
+                          "</header>")
+
+    def begin_section(self, section: Section) -> None:
+        self.parts.append(f"<section>\n<h2>{plain_text(section.heading, markup=True)}</h2>")
+
+    def end_section(self, section: Section) -> None:
+        self.parts.append("</section>")
+
+    def experience(self, experience: Experience) -> None:
+        where = ", ".join(filter(None, (plain_text(experience.organization, markup=True),
+                                         plain_text(experience.location, markup=True))))
+        self.parts.append(f"<h3>{plain_text(experience.title, markup=True)} — {where}</h3>\n"
+                          f"<p class=\"dates\">{html.escape(dates(experience))}</p>")
+        if experience.blurb:
+            self.parts.append(f"<p>{plain_text(experience.blurb, markup=True)}</p>")
+        if experience.items:
+            self.parts.append("<ul>\n" + "".join(f"<li>{plain_text(item, markup=True)}</li>\n"
+                                                 for item in experience.items) + "</ul>")
+
+    def degree(self, degree: Degree) -> None:
+        text = plain_text(f"{degree.type} in {degree.field}, {degree.school}, "
+                          f"{degree.location} ({degree.date})", markup=True)
+        self.parts.append(f"<p>{text}</p>")
+
+    def skills(self, skills: SkillSection) -> None:
+        self.parts.append("<ul class=\"skills\">\n"
+                          + "".join(f"<li>{plain_text(skill.name, markup=True)}</li>\n"
+                                    for skill in skills.skills) + "</ul>")
+
+    def description(self, description: Description) -> None:
+        self.parts.append(f"<p>{plain_text(description.text, markup=True)}</p>")
+
+    def result(self) -> str:
+        return ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+                f"<title>{self.title}</title>\n</head>\n<body>\n"
+                + "\n".join(self.parts) + "\n</body>\n</html>\n")
+
+class CannotEmitError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot write resume", filename, reason)
@@ -0,0 +1,190 @@
+"""Fit a resume to a number of pages by dropping its lowest-priority items.
+
+The items of an experience are taken to be in order of priority, so items are
+dropped from the end, always from the experience with the most items left,
+and every experience keeps at least one. That gives a single sequence of
+ever shorter resumes, and the shortest number of items dropped that fits is
+searched for: a length estimate based on the metrics of `stitched.cls` gives
+the first guess, and `pdflatex` runs verify it, galloping and then bisecting
+around the guess, so that fitting usually takes only two or three runs.
+"""
+
+import argparse
+import heapq
+import logging
+import math
+from pathlib import Path
+import re
+import tempfile
+
+from stitchjob.latex_format import ensure_format
+from stitchjob.selection import trim_resume
+from stitchjob.shared import *
+from stitchjob.stitch_resume import (RESUME_LATEX_CLASS, Description, Experience, Resume,
+                                     SkillSection, resume_preamble)
+
+MIN_ITEMS = 1
+
+# Metrics of stitched.cls, in points: 12pt Latin Modern on letter paper with
+# 0.75in margins. The characters per line are averages for English text.
+PAGE_HEIGHT = 684.0             # 11in - 2 * 0.75in
+LINE_HEIGHT = 14.5              # \baselineskip at 12pt
+LINE_CHARS = 92                 # 7in \textwidth
+ITEM_CHARS = 88                 # less the 1.5em indent of `duties`
+TITLE_HEIGHT = 3.5 * LINE_HEIGHT    # name and contact line (\maketitle)
+SECTION_HEIGHT = 27.0           # \large heading with its skips
+EXPERIENCE_HEIGHT = 2 * LINE_HEIGHT + 6.0   # title and organization, \vspace{1ex}
+
+LATEX_MARKUP_RE = re.compile(r"\\[a-zA-Z]+|[{}$\\]")
+
+def fit_resume(resume: Resume, pages: int, args: argparse.Namespace) -> Resume:
+    """Return a copy of RESUME with as few items dropped as needed to fit on
+    PAGES pages, or with as many as can be dropped if it never fits."""
+    order = drop_order(resume)
+    heights = estimate_heights(resume, order)
+    guess = next((n for n, height in enumerate(heights) if height <= pages * PAGE_HEIGHT),
+                 len(order))
+    logging.debug(f"Estimated {math.ceil(heights[0] / PAGE_HEIGHT)} page(s); "
+                  f"guessing {guess} of {len(order)} droppable item(s) must go")
+
+    fmt = None
+    if args.precompile:
+        fmt = ensure_format("stitched", resume_preamble(args.draft), [RESUME_LATEX_CLASS])
+    with tempfile.TemporaryDirectory(prefix="stitchjob-", dir=scratch_root()) as scratch:
+        counter = PageCounter(resume, order, Path(scratch) / "fit.tex", fmt, args)
+        dropped = search(counter, guess, len(order), pages)
+
+    if counter.pages[dropped] > pages:
+        logging.warning(f"Cannot fit resume on {pages} page(s), even after dropping "
+                        f"{dropped} item(s)")
+    else:
+        logging.info(f"Fit resume on {pages} page(s) by dropping {dropped} item(s), "
+                     f"with {len(counter.pages)} pdflatex run(s)")
+    return without_items(resume, order[:dropped])
+
+def search(counter: "PageCounter", guess: int, most: int, pages: int) -> int:
+    """Return the fewest items to drop, from 0 to MOST, for COUNTER to fit on PAGES,
+    starting from GUESS."""
+    fits = lambda n: counter(n) <= pages
+    step = 1
+    if fits(guess):
+        # Gallop down to an n that doesn't fit
+        fit, unfit = guess, -1
+        while fit > 0:
+            n = max(fit - step, 0)
+            if not fits(n):
+                unfit = n
+                break
+            fit, step = n, step * 2
+    else:
+        # Gallop up to an n that does
+        fit, unfit = None, guess
+        while unfit < most:
+            n = min(unfit + step, most)
+            if fits(n):
+                fit = n
+                break
+            unfit, step = n, step * 2
+        if fit is None:
+            return most
+    while fit - unfit > 1:
+        n = (fit + unfit) // 2
+        if fits(n):
+            fit = n
+        else:
+            unfit = n
+    return fit
+
+class PageCounter:
+    """Counts the pages of RESUME with the first N items of ORDER dropped,
+    compiling each N at most once."""
+    def __init__(self, resume: Resume, order: list[tuple[int, int, int]], tex_path: Path,
+                 fmt: Path | None, args: argparse.Namespace):
+        self.resume = resume
+        self.order = order
+        self.tex_path = tex_path
+        self.fmt = fmt
+        self.args = args
+        self.pages: dict[int, int] = {}
+
+    def __call__(self, n: int) -> int:
+        if n not in self.pages:
+            with open(self.tex_path, "w", encoding="utf-8") as out:
+                out.write(latex_metadata(self.args.draft))
+                without_items(self.resume, self.order[:n]).write_latex(
+                    out, format_marker=self.fmt is not None)
+            try:
+                with span("fit"):
+                    self.pages[n] = count_pdf_pages(self.tex_path, self.fmt,
+                                                    [RESUME_LATEX_CLASS])
+            except CannotCompilePDFError as e:
+                raise CannotFitResumeError(self.args.input, str(e.tex_error or e.reason)) from e
+            logging.debug(f"Dropping {n} item(s) gives {self.pages[n]} page(s)")
+        return self.pages[n]
+
+def drop_order(resume: Resume) -> list[tuple[int, int, int]]:
+    """Return the (section, child, item) indices of the items of RESUME in the
+    order they are to be dropped."""
+    heap = []
+    for s, section in enumerate(resume.sections):
+        for c, child in enumerate(section.children):
+            if isinstance(child, Experience) and len(child.items) > MIN_ITEMS:
+                # Most items first, then the experience further down
+                heap.append((-len(child.items), -s, -c))
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        count, s, c = heapq.heappop(heap)
+        order.append((-s, -c, -count - 1))
+        if -count - 1 > MIN_ITEMS:
+            heapq.heappush(heap, (count + 1, s, c))
+    return order
+
+def estimate_heights(resume: Resume, order: list[tuple[int, int, int]]) -> list[float]:
+    """Return the estimated height of RESUME in points with the first N items
+    of ORDER dropped, for every N."""
+    height = TITLE_HEIGHT
+    for section in resume.sections:
+        height += SECTION_HEIGHT
+        for child in section.children:
+            if isinstance(child, Experience):
+                height += EXPERIENCE_HEIGHT + sum(map(item_height, child.items))
+                if child.blurb:
+                    height += text_height(child.blurb, LINE_CHARS)
+            elif isinstance(child, SkillSection):
+                height += math.ceil(len(child.skills) / 2) * LINE_HEIGHT
+            elif isinstance(child, Description):
+                height += text_height(child.text or "", LINE_CHARS)
+            else:
+                height += LINE_HEIGHT
+    heights = [height]
+    for s, c, i in order:
+        height -= item_height(resume.sections[s].children[c].items[i])
+        heights.append(height)
+    return heights
+
+def item_height(text: str) -> float:
+    return text_height(text, ITEM_CHARS)
+
+def text_height(text: str, chars: int) -> float:
+    return max(math.ceil(len(LATEX_MARKUP_RE.sub("", text)) / chars), 1) * LINE_HEIGHT
+
+def without_items(resume: Resume, dropped: list[tuple[int, int, int]]) -> Resume:
+    """Return a copy of RESUME without the DROPPED items."""
+    if not dropped:
+        return resume
+    dropped = set(dropped)
+    leaves = {}
+    for s, section in enumerate(resume.sections):
+        for c, child in enumerate(section.children):
+            if isinstance(child, Experience) and child.items:
+                leaves[(s, c)] = [i for i in range(len(child.items)) if (s, c, i) not in dropped]
+            elif isinstance(child, SkillSection):
+                leaves[(s, c)] = list(range(len(child.skills)))
+            else:
+                leaves[(s, c)] = [None]
+    return trim_resume(resume, leaves)
+
+class CannotFitResumeError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot fit resume", filename, reason)
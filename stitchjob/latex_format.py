@@ -0,0 +1,81 @@
+"""Precompiled LaTeX formats for the fixed part of a document's preamble.
+
+Loading the document class, its packages, and the tagging code set up by
+`\\DocumentMetadata` takes most of the time of a `pdflatex` run. Using
+`mylatex.ltx`, that part of the preamble can be dumped into a format once and
+loaded with `pdflatex -fmt=...` on later runs. The document must contain a
+line with `FORMAT_MARKER` right after the precompiled part of the preamble;
+when the format is used, everything up to that line is skipped.
+"""
+
+from functools import lru_cache
+import logging
+from pathlib import Path
+import subprocess
+import tempfile
+from typing import Iterable
+
+from stitchjob.cache import build_key
+from stitchjob.shared import *
+
+FORMAT_MARKER = "%mylatex"
+
+def ensure_format(name: str, preamble: str, inputs: Iterable[Path] = ()) -> Path | None:
+    """Return the path (without `.fmt`) of a format precompiled from PREAMBLE.
+
+    INPUTS are the files the preamble loads, such as the document class; they
+    are linked into the scratch directory the format is built in. The format
+    is cached in the user cache directory, keyed on the preamble, the contents
+    of INPUTS, and the version of the TeX distribution, and is only built if
+    it is not there yet. Returns None if the format cannot be built."""
+    inputs = list(inputs)
+    version = tex_version()
+    if version is None:
+        return None
+    key = build_key(preamble, version, *inputs)
+    format_dir = user_cache_dir() / "formats"
+    jobname = f"{name}-{key[:16]}"
+    fmt_path = format_dir / jobname
+    if fmt_path.with_suffix(".fmt").exists():
+        logging.debug(f"Using precompiled format '{fmt_path}.fmt'")
+        return fmt_path
+
+    logging.debug(f"Precompiling format '{fmt_path}.fmt'")
+    try:
+        format_dir.mkdir(parents=True, exist_ok=True)
+        # Built in a scratch directory and installed atomically, so that
+        # parallel builds never load a half-written format
+        with tempfile.TemporaryDirectory(prefix="stitchjob-", dir=scratch_root()) as scratch:
+            scratch = Path(scratch)
+            for path in inputs:
+                link_or_copy(path, scratch / path.name)
+            (scratch / f"{jobname}.tex").write_text(
+                f"{preamble}\n{FORMAT_MARKER}\n\\begin{{document}}\n\\end{{document}}\n",
+                encoding="utf-8")
+            run_supervised(
+                ["pdflatex",
+                 "-ini",
+                 "-interaction=nonstopmode",
+                 "-halt-on-error",
+                 f"-jobname={jobname}",
+                 "&pdflatex",
+                 "mylatex.ltx",
+                 f"{jobname}.tex"],
+                cwd=scratch,
+                name=f"{jobname}.fmt",
+            )
+            install_file(scratch / f"{jobname}.fmt", fmt_path.with_suffix(".fmt"))
+    except (OSError, CannotCompilePDFError) as e:
+        logging.warning(f"Cannot precompile LaTeX format, compiling without it: {e}")
+        return None
+    return fmt_path
+
+@lru_cache(maxsize=None)
+def tex_version() -> str | None:
+    """Return the version banner of `pdflatex`, or None if it's not available."""
+    try:
+        result = subprocess.run(["pdflatex", "--version"], check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode(errors="replace").partition("\n")[0]
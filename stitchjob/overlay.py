@@ -0,0 +1,226 @@
+"""Overlays that derive a variant of a master resume without copying its XML.
+
+An overlay is a YAML (or JSON) file of edits to the parsed master:
+
+    drop:                       # parts to leave out
+      - talk
+      - section[4]
+    order:                      # parts to move ahead of their siblings
+      - acme
+      - section[2]/experience[3]
+    replace:                    # new text of items, skills, and descriptions,
+      acme-billing: Rewrote billing in Rust
+      acme:                     # or new fields of sections and experiences
+        title: Staff Engineer
+
+Parts are named by their `id` attribute or by a path of 1-based positions
+like `section[3]/experience[2]/item[1]` (or `section[2]/skills[1]/skill[4]`,
+`section[1]/description[1]`). Paths always refer to the master, so edits
+don't shift each other's positions. Experiences, lists of skills, and
+sections left empty by `drop` are dropped too, as LaTeX rejects empty lists.
+Parts that aren't edited are shared with the master, so applying an overlay
+costs far less than parsing a resume.
+"""
+
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+import re
+from weakref import WeakKeyDictionary
+
+from stitchjob.shared import *
+from stitchjob.stitch_resume import (Degree, Description, Experience, Resume, Section, Skill,
+                                     SkillSection)
+
+PATH_SEGMENT_RE = re.compile(r"([a-z*]+)\[(\d+)\]$")
+
+# Fields that `replace` may set on sections, experiences, and degrees
+REPLACEABLE = {
+    Section: ("heading",),
+    Experience: ("title", "organization", "location", "blurb", "begin", "end"),
+    Degree: ("date", "type", "field", "school", "location"),
+}
+
+_ids: WeakKeyDictionary = WeakKeyDictionary()
+
+@dataclass
+class Overlay:
+    drop: list[str] = field(default_factory=list)
+    order: list[str] = field(default_factory=list)
+    replace: dict[str, str | dict] = field(default_factory=dict)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "Overlay":
+        import yaml     # Deferred, like frontmatter
+        try:
+            data = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+        except FileNotFoundError as e:
+            raise CannotApplyOverlayError(path, "File not found") from e
+        except yaml.YAMLError as e:
+            raise CannotApplyOverlayError(path, str(e)) from e
+        if not isinstance(data, dict):
+            raise CannotApplyOverlayError(path, "Expected a mapping of drop, order, and replace")
+        unknown = set(data) - {f.name for f in fields(cls)}
+        if unknown:
+            raise CannotApplyOverlayError(path, f"Unknown key(s) {', '.join(sorted(unknown))}")
+        overlay = cls(**data)
+        if not isinstance(overlay.drop, list) or not isinstance(overlay.order, list) \
+           or not isinstance(overlay.replace, dict):
+            raise CannotApplyOverlayError(path, "drop and order must be lists, replace a mapping")
+        return overlay
+
+def apply_overlay(resume: Resume, overlay: Overlay, name: str | Path = "overlay") -> Resume:
+    """Return RESUME with the edits of OVERLAY; NAME is used in error messages."""
+    resolve = lambda target: resolve_target(resume, str(target), name)
+    dropped = {resolve(target) for target in overlay.drop}
+    replaced = {resolve(target): value for target, value in overlay.replace.items()}
+    ordered: dict[tuple, list[int]] = {}
+    for target in overlay.order:
+        position = resolve(target)
+        siblings = ordered.setdefault(position[:-1], [])
+        if position[-1] in siblings:
+            raise CannotApplyOverlayError(name, f"'{target}' is in order more than once")
+        siblings.append(position[-1])
+
+    # Every part at or above an edit; the rest is shared with RESUME
+    touched = {position[:n] for edits in (dropped, replaced, ordered)
+               for position in edits for n in range(len(position) + 1)}
+    if () not in touched:
+        return resume
+
+    sections = []
+    for s in arrange((), len(resume.sections), ordered):
+        section = resume.sections[s]
+        if (s,) in dropped:
+            continue
+        if (s,) in touched:
+            children = []
+            for c in arrange((s,), len(section.children), ordered):
+                if (s, c) not in dropped:
+                    child = section.children[c]
+                    if (s, c) in touched:
+                        child = edit_child(child, (s, c), dropped, replaced, ordered, name)
+                    if child is not None:
+                        children.append(child)
+            if not children and section.children:
+                continue
+            section = replace(replace_fields(section, replaced.get((s,)), name),
+                              children=tuple(children))
+        sections.append(section)
+    return replace(resume, sections=sections)
+
+def edit_child(child, position: tuple, dropped: set, replaced: dict, ordered: dict, name):
+    """Return CHILD at POSITION with the edits of its items or skills applied,
+    or None if all of them are dropped."""
+    if isinstance(child, Experience):
+        kept = [i for i in arrange(position, len(child.items), ordered)
+                if position + (i,) not in dropped]
+        if child.items and not kept:
+            return None
+        child = replace(child,
+                        items=tuple(replace_text(child.items[i], replaced.get(position + (i,)),
+                                                 name) for i in kept),
+                        item_terms=tuple(child.item_terms[i] for i in kept),
+                        item_ids=tuple(child.item_ids[i] for i in kept))
+    elif isinstance(child, SkillSection):
+        skills = []
+        for i in arrange(position, len(child.skills), ordered):
+            if position + (i,) not in dropped:
+                skill = child.skills[i]
+                if position + (i,) in replaced:
+                    skill = replace(skill, name=replace_text(skill.name, replaced[position + (i,)],
+                                                             name))
+                skills.append(skill)
+        if child.skills and not skills:
+            return None
+        child = replace(child, skills=tuple(skills))
+    elif isinstance(child, Description) and position in replaced:
+        return replace(child, text=replace_text(child.text, replaced[position], name))
+    return replace_fields(child, replaced.get(position), name)
+
+def arrange(parent: tuple, count: int, ordered: dict) -> list[int]:
+    """Return the indices of the COUNT children of PARENT, those named in
+    `order` first."""
+    first = ordered.get(parent, [])
+    return first + [n for n in range(count) if n not in first]
+
+def replace_text(text: str, value, name) -> str:
+    if value is None:
+        return text
+    if not isinstance(value, (str, int, float)):
+        raise CannotApplyOverlayError(name, f"Expected text to replace '{text}'")
+    return str(value)
+
+def replace_fields(part, value, name):
+    if value is None or isinstance(part, Description):
+        return part
+    if isinstance(part, SkillSection):
+        raise CannotApplyOverlayError(name, "Cannot replace a list of skills, only its skills")
+    allowed = next((names for cls, names in REPLACEABLE.items() if isinstance(part, cls)), ())
+    if not isinstance(value, dict) or not set(value) <= set(allowed):
+        raise CannotApplyOverlayError(
+            name, f"Can only replace {', '.join(allowed)} of {type(part).__name__}")
+    return replace(part, **{key: str(val) for key, val in value.items()})
+
+def resolve_target(resume: Resume, target: str, name) -> tuple[int, ...]:
+    """Return the position (section, child, item or skill) of TARGET in RESUME."""
+    if "/" not in target and "[" not in target:
+        ids = resume_ids(resume)
+        if target not in ids:
+            raise CannotApplyOverlayError(name, f"No part with id '{target}'")
+        return ids[target]
+
+    position = []
+    parts: tuple = resume.sections
+    for segment in target.strip("/").removeprefix("resume/").split("/"):
+        match = PATH_SEGMENT_RE.match(segment)
+        if not match:
+            raise CannotApplyOverlayError(name, f"Invalid path '{target}'")
+        tag, n = match.group(1), int(match.group(2))
+        candidates = [index for index, part in enumerate(parts) if matches(part, tag)]
+        if not 1 <= n <= len(candidates):
+            raise CannotApplyOverlayError(name, f"No part at '{target}'")
+        position.append(candidates[n - 1])
+        part = parts[candidates[n - 1]]
+        if isinstance(part, Section):
+            parts = part.children
+        elif isinstance(part, Experience):
+            parts = part.items
+        elif isinstance(part, SkillSection):
+            parts = part.skills
+        else:
+            parts = ()
+    return tuple(position)
+
+def matches(part, tag: str) -> bool:
+    if tag == "*":
+        return True
+    kinds = {"section": Section, "experience": Experience, "degree": Degree,
+             "skills": SkillSection, "skill": Skill, "description": Description, "item": str}
+    return tag in kinds and isinstance(part, kinds[tag])
+
+def resume_ids(resume: Resume) -> dict[str, tuple[int, ...]]:
+    """Return the positions of the parts of RESUME that have an id."""
+    ids = _ids.get(resume)
+    if ids is not None:
+        return ids
+    ids = {}
+    for s, section in enumerate(resume.sections):
+        if section.id:
+            ids[section.id] = (s,)
+        for c, child in enumerate(section.children):
+            if isinstance(child, Experience):
+                if child.id:
+                    ids[child.id] = (s, c)
+                for i, id in enumerate(child.item_ids):
+                    if id:
+                        ids[id] = (s, c, i)
+            elif isinstance(child, SkillSection):
+                for i, skill in enumerate(child.skills):
+                    if skill.id:
+                        ids[skill.id] = (s, c, i)
+    _ids[resume] = ids
+    return ids
+
+class CannotApplyOverlayError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot apply overlay", filename, reason)
@@ -0,0 +1,148 @@
+"""Client for the `stitch serve` daemon, and the HTTP plumbing both share.
+
+The daemon speaks plain HTTP with JSON bodies, either on a localhost TCP port
+or on a Unix socket. An address is `HOST:PORT`, or `unix:PATH` (or just a
+path containing a slash) for a Unix socket.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+from pathlib import Path
+import socket
+
+from stitchjob.shared import *
+
+# Arguments a /build job may set. The daemon uses BUILD_DEFAULTS for the
+# rest, so that a client can't make it read or write outside the directory
+# of the job's input.
+JOB_ARGS = ("command", "input", "output", "resume", "select", "overlay", "pdf", "draft",
+            "format")
+
+BUILD_DEFAULTS = {
+    "output": None,
+    "select": None,
+    "overlay": None,
+    "pdf": False,
+    "draft": False,
+    "format": None,
+    "resume": None,
+    "signature": False,
+    "signature_image": "letter/signature.png",
+    "template_dir": None,
+    "force": False,
+    "cache_stats": False,
+    "precompile": False,
+    "base": None,
+    "fit_pages": None,
+}
+
+# Arguments that only affect the client
+CLIENT_ARGS = ("remote", "verbose", "timings", "timings_json", "profile", "openpdf",
+               "latex_timeout", "latex_memory", "snapshot")
+
+# Arguments that name files, which are made absolute before being sent, as
+# the daemon may be running in another directory
+PATH_ARGS = ("input", "output", "resume")
+
+def parse_address(address: str) -> tuple[str, str | int]:
+    """Return ("unix", PATH) or ("tcp", HOST, PORT) for ADDRESS."""
+    if address.startswith("unix:"):
+        return ("unix", address[5:])
+    if "/" in address:
+        return ("unix", address)
+    host, _, port = address.rpartition(":")
+    return ("tcp", host or "127.0.0.1", int(port))
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+def open_connection(address: str, timeout: float | None = None) -> http.client.HTTPConnection:
+    """Connect to the daemon at ADDRESS; raises OSError if it cannot be reached."""
+    kind, *where = parse_address(address)
+    if kind == "unix":
+        conn = UnixHTTPConnection(where[0], timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(*where, timeout=timeout)
+    conn.connect()
+    return conn
+
+def send(conn: http.client.HTTPConnection, method: str, path: str,
+         body: dict | None = None) -> tuple[int, dict]:
+    """Send BODY as JSON over CONN and return the status and JSON reply."""
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=payload,
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+def outside_input_directory(job: dict) -> str | None:
+    """Return the first file of JOB, other than its input, that isn't in the
+    directory of its input, if any; the daemon only reads and writes there."""
+    directory = Path(job["input"]).resolve().parent
+    # Each variant is written next to its overlay
+    for path in [job.get("output"), job.get("resume"), *(job.get("overlay") or [])]:
+        if path and not Path(path).resolve().is_relative_to(directory):
+            return path
+    return None
+
+def run_remote(args: argparse.Namespace) -> bool:
+    """Run the `resume` or `letter` command in ARGS on the daemon at `args.remote`.
+
+    Returns False, without building anything, if the daemon cannot be
+    reached, or if ARGS has options the daemon doesn't accept, so that the
+    caller can build locally instead."""
+    unsupported = [key for key, val in vars(args).items()
+                   if key not in JOB_ARGS and key not in CLIENT_ARGS
+                   and val not in (None, False, BUILD_DEFAULTS.get(key))]
+    if unsupported:
+        logging.info(f"The stitch daemon doesn't accept {', '.join(unsupported)}, "
+                     "building locally")
+        return False
+    job = {key: val for key, val in vars(args).items() if key in JOB_ARGS}
+    for key in PATH_ARGS:
+        if job.get(key) is not None:
+            job[key] = str(Path(job[key]).resolve())
+    if job.get("overlay"):
+        job["overlay"] = [str(Path(path).resolve()) for path in job["overlay"]]
+    job["pdf"] = args.pdf or args.openpdf
+    outside = outside_input_directory(job)
+    if outside:
+        logging.info(f"'{outside}' is not in the directory of the input, which the stitch "
+                     "daemon requires, building locally")
+        return False
+
+    try:
+        conn = open_connection(args.remote, timeout=5)
+    except OSError as e:
+        logging.info(f"Cannot reach stitch daemon at '{args.remote}' ({e}), building locally")
+        return False
+
+    # Once the job has been sent, failing over to a local build could run it twice
+    logging.debug(f"Sending {args.command} job to '{args.remote}'")
+    conn.sock.settimeout(None)
+    status, reply = send(conn, "POST", "/build", job)
+    if status != 200:
+        raise RemoteBuildError(args.input, reply.get("error", f"HTTP {status}"))
+
+    pdf_path = reply.get("pdf")
+    if args.openpdf and pdf_path:
+        maybe_open_pdf(Path(pdf_path))
+    elif args.openpdf:
+        logging.error("PDF file not generated, cannot open")
+    return True
+
+class RemoteBuildError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Remote build failed", filename, reason)
@@ -0,0 +1,187 @@
+"""Select the parts of a resume matching a tag query, for `--select`.
+
+Experiences, items, skills, and sections can have `tags` (separated by commas
+or spaces) and an `id`, both of which are terms a query can match. An item
+has the terms of its experience and section as well as its own. A query
+combines terms with `and`, `or`, `not`, and parentheses, e.g.
+`python and (backend or infra)`.
+
+The resume is indexed once, mapping each term to a bitmask of the items
+(or skills, etc.) that have it, so that evaluating a query is a handful of
+integer operations no matter how many items there are. Parts without any
+terms are always kept.
+"""
+
+from dataclasses import replace
+from functools import lru_cache
+import logging
+import re
+from weakref import WeakKeyDictionary
+
+from stitchjob.shared import *
+from stitchjob.stitch_resume import Experience, Resume, SkillSection
+
+TOKEN_RE = re.compile(r"\s*(?:([()])|([^\s()]+))")
+OPERATORS = ("and", "or", "not")
+
+_indexes: WeakKeyDictionary = WeakKeyDictionary()
+
+def select_resume(resume: Resume, query: str) -> Resume:
+    """Return a copy of RESUME with only the parts matching QUERY.
+
+    Experiences left without items and sections left without children are
+    dropped. RESUME itself is not changed."""
+    index = resume_index(resume)
+    kept = index.evaluate(parse_query(query)) | index.untagged
+    logging.debug(f"Selected {kept.bit_count()} of {len(index.units)} parts with '{query}'")
+
+    leaves: dict[tuple[int, int], list[int]] = {}
+    while kept:
+        low = kept & -kept
+        s, c, leaf = index.units[low.bit_length() - 1]
+        leaves.setdefault((s, c), []).append(leaf)
+        kept ^= low
+    return trim_resume(resume, leaves)
+
+def trim_resume(resume: Resume, leaves: dict[tuple[int, int], list[int | None]]) -> Resume:
+    """Return a copy of RESUME with only the children in LEAVES.
+
+    LEAVES maps the section and child index of each child to keep to the
+    indices of its items or skills to keep, or to `[None]` to keep it whole.
+    Sections, children, and items that are kept whole are shared with RESUME."""
+    sections = []
+    for s, section in enumerate(resume.sections):
+        children = tuple(select_child(child, leaves[(s, c)])
+                         for c, child in enumerate(section.children) if (s, c) in leaves)
+        if len(children) == len(section.children) and all(
+                new is old for new, old in zip(children, section.children)):
+            sections.append(section)
+        elif children:
+            sections.append(replace(section, children=children))
+    return replace(resume, sections=sections)
+
+def select_child(child, leaves: list[int | None]):
+    """Return CHILD with only the items or skills in LEAVES, or CHILD itself
+    if all of them are kept."""
+    if isinstance(child, Experience) and child.items and len(leaves) < len(child.items):
+        return replace(child, items=tuple(child.items[i] for i in leaves),
+                       item_terms=tuple(child.item_terms[i] for i in leaves),
+                       item_ids=tuple(child.item_ids[i] for i in leaves))
+    if isinstance(child, SkillSection) and len(leaves) < len(child.skills):
+        return replace(child, skills=tuple(child.skills[i] for i in leaves))
+    return child
+
+def resume_index(resume: Resume) -> "ResumeIndex":
+    """Return the index of RESUME, building it the first time."""
+    index = _indexes.get(resume)
+    if index is None:
+        index = _indexes[resume] = ResumeIndex(resume)
+    return index
+
+class ResumeIndex:
+    """Maps terms to bitmasks of the selectable parts ("units") of a resume.
+
+    Unit N is `units[N]`, a tuple of the section index, child index, and the
+    index of the item or skill within the child (or None if the child is
+    selected as a whole)."""
+    def __init__(self, resume: Resume):
+        self.units: list[tuple[int, int, int | None]] = []
+        self.terms: dict[str, int] = {}
+        self.untagged = 0
+        for s, section in enumerate(resume.sections):
+            for c, child in enumerate(section.children):
+                inherited = section.terms | getattr(child, "terms", frozenset())
+                if isinstance(child, Experience) and child.items:
+                    for i, terms in enumerate(child.item_terms):
+                        self.add((s, c, i), inherited | terms)
+                elif isinstance(child, SkillSection):
+                    for i, skill in enumerate(child.skills):
+                        self.add((s, c, i), inherited | skill.terms)
+                else:
+                    self.add((s, c, None), inherited)
+        self.all = (1 << len(self.units)) - 1
+
+    def add(self, unit: tuple[int, int, int | None], terms: frozenset[str]) -> None:
+        bit = 1 << len(self.units)
+        self.units.append(unit)
+        if not terms:
+            self.untagged |= bit
+        for term in terms:
+            self.terms[term] = self.terms.get(term, 0) | bit
+
+    def evaluate(self, query: tuple) -> int:
+        """Return the mask of units matching QUERY, as returned by `parse_query()`."""
+        op, *operands = query
+        if op == "term":
+            term = operands[0]
+            if term not in self.terms:
+                logging.warning(f"No part of the resume is tagged '{term}'")
+            return self.terms.get(term, 0)
+        if op == "not":
+            return self.all & ~self.evaluate(operands[0])
+        left, right = (self.evaluate(operand) for operand in operands)
+        return left & right if op == "and" else left | right
+
+@lru_cache(maxsize=64)
+def parse_query(query: str) -> tuple:
+    """Parse QUERY into nested tuples: ("term", TERM), ("not", Q), ("and", Q, Q),
+    or ("or", Q, Q).
+
+    `not` binds tightest, then `and`, then `or`."""
+    tokens = tokenize(query)
+    if not tokens:
+        raise InvalidSelectionError(query, "Empty query")
+    pos = 0
+
+    def peek() -> str | None:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take() -> str:
+        nonlocal pos
+        token = peek()
+        if token is None:
+            raise InvalidSelectionError(query, "Unexpected end of query")
+        pos += 1
+        return token
+
+    def parse_or() -> tuple:
+        node = parse_and()
+        while peek() == "or":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and() -> tuple:
+        node = parse_not()
+        while peek() == "and":
+            take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not() -> tuple:
+        token = take()
+        if token == "not":
+            return ("not", parse_not())
+        if token == "(":
+            node = parse_or()
+            if take() != ")":
+                raise InvalidSelectionError(query, "Expected ')'")
+            return node
+        if token in OPERATORS or token == ")":
+            raise InvalidSelectionError(query, f"Unexpected '{token}'")
+        return ("term", token)
+
+    node = parse_or()
+    if pos < len(tokens):
+        raise InvalidSelectionError(query, f"Unexpected '{tokens[pos]}'")
+    return node
+
+def tokenize(query: str) -> list[str]:
+    tokens = []
+    for match in TOKEN_RE.finditer(query.lower()):
+        tokens.append(match.group(1) or match.group(2))
+    return tokens
+
+class InvalidSelectionError(StitchjobException):
+    def __init__(self, query: str, reason: str = ""):
+        super().__init__("Invalid selection query", query, reason)
@@ -1,71 +1,140 @@
 import argparse
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
 import logging
+import math
+import os
 from pathlib import Path
 import re
+import shutil
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
+from typing import Iterable, Iterator, TextIO
 
-def escape_tex(text: str) -> str:
-    special = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',  # this will be skipped inside math
-        '#': r'\#',
-        '_': r'\_',
-        '~': r'\textasciitilde{}',
-        '^': r'\^{}',
-    }
-
-    # Pattern to match inline math like $...$
-    math_pattern = re.compile(r'\$(.+?)\$')
-
-    # Split text into segments: math and non-math
-    parts = []
-    last_end = 0
-
-    for match in math_pattern.finditer(text):
-        # Text before math → escape
-        before = text[last_end:match.start()]
-        for char, replacement in special.items():
-            if char == '$':
-                continue  # don't escape $ outside math yet
-            before = before.replace(char, replacement)
-        before = before.replace('$', r'\$')  # escape remaining dollar signs outside math
-
-        # Math content → leave as-is
-        math = match.group(0)  # includes surrounding $...$
-
-        parts.append(before)
-        parts.append(math)
-        last_end = match.end()
-
-    # Handle the tail (after last match)
-    after = text[last_end:]
-    for char, replacement in special.items():
-        if char == '$':
-            continue
-        after = after.replace(char, replacement)
-    after = after.replace('$', r'\$')
-
-    parts.append(after)
-
-    return ''.join(parts)
+try:
+    import resource
+except ModuleNotFoundError:     # Not on Windows
+    resource = None
+
+from stitchjob import timings
+from stitchjob.timings import span
+
+# The umask can only be read by setting it, so it's read once
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+# Characters escaped outside of math mode. None of the replacements contain
+# any of the characters, so the order in which they are applied is irrelevant.
+TEX_SPECIALS = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '~': r'\textasciitilde{}',
+    '^': r'\^{}',
+}
+
+# Inline math like $...$; the capturing group makes re.split() alternate
+# between non-math and math segments.
+TEX_MATH = re.compile(r'(\$.+?\$)')
+
+# "Output written on resume.pdf (2 pages, 54321 bytes)."
+PDFLATEX_PAGES = re.compile(rb"Output written on .*?\((\d+) pages?")
+PDFLATEX_TAIL_LINES = 10
+
+# "l.42 \item Built the \foo", the line of an error read up to the error
+TEX_ERROR_LINE = re.compile(r"l\.(\d+) (.*)")
+TEX_ERROR_LINES = 16
+
+TEX_DOUBLE_QUOTES = re.compile(r'"(.+?)"')
+TEX_SINGLE_QUOTES = re.compile(r"'(.+?)'")
+
+def escape_tex(text: str, smarten_quotes: bool = False) -> str:
+    """Escape LaTeX special characters in TEXT, leaving inline math alone.
+
+    If SMARTEN_QUOTES is true, also convert straight quotes to TeX quotes, as
+    `smarten_tex_quotes()` does."""
+    if timings.enabled:
+        # Checked here rather than left to span(), as this is called for
+        # every field of the resume
+        with span("escape"):
+            return _escape_tex(text, smarten_quotes)
+    return _escape_tex(text, smarten_quotes)
+
+def _escape_tex(text: str, smarten_quotes: bool) -> str:
+    if '$' in text:
+        parts = TEX_MATH.split(text)
+        # Even-numbered parts are outside of math mode
+        parts[::2] = [escape_tex_specials(part) for part in parts[::2]]
+        text = ''.join(parts)
+    else:
+        text = escape_tex_specials(text)
+
+    if smarten_quotes:
+        return smarten_tex_quotes(text)
+    return text
+
+def escape_tex_specials(text: str) -> str:
+    # Checking for the character first is much cheaper than a replace() that
+    # finds nothing, and most text contains few, if any, special characters.
+    for char, replacement in TEX_SPECIALS.items():
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
 
 def smarten_tex_quotes(text: str) -> str:
-    text = re.sub(r'"(.+?)"', r"``\1''", text)
-    text = re.sub(r"'(.+?)'", r"`\1'", text)
+    if '"' in text:
+        text = TEX_DOUBLE_QUOTES.sub(r"``\1''", text)
+    if "'" in text:
+        text = TEX_SINGLE_QUOTES.sub(r"`\1'", text)
     return text
 
 def write_tex(tex_path: Path, text: str) -> bool:
+    with open_tex(tex_path) as out:
+        out.write(text)
+    return True
+
+@contextmanager
+def open_tex(tex_path: Path) -> Iterator[TextIO]:
+    """Open TEX_PATH for writing, yielding the file to stream TeX into.
+
+    If an exception interrupts the writing, the incomplete file is removed so
+    that it doesn't look up to date."""
     try:
         logging.debug(f"Writing to TeX file '{tex_path}'")
         tex_path.parent.mkdir(parents=True, exist_ok=True)
-        tex_path.write_text(text, encoding="utf-8")
-        return True
+        out = tex_path.open("w", encoding="utf-8")
     except PermissionError as e:
         raise CannotWriteToTeXFileError(tex_path, "Permission denied") from e
 
-def latex_metadata() -> str:
+    with out:
+        try:
+            yield out
+        except BaseException:
+            out.close()
+            tex_path.unlink(missing_ok=True)
+            raise
+
+def user_cache_dir() -> Path:
+    """Return the per-user cache directory for Stitchjob."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "stitchjob"
+
+def latex_metadata(draft: bool = False) -> str:
+    """Return the LaTeX that precedes `\\documentclass`.
+
+    Final documents are tagged and PDF/UA compliant. Drafts skip the tagging,
+    which dominates the compile time, and write uncompressed PDFs; tagging
+    commands used by `stitched.cls` are defined to do nothing."""
+    if draft:
+        return r"""\pdfcompresslevel=0
+\pdfobjcompresslevel=0
+\providecommand\tagtool[1]{}"""
     text = r"""\DocumentMetadata{
   testphase={phase-III,firstaid},
   lang=en_US,
@@ -74,31 +143,248 @@ def latex_metadata() -> str:
 }"""
     return text
 
-def maybe_compile_pdf(tex_path: Path) -> Path | None:
+def maybe_compile_pdf(tex_path: Path, fmt: Path | None = None,
+                      assets: Iterable[Path] = ()) -> Path:
+    """Compile TEX_PATH like `compile_pdf()`, retrying without the precompiled
+    format FMT if compiling with it fails."""
     try:
         logging.debug("Compiling PDF file...")
-        pdf_path = compile_pdf(tex_path)
-    except subprocess.CalledProcessError as e:
-        logging.error(e.stdout.decode(errors="replace"))
-        logging.error(e.stderr.decode(errors="replace"))
-        sys.exit(1)
+        pdf_path = compile_pdf(tex_path, fmt, assets)
+    except CannotCompilePDFError as e:
+        if fmt and not e.timed_out:
+            logging.warning("Compiling with precompiled format failed, retrying without it")
+            return maybe_compile_pdf(tex_path, assets=assets)
+        logging.debug("Last lines of pdflatex output:\n" + "\n".join(e.log))
+        raise
     else:
         logging.debug(f"PDF file '{pdf_path}' compiled")
         return pdf_path.resolve()
 
-def compile_pdf(tex_path: Path) -> Path:
+def compile_pdf(tex_path: Path, fmt: Path | None = None,
+                assets: Iterable[Path] = ()) -> Path:
+    """Compile TEX_PATH with pdflatex, using the precompiled format FMT if given.
+
+    pdflatex runs in a private scratch directory, so that builds running in
+    parallel next to each other don't clobber each other's `.aux` and `.log`
+    files. TEX_PATH and ASSETS, such as the document class or images, are
+    linked into it; anything else is looked up next to TEX_PATH. Only the
+    finished PDF is moved next to TEX_PATH."""
+    pdf_path = tex_path.with_suffix(".pdf")
+    with run_pdflatex(tex_path, fmt, assets) as (scratch, _):
+        install_file(scratch / pdf_path.name, pdf_path)
+    return pdf_path
+
+def count_pdf_pages(tex_path: Path, fmt: Path | None = None,
+                    assets: Iterable[Path] = ()) -> int:
+    """Compile TEX_PATH like `compile_pdf()`, but only return the number of
+    pages, without keeping the PDF."""
+    with run_pdflatex(tex_path, fmt, assets) as (_, log):
+        # pdflatex wraps its output at 79 columns, possibly within the message
+        match = PDFLATEX_PAGES.search("".join(log[-PDFLATEX_TAIL_LINES:]).encode())
+    return int(match.group(1)) if match else 0
+
+@contextmanager
+def run_pdflatex(tex_path: Path, fmt: Path | None = None,
+                 assets: Iterable[Path] = ()) -> Iterator[tuple[Path, list[str]]]:
+    """Run pdflatex on TEX_PATH in a scratch directory, yielding the directory
+    and the last lines of its output; see `compile_pdf()` and `run_supervised()`."""
     resolved_tex_path = tex_path.resolve()
-    result = subprocess.run(
-        ["pdflatex",
-         "-interaction=nonstopmode",
-         f"-output-directory={resolved_tex_path.parent}",
-         resolved_tex_path.name],
-        check=True,
-        cwd=resolved_tex_path.parent,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    return tex_path.with_suffix(".pdf")
+    with tempfile.TemporaryDirectory(prefix="stitchjob-", dir=scratch_root()) as scratch:
+        scratch = Path(scratch)
+        for path in (resolved_tex_path, *assets):
+            link_or_copy(Path(path), scratch / Path(path).name)
+        env = dict(os.environ,
+                   TEXINPUTS=os.pathsep.join([str(resolved_tex_path.parent),
+                                              os.environ.get("TEXINPUTS", "")]))
+        with span("pdflatex"):
+            log = run_supervised(
+                pdflatex_command(resolved_tex_path.name, fmt, output_dir=scratch),
+                cwd=scratch,
+                env=env,
+                name=tex_path,
+            )
+        yield scratch, log
+
+def pdflatex_command(name: str, fmt: Path | None = None,
+                     output_dir: Path | None = None) -> list[str]:
+    """Return the command running pdflatex on the file NAME, stopping at the
+    first error, with the format FMT if given."""
+    return ["pdflatex",
+            "-interaction=nonstopmode",
+            "-halt-on-error",
+            *([f"-fmt={fmt}"] if fmt else []),
+            *([f"-output-directory={output_dir}"] if output_dir else []),
+            name]
+
+@dataclass
+class PdflatexLimits:
+    """Limits on each pdflatex run: wall-clock TIMEOUT and CPU time in
+    seconds, address space in MEMORY megabytes (None for no limit), and the
+    number of LOG_LINES of output kept."""
+    timeout: float | None = 120
+    memory: int | None = 2048
+    log_lines: int = 200
+
+pdflatex_limits = PdflatexLimits()
+
+def run_supervised(command: list[str], cwd: Path, env: dict[str, str] | None = None,
+                   name: str | Path = "pdflatex",
+                   limits: PdflatexLimits | None = None) -> list[str]:
+    """Run the pdflatex COMMAND in CWD within LIMITS (`pdflatex_limits` by
+    default) and return the last lines of its output.
+
+    The output is streamed into a ring buffer rather than kept whole, and the
+    first TeX error is picked out of it as it goes by. The process gets no
+    input, so it can't wait for any, and runs in its own process group, which
+    is killed if it outlives the timeout. Raises `CannotCompilePDFError`,
+    naming NAME, if the run fails or times out."""
+    limits = limits or pdflatex_limits
+    log = TexLog(limits.log_lines)
+    timed_out = threading.Event()
+
+    def kill() -> None:
+        timed_out.set()
+        kill_process_group(process)
+
+    try:
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+    except OSError as e:
+        raise CannotCompilePDFError(name, f"Cannot run {command[0]}: {e.strerror}") from e
+    limit_resources(process.pid, limits)
+    timer = threading.Timer(limits.timeout, kill) if limits.timeout else None
+    try:
+        if timer:
+            timer.start()
+        with process.stdout:
+            for raw in process.stdout:
+                log.add(raw)
+        process.wait()
+    finally:
+        if timer:
+            timer.cancel()
+        if process.poll() is None:
+            kill_process_group(process)
+            process.wait()
+
+    if timed_out.is_set():
+        raise CannotCompilePDFError(name, f"Timed out after {limits.timeout} s",
+                                    log=list(log.lines), timed_out=True)
+    if process.returncode != 0:
+        raise CannotCompilePDFError(name, log=list(log.lines), tex_error=log.tex_error())
+    return list(log.lines)
+
+class TexLog:
+    """The last SIZE lines of the output of pdflatex, with the first TeX
+    error picked out of them as they go by."""
+    def __init__(self, size: int):
+        self.lines: deque[str] = deque(maxlen=size)
+        self.error_lines: list[str] = []
+
+    def add(self, raw: bytes) -> None:
+        line = raw.decode(errors="replace").rstrip("\r\n")
+        self.lines.append(line)
+        # Keep the first error with enough of what follows to find its line
+        if self.error_lines and len(self.error_lines) < TEX_ERROR_LINES:
+            self.error_lines.append(line)
+        elif not self.error_lines and line.startswith("!"):
+            self.error_lines.append(line)
+
+    def tex_error(self) -> "TexError | None":
+        return parse_tex_error(self.error_lines or self.lines)
+
+def limit_resources(pid: int, limits: PdflatexLimits) -> None:
+    """Limit the memory and CPU time of process PID, where the platform allows."""
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    try:
+        if limits.memory:
+            memory = limits.memory * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (memory, memory))
+        if limits.timeout:
+            seconds = math.ceil(limits.timeout)
+            resource.prlimit(pid, resource.RLIMIT_CPU, (seconds, seconds + 1))
+    except (OSError, ValueError) as e:
+        # Already exited, or the limit is above the hard limit
+        logging.debug(f"Cannot limit resources of pdflatex: {e}")
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+@dataclass
+class TexError:
+    """The first error in the output of pdflatex: its MESSAGE, the LINE of
+    the .tex file, and the CONTEXT of that line read up to the error. SOURCE
+    describes where in the input the line came from, if known."""
+    message: str
+    line: int | None = None
+    context: str = ""
+    source: str = ""
+
+    def __str__(self):
+        text = self.message
+        if self.line:
+            text += f" (line {self.line}: {self.context.strip()})"
+        if self.source:
+            text += f" in {self.source}"
+        return text
+
+def parse_tex_error(lines: Iterable[str]) -> TexError | None:
+    """Return the first error in LINES of pdflatex output, if any."""
+    error = None
+    for line in lines:
+        if error is None:
+            if line.startswith("!"):
+                error = TexError(line.lstrip("! ").strip())
+        elif match := TEX_ERROR_LINE.match(line):
+            error.line = int(match.group(1))
+            error.context = match.group(2)
+            break
+    return error
+
+def scratch_root() -> str | None:
+    """Return the directory for scratch builds: tmpfs if available, unless
+    TMPDIR is set, or None for the system default."""
+    if "TMPDIR" not in os.environ and os.access("/dev/shm", os.W_OK | os.X_OK):
+        return "/dev/shm"
+    return None
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    try:
+        dst.symlink_to(Path(src).resolve())
+    except OSError:
+        shutil.copy(src, dst)
+
+def make_temp_file(path: Path, suffix: str = ".tmp") -> Path:
+    """Create an empty file next to PATH, to be renamed over it once written.
+
+    Its name is unique even among threads, which share a pid, and it gets the
+    permissions a new file would."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=suffix, dir=path.parent)
+    os.close(fd)
+    os.chmod(name, 0o666 & ~UMASK)
+    return Path(name)
+
+def install_file(src: Path, dst: Path) -> None:
+    """Copy SRC to DST atomically, so that DST is never seen half-written.
+
+    The copy goes to a temporary file next to DST first, since SRC may be on
+    a different file system."""
+    temp_path = make_temp_file(dst)
+    try:
+        shutil.copyfile(src, temp_path)
+        os.replace(temp_path, dst)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
 
 def maybe_open_pdf(pdf_path: Path) -> bool | None:
     try:
@@ -112,14 +398,15 @@ def maybe_open_pdf(pdf_path: Path) -> bool | None:
         return result
 
 def open_pdf(pdf_path: Path) -> bool:
-    result = subprocess.run(
-        ["open",
-         pdf_path],
-         check=True,
-         cwd=pdf_path.parent,
-         stdout=subprocess.PIPE,
-         stderr=subprocess.PIPE
-    )
+    with span("open"):
+        result = subprocess.run(
+            ["open",
+             pdf_path],
+             check=True,
+             cwd=pdf_path.parent,
+             stdout=subprocess.PIPE,
+             stderr=subprocess.PIPE
+        )
     if result.returncode != 0:
         return False
     return True
@@ -146,3 +433,18 @@ class CannotWriteToTeXFileError(StitchjobException):
 class CannotReadResumeFileError(StitchjobException):
     def __init__(self, filename: str | Path, reason: str = ""):
         super().__init__("Cannot read XML resume file", filename, reason)
+
+class CannotCompilePDFError(StitchjobException):
+    """Raised when pdflatex fails; TEX_ERROR is the first error in its output,
+    and LOG the last lines of it."""
+    def __init__(self, filename: str | Path, reason: str = "", log: list[str] = (),
+                 tex_error: TexError | None = None, timed_out: bool = False):
+        self.log = list(log)
+        self.tex_error = tex_error
+        self.timed_out = timed_out
+        super().__init__("Cannot compile PDF", filename, reason)
+
+    def __str__(self):
+        if not self.reason and self.tex_error:
+            return f"{self.message}: {self.filename}: {self.tex_error}"
+        return super().__str__()
@@ -0,0 +1,104 @@
+"""Snapshots of parsed resumes, so that large master resumes load faster.
+
+A snapshot is the parsed (and whitespace-normalized) `Resume`, pickled into
+`~/.cache/stitchjob/snapshots/`, one per resume file. It is only used if the
+path, size, modification time, and SHA-256 hash of the file all match those
+it was taken from; otherwise the file is parsed and the snapshot replaced.
+The key is stored ahead of the resume, so a stale snapshot is rejected
+without unpickling the resume. Only the MAX_SNAPSHOTS most recently used
+snapshots are kept, so those of resumes that are gone don't pile up.
+
+The snapshots are only ever read from the user's own cache directory, which
+is what makes unpickling them safe.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+
+from stitchjob.shared import *
+from stitchjob.stitch_resume import Resume
+
+# Bump whenever the resume object model changes
+SNAPSHOT_VERSION = 2
+
+MAX_SNAPSHOTS = 64
+
+def load_resume(path: Path, use_snapshot: bool = True) -> Resume:
+    """Return the resume at PATH, from its snapshot if that is up to date."""
+    if not use_snapshot:
+        return Resume(path)
+    path = Path(path).resolve()
+    try:
+        stat = path.stat()
+        data = path.read_bytes()
+    except FileNotFoundError as e:
+        raise CannotReadResumeFileError(path, "File not found") from e
+    except PermissionError as e:
+        raise CannotReadResumeFileError(path, "Permission denied") from e
+    key = (SNAPSHOT_VERSION, str(path), stat.st_size, stat.st_mtime_ns,
+           hashlib.sha256(data).hexdigest())
+
+    snapshot_path = snapshot_dir() / f"{hashlib.sha256(str(path).encode()).hexdigest()[:32]}.pickle"
+    resume = read_snapshot(snapshot_path, key)
+    if resume is not None:
+        logging.debug(f"Loaded resume from snapshot '{snapshot_path}'")
+        try:
+            # Marks the snapshot as recently used for prune_snapshots()
+            os.utime(snapshot_path)
+        except OSError:
+            pass
+        return resume
+
+    resume = Resume.from_string(data, str(path))
+    write_snapshot(snapshot_path, key, resume)
+    prune_snapshots(snapshot_path.parent)
+    return resume
+
+def snapshot_dir() -> Path:
+    return user_cache_dir() / "snapshots"
+
+def read_snapshot(snapshot_path: Path, key: tuple) -> Resume | None:
+    """Return the resume in the snapshot at SNAPSHOT_PATH if it was taken with KEY."""
+    try:
+        with open(snapshot_path, "rb") as f:
+            if pickle.load(f) != key:
+                logging.debug(f"Snapshot '{snapshot_path}' is out of date")
+                return None
+            resume = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Truncated, or taken with an incompatible version of Stitchjob
+        logging.debug(f"Cannot read snapshot '{snapshot_path}': {e!r}")
+        return None
+    return resume if isinstance(resume, Resume) else None
+
+def write_snapshot(snapshot_path: Path, key: tuple, resume: Resume) -> None:
+    temp_path = None
+    try:
+        temp_path = make_temp_file(snapshot_path)
+        with open(temp_path, "wb") as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(resume, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, snapshot_path)
+    except OSError as e:
+        if temp_path:
+            temp_path.unlink(missing_ok=True)
+        logging.debug(f"Cannot write snapshot '{snapshot_path}': {e}")
+    else:
+        logging.debug(f"Wrote snapshot '{snapshot_path}'")
+
+def prune_snapshots(directory: Path, keep: int = MAX_SNAPSHOTS) -> None:
+    """Remove all but the KEEP most recently used snapshots in DIRECTORY."""
+    try:
+        snapshots = [(path.stat().st_mtime_ns, path) for path in directory.glob("*.pickle")]
+    except OSError:
+        return
+    if len(snapshots) <= keep:
+        return
+    for _, path in sorted(snapshots, reverse=True)[keep:]:
+        logging.debug(f"Removing snapshot '{path}'")
+        path.unlink(missing_ok=True)
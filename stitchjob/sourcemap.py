@@ -0,0 +1,126 @@
+"""Map the line of a pdflatex error back to the resume XML it came from.
+
+The generated .tex file keeps no record of where each line came from, so the
+line is matched against the LaTeX of every field of the resume, preferring the
+field that spans the point where pdflatex stopped reading. The XML element
+with that field is then found by its text with expat, which, unlike
+ElementTree, reports line numbers. This is only done when a build fails.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+import re
+from xml.parsers import expat
+
+from stitchjob.shared import *
+from stitchjob.stitch_resume import Degree, Description, Experience, Resume, SkillSection
+
+# Fields shorter than this are too likely to match by accident
+MIN_MATCH = 4
+
+@dataclass
+class Field:
+    tag: str
+    text: str
+    attribute: str | None = None
+
+def locate_tex_error(error: CannotCompilePDFError, resume: Resume, tex_path: Path,
+                     xml_path: Path | None = None) -> None:
+    """Set the source of the TeX error of ERROR, compiling TEX_PATH (the LaTeX
+    of RESUME), to the field of RESUME, and the line of XML_PATH, it came from."""
+    tex_error = error.tex_error
+    if tex_error is None or tex_error.line is None:
+        return
+    try:
+        line = tex_path.read_text(encoding="utf-8").splitlines()[tex_error.line - 1]
+    except (OSError, IndexError):
+        return
+    field = match_field(resume, line, tex_error.context)
+    if field is None:
+        return
+    where = f"<{field.tag}{f' {field.attribute}' if field.attribute else ''}>"
+    xml_line = find_xml_line(xml_path, field) if xml_path else None
+    if xml_line:
+        tex_error.source = f"{where} at {xml_path.name}:{xml_line}"
+    else:
+        tex_error.source = f"{where} '{field.text[:40]}'"
+
+def match_field(resume: Resume, line: str, context: str = "") -> Field | None:
+    """Return the field of RESUME whose LaTeX is on LINE, preferring the one
+    spanning the end of CONTEXT, the part of LINE pdflatex had read."""
+    # Long lines are shown by pdflatex with "..." in place of their beginning
+    read = context.rstrip().removeprefix("...")
+    stop = line.find(read) + len(read) if read and read in line else None
+    best, best_length = None, 0
+    for field in resume_fields(resume):
+        if len(field.text) < MIN_MATCH:
+            continue
+        for latex in {escape_tex(field.text), escape_tex(field.text, smarten_quotes=True)}:
+            start = line.find(latex)
+            if start < 0:
+                continue
+            if stop is not None and start < stop <= start + len(latex):
+                return field
+            if len(latex) > best_length:
+                best, best_length = field, len(latex)
+    return best
+
+def resume_fields(resume: Resume):
+    """Yield the fields of RESUME that are rendered to LaTeX."""
+    for key, val in resume.contact.items():
+        if val:
+            yield Field(key, val)
+    for section in resume.sections:
+        yield Field("section", section.heading, "heading")
+        for child in section.children:
+            if isinstance(child, Experience):
+                for name in ("title", "organization", "location", "blurb"):
+                    yield Field(name, getattr(child, name))
+                yield Field("experience", child.begin, "begin")
+                yield Field("experience", child.end, "end")
+                for item in child.items:
+                    yield Field("item", item)
+            elif isinstance(child, Degree):
+                for name in ("date", "type", "field", "school", "location"):
+                    yield Field(name, getattr(child, name))
+            elif isinstance(child, SkillSection):
+                for skill in child.skills:
+                    yield Field("skill", skill.name or "")
+            elif isinstance(child, Description):
+                yield Field("description", child.text or "")
+
+def find_xml_line(xml_path: Path, field: Field) -> int | None:
+    """Return the line of the first element of XML_PATH with the text (or
+    attribute) of FIELD."""
+    found: list[int] = []
+    stack: list[tuple[str, int, list[str]]] = []
+    parser = expat.ParserCreate()
+
+    def start(tag, attributes):
+        if not found and field.attribute and tag == field.tag \
+           and normalize(attributes.get(field.attribute, "")) == field.text:
+            found.append(parser.CurrentLineNumber)
+        stack.append((tag, parser.CurrentLineNumber, []))
+
+    def end(tag):
+        tag, line, text = stack.pop()
+        if not found and not field.attribute and tag == field.tag \
+           and normalize("".join(text)) == field.text:
+            found.append(line)
+
+    def data(text):
+        if stack:
+            stack[-1][2].append(text)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    try:
+        with open(xml_path, "rb") as f:
+            parser.ParseFile(f)
+    except (OSError, expat.ExpatError):
+        return None
+    return found[0] if found else None
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
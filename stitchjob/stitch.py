@@ -1,20 +1,42 @@
 import argparse
+from importlib import import_module
 import logging
+import sys
 
-from stitchjob.stitch_resume import stitch_resume
-from stitchjob.stitch_letter import stitch_letter
-from stitchjob.shared import *
+from stitchjob.shared import StitchjobException, pdflatex_limits
+from stitchjob.timings import instrumented, span
+
+# Subcommand modules are only imported when dispatched to, so that, for
+# example, `stitch resume` doesn't pay for loading Mako and frontmatter.
+COMMANDS = {
+    "resume": "stitchjob.stitch_resume",
+    "letter": "stitchjob.stitch_letter",
+    "batch": "stitchjob.stitch_batch",
+    "watch": "stitchjob.stitch_watch",
+    "serve": "stitchjob.stitch_serve",
+    "rank": "stitchjob.stitch_rank",
+}
+
+# Subcommands that `--remote` can send to a `stitch serve` daemon
+REMOTE_COMMANDS = ("resume", "letter")
+DEFAULT_ADDRESS = "127.0.0.1:8765"
 
 def main(argv=None):
     try:
         args = parse_args(argv)
         log_level = logging.DEBUG if args.verbose else logging.INFO
         log_setup(log_level)
+        pdflatex_limits.timeout = args.latex_timeout or None
+        pdflatex_limits.memory = args.latex_memory or None
 
-        if args.command == "resume":
-            stitch_resume(args)
-        elif args.command == "letter":
-            stitch_letter(args)
+        with instrumented(args):
+            if args.remote and args.command in REMOTE_COMMANDS:
+                from stitchjob.remote import run_remote
+                if run_remote(args):
+                    return
+            with span("import"):
+                module = import_module(COMMANDS[args.command])
+            getattr(module, f"stitch_{args.command}")(args)
     except StitchjobException as e:
         log_error_and_exit(e)
     except Exception as e:
@@ -26,6 +48,24 @@ def parse_args(argv=None) -> argparse.Namespace:
     )
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Enable verbose logging")
+    parser.add_argument("--timings", action="store_true",
+                        help="Report how long each phase of the build took")
+    parser.add_argument("--timings-json", metavar="FILE",
+                        help="Write the timings of build phases to FILE as JSON")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Write a cProfile profile of the run to FILE")
+    parser.add_argument("--remote", metavar="ADDRESS", nargs="?", const=DEFAULT_ADDRESS,
+                        help=f"Send resume and letter builds to a `stitch serve` \
+                        daemon (default: {DEFAULT_ADDRESS}), building locally if \
+                        it's not running")
+    parser.add_argument("--latex-timeout", type=float, metavar="SECONDS",
+                        default=pdflatex_limits.timeout,
+                        help=f"Kill pdflatex runs taking longer than SECONDS, \
+                        0 for no limit (default: {pdflatex_limits.timeout:g})")
+    parser.add_argument("--latex-memory", type=int, metavar="MB",
+                        default=pdflatex_limits.memory,
+                        help=f"Limit the memory of pdflatex runs to MB megabytes, \
+                        0 for no limit (default: {pdflatex_limits.memory})")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # Resume subcommand
@@ -36,6 +76,37 @@ def parse_args(argv=None) -> argparse.Namespace:
                                help="Compile the .tex file to PDF using pdflatex")
     resume_parser.add_argument("-P", "--openpdf", action="store_true",
                                help="Compile the .tex file to PDF and open it")
+    resume_parser.add_argument("-o", "--output", type=str,
+                               help="Output .tex file (default: input with .tex suffix)")
+    resume_parser.add_argument("--format", type=parse_formats, default=["tex"],
+                               metavar="FORMATS",
+                               help="Comma-separated formats to write: tex, txt, json, \
+                               html (default: tex)")
+    resume_parser.add_argument("--base", metavar="XML",
+                               help="Master XML file to apply overlays to (same as input)")
+    resume_parser.add_argument("--overlay", action="append", metavar="FILE",
+                               help="YAML file of edits to the master; may be repeated, \
+                               building each variant next to its overlay")
+    resume_parser.add_argument("--select", metavar="QUERY",
+                               help="Only include the parts tagged to match QUERY, \
+                               e.g. \"python and (backend or infra)\"")
+    resume_parser.add_argument("--fit-pages", type=int, metavar="N",
+                               help="Drop the last items of the longest experiences \
+                               until the resume fits on N pages")
+    resume_parser.add_argument("--no-snapshot", action="store_false", dest="snapshot",
+                               help="Parse the XML even if a snapshot of it is cached")
+    resume_parser.add_argument("--precompile", action="store_true",
+                               help="Compile using a cached, precompiled format of \
+                               the preamble")
+    resume_mode = resume_parser.add_mutually_exclusive_group()
+    resume_mode.add_argument("--draft", action="store_true",
+                             help="Fast preview build without PDF tagging")
+    resume_mode.add_argument("--final", action="store_false", dest="draft",
+                             help="Fully tagged, accessible build (default)")
+    resume_parser.add_argument("--force", action="store_true",
+                               help="Rebuild even if the build cache says outputs are up to date")
+    resume_parser.add_argument("--cache-stats", action="store_true",
+                               help="Report build cache hits and misses")
 
     # Letter subcommand
     letter_parser = subparsers.add_parser("letter",
@@ -51,15 +122,123 @@ def parse_args(argv=None) -> argparse.Namespace:
                                default="letter/signature.png",
                                help="Image of the signature to use \
                                (default: letter/signature.png)")
+    letter_parser.add_argument("-t", "--template-dir", action="append",
+                               help="Directory with templates overriding the built-in \
+                               letter.mako (can be repeated)")
     letter_parser.add_argument("-o", "--output", type=str,
-                               help="Output LaTeX file (default: <input>.tex)")
+                               help="Output LaTeX file (default: <input>.tex), or \
+                               directory with --merge")
+    letter_parser.add_argument("--merge", metavar="CSV",
+                               help="Build one letter per row of CSV, whose columns \
+                               override the front matter")
+    letter_parser.add_argument("-j", "--jobs", type=int, default=None,
+                               help="Number of PDFs to compile in parallel with --merge \
+                               (default: number of CPUs)")
     letter_parser.add_argument("-p", "--pdf", action="store_true",
                                help="Compile the .tex file to PDF using pdflatex")
     letter_parser.add_argument("-P", "--openpdf", action="store_true",
                                help="Compile the .tex file to PDF and open it")
+    letter_mode = letter_parser.add_mutually_exclusive_group()
+    letter_mode.add_argument("--draft", action="store_true",
+                             help="Fast preview build without PDF tagging")
+    letter_mode.add_argument("--final", action="store_false", dest="draft",
+                             help="Fully tagged, accessible build (default)")
+    letter_parser.add_argument("--force", action="store_true",
+                               help="Rebuild even if the build cache says outputs are up to date")
+    letter_parser.add_argument("--cache-stats", action="store_true",
+                               help="Report build cache hits and misses")
+
+    # Batch subcommand
+    batch_parser = subparsers.add_parser("batch",
+                                         help="Build every resume and letter in a manifest")
+    batch_parser.add_argument("manifest",
+                              help="Manifest of jobs (.toml, .json, or .csv)")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=None,
+                              help="Number of parallel workers (default: number of CPUs)")
+    batch_parser.add_argument("-p", "--pdf", action="store_true",
+                              help="Compile every job to PDF using pdflatex")
+    batch_parser.add_argument("--force", action="store_true",
+                              help="Rebuild even if the build cache says outputs are up to date")
+
+    # Watch subcommand
+    watch_parser = subparsers.add_parser("watch",
+                                         help="Rebuild resume and letter whenever inputs change")
+    watch_parser.add_argument("-r", "--resume", type=str, default="resume/resume.xml",
+                              help="XML resume file (default: resume/resume.xml)")
+    watch_parser.add_argument("-l", "--letter", type=str, default="letter/letter.md",
+                              help="Markdown letter file, built if it exists \
+                              (default: letter/letter.md)")
+    watch_parser.add_argument("-s", "--signature", action="store_true",
+                              help="Include graphic signature in the letter")
+    watch_parser.add_argument("-S", "--signature_image", type=str,
+                              default="letter/signature.png",
+                              help="Image of the signature to use \
+                              (default: letter/signature.png)")
+    watch_parser.add_argument("-t", "--template-dir", action="append",
+                              help="Directory with templates overriding the built-in \
+                              letter.mako (can be repeated)")
+    watch_parser.add_argument("-p", "--pdf", action="store_true",
+                              help="Compile the .tex files to PDF using pdflatex")
+    watch_mode = watch_parser.add_mutually_exclusive_group()
+    watch_mode.add_argument("--draft", action="store_true",
+                            help="Fast preview builds without PDF tagging")
+    watch_mode.add_argument("--final", action="store_false", dest="draft",
+                            help="Fully tagged, accessible builds (default)")
+    watch_parser.add_argument("--debounce", type=float, default=0.2,
+                              help="Seconds to wait for more changes before \
+                              rebuilding (default: 0.2)")
+    watch_parser.add_argument("--poll", action="store_true",
+                              help="Poll for changes instead of using inotify")
+    watch_parser.add_argument("--interval", type=float, default=0.5,
+                              help="Polling interval in seconds (default: 0.5)")
+
+    # Serve subcommand
+    serve_parser = subparsers.add_parser("serve",
+                                         help="Run a daemon that builds jobs sent over a socket")
+    serve_parser.add_argument("--listen", metavar="ADDRESS", default=DEFAULT_ADDRESS,
+                              help=f"HOST:PORT or unix:PATH to listen on \
+                              (default: {DEFAULT_ADDRESS})")
+    serve_parser.add_argument("--allow-remote", action="store_true",
+                              help="Listen on addresses other than a Unix socket or \
+                              loopback, accepting unauthenticated jobs from the network")
+    serve_parser.add_argument("-j", "--jobs", type=int, default=None,
+                              help="Number of parallel workers (default: number of CPUs)")
+    serve_parser.add_argument("--precompile", action="store_true",
+                              help="Precompile the resume format at start-up and use \
+                              it for all resumes")
+
+    # Rank subcommand
+    rank_parser = subparsers.add_parser("rank",
+                                        help="Rank resume bullets by relevance to a job posting")
+    rank_parser.add_argument("posting", help="Text of the job posting")
+    rank_parser.add_argument("resume", nargs="?", default="resume/resume.xml",
+                             help="Master XML resume (default: resume/resume.xml)")
+    rank_parser.add_argument("-n", "--top", type=int, default=20,
+                             help="Number of top-ranked parts to list (default: 20)")
+    rank_parser.add_argument("-k", "--keep", type=int, default=None,
+                             help="Write a resume keeping the KEEP best items of each \
+                             experience")
+    rank_parser.add_argument("-o", "--output", type=str,
+                             help="Output .tex file with --keep (default: <posting>.tex)")
+    rank_parser.add_argument("-p", "--pdf", action="store_true",
+                             help="Compile the pruned resume to PDF using pdflatex")
+    rank_parser.add_argument("-P", "--openpdf", action="store_true",
+                             help="Compile the pruned resume to PDF and open it")
+    rank_parser.add_argument("--draft", action="store_true",
+                             help="Fast preview build without PDF tagging")
+    rank_parser.add_argument("--force", action="store_true",
+                             help="Rebuild even if the build cache says outputs are up to date")
+    rank_parser.add_argument("--no-snapshot", action="store_false", dest="snapshot",
+                             help="Parse the XML even if a snapshot of it is cached")
+    rank_parser.set_defaults(precompile=False, cache_stats=False)
 
     return parser.parse_args(argv)
 
+def parse_formats(text: str) -> list[str]:
+    # Imported here, as stitchjob.emit loads the resume module
+    from stitchjob.emit import parse_formats
+    return parse_formats(text)
+
 def log_setup(level):
     logging.basicConfig(
         level=level,
@@ -0,0 +1,160 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import dataclass, fields
+import json
+import logging
+import os
+from pathlib import Path
+import time
+import tomllib
+
+from stitchjob.shared import *
+from stitchjob.stitch_letter import determine_tex_path, stitch_letter
+from stitchjob.stitch_resume import resume_tex_path, stitch_resume
+
+MANIFEST_FORMATS = (".toml", ".json", ".csv")
+
+def stitch_batch(args: argparse.Namespace) -> None:
+    manifest_path = Path(args.manifest)
+    logging.debug(f"Reading batch manifest '{manifest_path}'")
+    jobs = read_manifest(manifest_path)
+    for job in jobs:
+        job.pdf = job.pdf or args.pdf
+        job.force = job.force or args.force
+
+    workers = args.jobs or os.cpu_count() or 1
+    logging.debug(f"Building {len(jobs)} job(s) with {workers} worker(s)")
+    results = run_batch(jobs, workers)
+
+    failed = [result for result in results if not result.ok]
+    for result in results:
+        logging.info(str(result))
+    logging.info(f"{len(results) - len(failed)} succeeded, {len(failed)} failed")
+    if failed:
+        sys.exit(1)
+
+@dataclass
+class BatchJob:
+    """One entry of a batch manifest, mirroring the CLI arguments."""
+    command: str
+    input: Path
+    resume: Path | None = None
+    output: Path | None = None
+    pdf: bool = False
+    signature: bool = False
+    signature_image: Path | None = None
+    force: bool = False
+    precompile: bool = False
+    draft: bool = False
+    select: str | None = None
+
+    def to_args(self) -> argparse.Namespace:
+        args = argparse.Namespace(input=self.input, pdf=self.pdf, openpdf=False,
+                                  force=self.force, cache_stats=False, draft=self.draft)
+        if self.command == "resume":
+            args.precompile = self.precompile
+            args.output = self.output
+            args.select = self.select
+        if self.command == "letter":
+            args.resume = self.resume or Path("resume/resume.xml")
+            args.output = self.output
+            args.signature = self.signature
+            args.signature_image = self.signature_image or "letter/signature.png"
+            args.template_dir = None
+        return args
+
+    def outputs(self) -> list[Path]:
+        if self.command == "letter":
+            tex_path = determine_tex_path(self.to_args())
+        else:
+            tex_path = resume_tex_path(self.to_args())
+        if self.pdf:
+            return [tex_path, tex_path.with_suffix(".pdf")]
+        return [tex_path]
+
+@dataclass
+class BatchResult:
+    job: BatchJob
+    ok: bool
+    seconds: float
+    error: str = ""
+
+    def __str__(self):
+        if self.ok:
+            outputs = ", ".join(str(path) for path in self.job.outputs())
+            return f"OK {self.job.input} -> {outputs} ({self.seconds:.2f} s)"
+        return f"FAILED {self.job.input}: {self.error} ({self.seconds:.2f} s)"
+
+def run_batch(jobs: list[BatchJob], workers: int) -> list[BatchResult]:
+    """Build all JOBS on a pool of at most WORKERS processes, in order."""
+    if workers <= 1 or len(jobs) <= 1:
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run_job, jobs))
+
+def run_job(job: BatchJob) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        if job.command == "resume":
+            stitch_resume(job.to_args())
+        elif job.command == "letter":
+            stitch_letter(job.to_args())
+    except Exception as e:
+        return BatchResult(job, False, time.perf_counter() - start, str(e))
+    return BatchResult(job, True, time.perf_counter() - start)
+
+def read_manifest(path: Path) -> list[BatchJob]:
+    """Read batch jobs from a TOML, JSON, or CSV manifest.
+
+    TOML and JSON manifests contain a list of `job` tables (JSON may also be a
+    bare list); CSV manifests have one job per row, with column names matching
+    the keys. Relative paths are interpreted relative to the manifest."""
+    suffix = path.suffix.lower()
+    if suffix not in MANIFEST_FORMATS:
+        raise CannotReadManifestError(path, f"Unknown format '{suffix}'")
+    try:
+        if suffix == ".toml":
+            entries = tomllib.loads(path.read_text(encoding="utf-8")).get("job", [])
+        elif suffix == ".json":
+            entries = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(entries, dict):
+                entries = entries.get("job", [])
+        else:
+            with path.open(newline="", encoding="utf-8") as f:
+                entries = list(csv.DictReader(f))
+    except FileNotFoundError as e:
+        raise CannotReadManifestError(path, "File not found") from e
+    except PermissionError as e:
+        raise CannotReadManifestError(path, "Permission denied") from e
+    except ValueError as e:
+        # json.JSONDecodeError and tomllib.TOMLDecodeError are ValueErrors
+        raise CannotReadManifestError(path, str(e)) from e
+
+    return [make_job(path, n, entry) for n, entry in enumerate(entries, start=1)]
+
+def make_job(manifest_path: Path, n: int, entry: dict) -> BatchJob:
+    known = {f.name for f in fields(BatchJob)}
+    entry = {key: val for key, val in entry.items() if val not in (None, "")}
+    unknown = set(entry) - known
+    if unknown:
+        raise CannotReadManifestError(manifest_path,
+                                      f"Job {n}: unknown key(s) {', '.join(sorted(unknown))}")
+    if entry.get("command") not in ("resume", "letter"):
+        raise CannotReadManifestError(manifest_path,
+                                      f"Job {n}: command must be 'resume' or 'letter'")
+    if "input" not in entry:
+        raise CannotReadManifestError(manifest_path, f"Job {n}: missing input")
+
+    base = manifest_path.parent
+    for key in ("input", "resume", "output", "signature_image"):
+        if key in entry:
+            entry[key] = base / entry[key]
+    for key in ("pdf", "signature", "precompile", "draft", "force"):
+        if isinstance(entry.get(key), str):
+            entry[key] = entry[key].strip().lower() in ("1", "true", "yes", "y")
+    return BatchJob(**entry)
+
+class CannotReadManifestError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot read batch manifest", filename, reason)
@@ -1,44 +1,198 @@
 import argparse
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+import hashlib
 import logging
+import os
 from pathlib import Path
+import re
 import sys
+from typing import TYPE_CHECKING, Iterable
 import xml.etree.ElementTree as ET
 
-import frontmatter
-from frontmatter import Post
-from mako.template import Template
+if TYPE_CHECKING:
+    from mako.lookup import TemplateLookup
+    from mako.template import Template
 
+from stitchjob.cache import BuildCache, build_key, maybe_compile_pdf_cached, open_cached_tex
 from stitchjob.shared import *
-from stitchjob.stitch_resume import Contact, Resume
+from stitchjob.stitch_resume import Contact
+
+LETTER_TEMPLATE = Path(__file__).parent / "letter.mako"
+TEMPLATE_CACHE_SIZE = 32
 
 def stitch_letter(args: argparse.Namespace) -> None:
     input_path = Path(args.input)
     resume_path = Path(args.resume)
 
     logging.debug(f"Parsing Markdown input file '{input_path.name}'")
-    letter = Letter.from_file(input_path)
+    with span("parse"):
+        letter = Letter.from_file(input_path)
 
     logging.debug(f"Getting contact information from '{resume_path.name}'")
-    letter.contact = get_contact_from_resume(resume_path)
+    with span("contact"):
+        letter.contact = get_contact_from_resume(resume_path)
+
+    if getattr(args, "merge", None):
+        merge_letters(letter, args)
+        return
 
     letter.signature_image = determine_signature_image(args, letter)
     if letter.signature_image:
         logging.debug(f"Using signature image '{letter.signature_image.name}'")
 
-    tex = render_tex(letter)
-    tex_path = determine_tex_path(args)
-    write_tex(tex_path, latex_metadata() + tex)
-
-    pdf_path = None
-    if args.pdf or args.openpdf:
-        pdf_path = maybe_compile_pdf(tex_path)
+    pdf_path = build_letter(letter, args)
 
     if args.openpdf and pdf_path:
         maybe_open_pdf(pdf_path)
     elif args.openpdf:
         logging.error("PDF file not generated, cannot open")
 
+def build_letter(letter: "Letter", args: argparse.Namespace,
+                 template: "Template | None" = None) -> Path | None:
+    """Render LETTER to the TeX file given by ARGS and, if requested, compile it.
+
+    Returns the path to the PDF, or None if it was not compiled."""
+    if template is None:
+        with span("template"):
+            template = load_template(template_dirs=args.template_dir or ())
+    with span("render"):
+        tex = render_tex(letter, template)
+    tex_path = determine_tex_path(args)
+    cache = BuildCache(tex_path.parent, force=args.force)
+    with span("write"), open_cached_tex(tex_path, cache, [Path(template.filename)]) as out:
+        out.write(latex_metadata(args.draft) + tex)
+
+    pdf_path = None
+    if args.pdf or args.openpdf:
+        signature_image = None
+        if letter.signature_image:
+            signature_image = Path(args.input).parent / letter.signature_image
+        pdf_key = build_key(out.key, signature_image)
+        pdf_path = maybe_compile_pdf_cached(tex_path, cache, pdf_key,
+                                            assets=[signature_image] if signature_image else [])
+
+    if args.cache_stats:
+        logging.info(cache.stats())
+    return pdf_path
+
+def merge_letters(letter: "Letter", args: argparse.Namespace) -> None:
+    """Build a copy of LETTER for every row of the CSV file `args.merge`.
+
+    The columns of each row override the letter's metadata, except for an
+    optional `output` column naming the row's `.tex` file. The body is
+    escaped once for all rows, and the PDFs are compiled on `args.jobs`
+    threads. An index of the outputs and failures is written next to them."""
+    merge_path = Path(args.merge)
+    rows = read_merge_rows(merge_path)
+    template = load_template(template_dirs=args.template_dir or ())
+    body = escape_tex(letter.content)
+    output_dir = Path(args.output) if args.output else Path(args.input).parent
+    try:
+        # Made up front, as the index is written there even if every row fails
+        output_dir.mkdir(parents=True, exist_ok=True)
+    except PermissionError as e:
+        raise CannotWriteToTeXFileError(output_dir, "Permission denied") from e
+    cache = BuildCache(output_dir, force=args.force)
+
+    results = []
+    tex_paths = set()
+    for n, row in enumerate(rows, start=1):
+        result = MergeResult(n, tex_path=merge_tex_path(args, output_dir, n, row, tex_paths))
+        results.append(result)
+        try:
+            metadata = {**letter.metadata,
+                        **{key: val for key, val in row.items() if key != "output" and val}}
+            row_letter = replace(letter, metadata=metadata)
+            row_letter.signature_image = determine_signature_image(args, row_letter)
+            escaped = replace(row_letter, content=body,
+                              metadata={key: escape_tex(str(val)) for key, val in metadata.items()})
+            with open_cached_tex(result.tex_path, cache, [Path(template.filename)]) as out:
+                out.write(latex_metadata(args.draft) + render_tex(escaped, template, escape=False))
+            if row_letter.signature_image:
+                result.assets = [Path(args.input).parent / row_letter.signature_image]
+            result.key = out.key
+        except StitchjobException as e:
+            result.error = str(e)
+
+    if args.pdf or args.openpdf:
+        to_compile = [result for result in results if not result.error]
+        workers = min(args.jobs or os.cpu_count() or 1, max(len(to_compile), 1))
+        logging.debug(f"Compiling {len(to_compile)} letter(s) with {workers} worker(s)")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for result in to_compile:
+                pool.submit(result.compile, cache)
+
+    index_path = write_merge_index(output_dir / f"{Path(args.input).stem}-merge.csv", results)
+    failed = [result for result in results if result.error]
+    for result in failed:
+        logging.error(f"Row {result.row}: {result.error}")
+    logging.info(f"{len(results) - len(failed)} succeeded, {len(failed)} failed; "
+                 f"index in '{index_path}'")
+    if args.cache_stats:
+        logging.info(cache.stats())
+    if failed:
+        sys.exit(1)
+
+@dataclass
+class MergeResult:
+    row: int
+    tex_path: Path
+    pdf_path: Path | None = None
+    key: str | None = None
+    assets: list[Path] = field(default_factory=list)
+    error: str = ""
+
+    def compile(self, cache: BuildCache) -> None:
+        pdf_key = build_key(self.key, *self.assets)
+        try:
+            self.pdf_path = maybe_compile_pdf_cached(self.tex_path, cache, pdf_key,
+                                                     assets=self.assets)
+        except Exception as e:
+            self.error = str(e)
+
+def read_merge_rows(path: Path) -> list[dict[str, str]]:
+    try:
+        with path.open(newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    except FileNotFoundError as e:
+        raise CannotReadMergeFileError(path, "File not found") from e
+    except PermissionError as e:
+        raise CannotReadMergeFileError(path, "Permission denied") from e
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise CannotReadMergeFileError(path, str(e)) from e
+
+def merge_tex_path(args: argparse.Namespace, output_dir: Path, n: int,
+                   row: dict[str, str], taken: set[Path]) -> Path:
+    """Return the `.tex` file for row N: its `output` column, or the letter's
+    name followed by the company's, made unique among TAKEN."""
+    if row.get("output"):
+        tex_path = (output_dir / row["output"]).with_suffix(".tex")
+    else:
+        slug = re.sub(r"[^a-z0-9]+", "-", str(row.get("company") or "").lower()).strip("-")
+        tex_path = output_dir / f"{Path(args.input).stem}-{slug or f'{n:03}'}.tex"
+    unique, i = tex_path, 2
+    while unique in taken:
+        unique = tex_path.with_stem(f"{tex_path.stem}-{i}")
+        i += 1
+    taken.add(unique)
+    return unique
+
+def write_merge_index(path: Path, results: list["MergeResult"]) -> Path:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["row", "tex", "pdf", "status", "error"])
+        for result in results:
+            writer.writerow([result.row, result.tex_path, result.pdf_path or "",
+                             "failed" if result.error else "ok", result.error])
+    return path
+
+class CannotReadMergeFileError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot read merge file", filename, reason)
+
 @dataclass
 class Letter:
     contact: Contact | None = None
@@ -48,12 +202,17 @@ class Letter:
 
     @classmethod
     def from_file(cls, path: Path) -> "Letter":
-        post = frontmatter.loads(path.read_text())
+        return cls.from_string(path.read_text())
+
+    @classmethod
+    def from_string(cls, text: str) -> "Letter":
+        import frontmatter      # Deferred, as it also loads YAML
+        post = frontmatter.loads(text)
         return cls(metadata=post.metadata, content=post.content)
 
 def get_contact_from_resume(resume_path: Path) -> Contact:
     try:
-        return Resume(resume_path).contact
+        return Contact(resume_path)
     except ET.ParseError as e:
         raise CannotReadResumeFileError(resume_path, "Parse error: " + str(e)) from e
     except FileNotFoundError as e:
@@ -104,16 +263,62 @@ class SignatureImageNotFoundError(StitchjobException):
     def __init__(self, filename: Path):
         super().__init__("Signature image not found", filename)
 
-def render_tex(letter: Letter) -> Path:
-    mako_path = Path(__file__).parent / "letter.mako"
-    template = Template(filename=str(mako_path))
+def render_tex(letter: Letter, template: "Template | None" = None,
+               escape: bool = True) -> str:
+    """Render LETTER with TEMPLATE (default: `letter.mako`).
 
-    letter.content = escape_tex(letter.content)
-    for key, val in letter.metadata.items():
-        letter.metadata[key] = escape_tex(val)
+    The content and metadata are escaped for TeX in a copy of LETTER, so the
+    same letter can be rendered repeatedly; pass ESCAPE=False if they
+    already are."""
+    if template is None:
+        template = load_template()
 
+    if escape:
+        letter = replace(letter,
+                         content=escape_tex(letter.content),
+                         metadata={key: escape_tex(val) for key, val in letter.metadata.items()})
     return template.render(letter=letter)
 
+def load_template(name: str = LETTER_TEMPLATE.name,
+                  template_dirs: Iterable[str | Path] = ()) -> "Template":
+    """Return the compiled template NAME, looked up in TEMPLATE_DIRS first.
+
+    Templates are compiled once per process and kept in an LRU cache; the
+    compiled modules are also saved in the user cache directory, so that
+    later processes don't need to compile them again. Both are invalidated
+    when the template file changes."""
+    dirs = tuple(str(Path(dir).resolve()) for dir in template_dirs)
+    return template_lookup(dirs + (str(LETTER_TEMPLATE.parent),)).get_template(name)
+
+@lru_cache(maxsize=None)
+def template_lookup(dirs: tuple[str, ...]) -> "TemplateLookup":
+    from mako.lookup import TemplateLookup  # Deferred, as it's slow to import
+
+    # Compiled modules are named after the template, so each set of template
+    # directories needs its own module directory. Mako only recompiles
+    # templates newer than their modules, so the contents of the templates
+    # are part of the key too, as an upgrade may ship templates with older
+    # modification times.
+    digest = hashlib.sha256("\0".join(dirs).encode())
+    for dir in dirs:
+        for path in sorted(Path(dir).glob("*.mako")):
+            digest.update(path.name.encode() + b"\0")
+            try:
+                digest.update(hashlib.sha256(path.read_bytes()).digest())
+            except OSError:
+                pass
+    key = digest.hexdigest()[:16]
+    module_dir = user_cache_dir() / "mako" / key
+    try:
+        module_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logging.debug(f"Cannot cache compiled templates: {e}")
+        module_dir = None
+    return TemplateLookup(directories=list(dirs),
+                          module_directory=str(module_dir) if module_dir else None,
+                          filesystem_checks=True,
+                          collection_size=TEMPLATE_CACHE_SIZE)
+
 def determine_tex_path(args: argparse.Namespace) -> Path:
     if args.output is None:
         return Path(args.input).with_suffix(".tex")
@@ -0,0 +1,218 @@
+"""Rank the bullets of a master resume by their relevance to a job posting.
+
+Every item, skill, and description of the resume is scored against the
+posting with BM25. The BM25 weight of every term in every part only depends
+on the resume, so it is computed once with NumPy and cached on disk, keyed by
+the hash of the resume; scoring a posting is then a single weighted
+`bincount()` over the cached weights.
+
+Requires NumPy (`pip install stitchjob[rank]`).
+"""
+
+import argparse
+from collections import Counter
+import hashlib
+import logging
+import os
+from pathlib import Path
+import re
+import zipfile
+
+from stitchjob.selection import trim_resume
+from stitchjob.shared import *
+from stitchjob.snapshot import load_resume
+from stitchjob.stitch_resume import (Description, Experience, Resume, SkillSection,
+                                     build_resume)
+
+INDEX_VERSION = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+LATEX_COMMAND_RE = re.compile(r"\\[a-zA-Z]+")
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOPWORDS = frozenset("""a an and are as at be by for from has have in is it its of on or
+    our that the their this to was were will with we you your""".split())
+
+def stitch_rank(args: argparse.Namespace) -> None:
+    np = import_numpy(args.posting)
+    posting_path = Path(args.posting)
+    resume_path = Path(args.resume).resolve()
+    try:
+        posting = posting_path.read_text(encoding="utf-8")
+    except FileNotFoundError as e:
+        raise CannotRankError(posting_path, "File not found") from e
+
+    with span("index"):
+        index = RankIndex.load(resume_path)
+    with span("score"):
+        scores = index.score(posting)
+
+    order = np.argsort(-scores, kind="stable")
+    lines = ["Best matches:"]
+    for n in order[:args.top]:
+        lines.append(f"{scores[n]:7.2f}  {index.labels[n]}: {index.texts[n]}")
+    logging.info("\n".join(lines))
+
+    if args.keep is not None:
+        with span("parse"):
+            resume = load_resume(resume_path, getattr(args, "snapshot", True))
+        pruned = prune_resume(resume, index, scores, args.keep)
+        output_path = Path(args.output or posting_path.with_suffix(".tex")).resolve()
+        pdf_path = build_resume(pruned, output_path, args)
+        if args.openpdf and pdf_path:
+            maybe_open_pdf(pdf_path)
+        elif args.openpdf:
+            logging.error("PDF file not generated, cannot open")
+
+def prune_resume(resume: Resume, index: "RankIndex", scores, keep: int) -> Resume:
+    """Return a copy of RESUME keeping the KEEP items of each experience with
+    the highest SCORES, in their original order. Experiences left without
+    items are dropped, as `select_resume()` does."""
+    best: dict[tuple[int, int], list[tuple[float, int]]] = {}
+    for (s, c, i), score in zip(index.units.tolist(), scores.tolist()):
+        if index.kinds[s][c] == "item":
+            best.setdefault((s, c), []).append((-score, i))
+
+    leaves = {}
+    for s, section in enumerate(resume.sections):
+        for c, child in enumerate(section.children):
+            if (s, c) in best:
+                kept = sorted(i for _, i in sorted(best[(s, c)])[:keep])
+                if kept:
+                    leaves[(s, c)] = kept
+            elif isinstance(child, SkillSection):
+                leaves[(s, c)] = list(range(len(child.skills)))
+            else:
+                leaves[(s, c)] = [None]
+    return trim_resume(resume, leaves)
+
+class RankIndex:
+    """BM25 weights of the terms in each part of a resume.
+
+    The parts are `units`, an array of (section, child, item or skill) indices,
+    with -1 for parts that are a whole child, like descriptions. Weights are
+    kept sparse, as parallel arrays of unit, term, and weight."""
+    def __init__(self, arrays: dict):
+        self.units = arrays["units"]
+        self.texts = arrays["texts"].tolist()
+        self.labels = arrays["labels"].tolist()
+        self.vocabulary = {term: n for n, term in enumerate(arrays["vocabulary"].tolist())}
+        self.unit_of = arrays["unit_of"]
+        self.term_of = arrays["term_of"]
+        self.weight = arrays["weight"]
+        self.kinds: dict[int, dict[int, str]] = {}
+        for (s, c, _), kind in zip(self.units.tolist(), arrays["kinds"].tolist()):
+            self.kinds.setdefault(s, {})[c] = kind
+
+    @classmethod
+    def load(cls, resume_path: Path) -> "RankIndex":
+        """Return the index of the resume at RESUME_PATH, from the cache if possible."""
+        np = import_numpy(resume_path)
+        try:
+            digest = hashlib.sha256(resume_path.read_bytes()).hexdigest()
+        except FileNotFoundError as e:
+            raise CannotReadResumeFileError(resume_path, "File not found") from e
+        cache_path = user_cache_dir() / "rank" / f"v{INDEX_VERSION}-{digest}.npz"
+        try:
+            with np.load(cache_path, allow_pickle=False) as arrays:
+                logging.debug(f"Using cached rank index '{cache_path}'")
+                return cls(dict(arrays))
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            pass
+
+        logging.debug(f"Indexing '{resume_path}' for ranking")
+        arrays = index_resume(load_resume(resume_path))
+        try:
+            # The suffix keeps np.savez() from adding another
+            temp_path = make_temp_file(cache_path, ".tmp.npz")
+            try:
+                np.savez(temp_path, **arrays)
+                os.replace(temp_path, cache_path)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            logging.debug(f"Cannot cache rank index: {e}")
+        return cls(arrays)
+
+    def score(self, posting: str):
+        """Return the BM25 score of every unit against the text of POSTING."""
+        np = import_numpy()
+        query = np.zeros(len(self.vocabulary))
+        for term, count in Counter(tokenize(posting)).items():
+            if term in self.vocabulary:
+                query[self.vocabulary[term]] = count
+        return np.bincount(self.unit_of, weights=self.weight * query[self.term_of],
+                           minlength=len(self.units))
+
+def index_resume(resume: Resume) -> dict:
+    """Return the arrays making up the `RankIndex` of RESUME."""
+    np = import_numpy()
+    units, kinds, labels, texts = [], [], [], []
+    for s, section in enumerate(resume.sections):
+        for c, child in enumerate(section.children):
+            if isinstance(child, Experience):
+                for i, item in enumerate(child.items):
+                    units.append((s, c, i))
+                    kinds.append("item")
+                    labels.append(child.organization or child.title)
+                    texts.append(item)
+            elif isinstance(child, SkillSection):
+                for i, skill in enumerate(child.skills):
+                    units.append((s, c, i))
+                    kinds.append("skill")
+                    labels.append(section.heading)
+                    texts.append(skill.name or "")
+            elif isinstance(child, Description):
+                units.append((s, c, -1))
+                kinds.append("description")
+                labels.append(section.heading)
+                texts.append(child.text or "")
+
+    vocabulary: dict[str, int] = {}
+    unit_of, term_of = [], []
+    for n, text in enumerate(texts):
+        for token in tokenize(text):
+            unit_of.append(n)
+            term_of.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    # Collapse the (unit, term) pairs into term frequencies
+    size = max(len(vocabulary), 1)
+    pairs, tf = np.unique(np.array(unit_of, dtype=np.int64) * size
+                          + np.array(term_of, dtype=np.int64), return_counts=True)
+    unit_of, term_of = pairs // size, pairs % size
+    lengths = np.bincount(np.array(unit_of, dtype=np.int64), weights=tf, minlength=len(texts))
+    df = np.bincount(term_of, minlength=len(vocabulary))
+    idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+    norm = K1 * (1 - B + B * lengths / (lengths.mean() if len(texts) and lengths.mean() else 1))
+    weight = idf[term_of] * tf * (K1 + 1) / (tf + norm[unit_of])
+
+    return {
+        "units": np.array(units, dtype=np.int32).reshape(-1, 3),
+        "kinds": np.array(kinds, dtype=str),
+        "labels": np.array(labels, dtype=str),
+        "texts": np.array(texts, dtype=str),
+        "vocabulary": np.array(list(vocabulary), dtype=str),
+        "unit_of": unit_of,
+        "term_of": term_of,
+        "weight": weight,
+    }
+
+def tokenize(text: str) -> list[str]:
+    """Return the lowercase words of TEXT, without LaTeX commands and stopwords."""
+    words = WORD_RE.findall(LATEX_COMMAND_RE.sub(" ", text).lower())
+    return [word for word in words if word not in STOPWORDS]
+
+def import_numpy(filename: str | Path = "numpy"):
+    try:
+        import numpy
+    except ModuleNotFoundError as e:
+        raise CannotRankError(filename, "Ranking requires NumPy "
+                              "(pip install stitchjob[rank])") from e
+    return numpy
+
+class CannotRankError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot rank resume", filename, reason)
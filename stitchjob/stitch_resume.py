@@ -1,84 +1,265 @@
 import argparse
+from dataclasses import dataclass, field
+from functools import lru_cache
 from importlib.resources import files
+import io
 import logging
 from pathlib import Path
 import re
-import shutil
+from typing import Iterable, TextIO
 import xml.etree.ElementTree as ET
 
+from stitchjob.cache import BuildCache, maybe_compile_pdf_cached, open_cached_tex
+from stitchjob.latex_format import FORMAT_MARKER, ensure_format
 from stitchjob.shared import *
 
 RESUME_LATEX_CLASS = files("stitchjob") / "stitched.cls"
 
+# Rendered sections and their children kept by latex_fragment(), and
+# rendered items kept by latex_item()
+FRAGMENT_CACHE_SIZE = 4096
+ITEM_CACHE_SIZE = 16384
+
 def stitch_resume(args: argparse.Namespace):
-    input_path = Path(args.input).resolve()
+    input_path = resume_input_path(args)
     logging.debug(f"Parsing resume XML file '{input_path}'")
-    resume = Resume(input_path)
-
-    output_path = input_path.with_suffix(".tex")
+    with span("parse"):
+        from stitchjob.snapshot import load_resume
+        resume = load_resume(input_path, getattr(args, "snapshot", True))
+
+    for variant, tex_path in resume_variants(resume, args):
+        pdf_path = build_outputs(variant, tex_path, args)
+        if args.openpdf and pdf_path:
+            maybe_open_pdf(pdf_path)
+        elif args.openpdf:
+            logging.error("PDF file not generated, cannot open")
+
+def resume_variants(resume: "Resume", args: argparse.Namespace) -> list[tuple["Resume", Path]]:
+    """Return the tailored variants of RESUME to build for ARGS, with their
+    output paths: one for each `--overlay`, or RESUME itself if none."""
+    overlays = [Path(path) for path in getattr(args, "overlay", None) or []]
+    if not overlays:
+        return [(tailor_resume(resume, args), resume_tex_path(args))]
+
+    from stitchjob.overlay import CannotApplyOverlayError, Overlay, apply_overlay
+    if len(overlays) > 1 and getattr(args, "output", None):
+        raise CannotApplyOverlayError(args.output, "Cannot write several overlays to one output")
+    variants = []
+    for overlay_path in overlays:
+        logging.debug(f"Applying overlay '{overlay_path}'")
+        with span("overlay"):
+            variant = apply_overlay(resume, Overlay.from_file(overlay_path), overlay_path)
+        if getattr(args, "output", None):
+            tex_path = resume_tex_path(args)
+        else:
+            tex_path = overlay_path.resolve().with_suffix(".tex")
+        variants.append((tailor_resume(variant, args), tex_path))
+    return variants
+
+def tailor_resume(resume: "Resume", args: argparse.Namespace) -> "Resume":
+    """Return RESUME with only the parts selected by `--select` and fitting
+    in `--fit-pages`, if given in ARGS."""
+    if getattr(args, "select", None):
+        from stitchjob.selection import select_resume
+        with span("select"):
+            resume = select_resume(resume, args.select)
+    if getattr(args, "fit_pages", None):
+        from stitchjob.fit import fit_resume
+        resume = fit_resume(resume, args.fit_pages, args)
+    return resume
+
+def build_outputs(resume: "Resume", tex_path: Path, args: argparse.Namespace) -> Path | None:
+    """Write RESUME in each `--format` of ARGS next to TEX_PATH and build the
+    LaTeX (and PDF, if requested) as `build_resume()` does.
+
+    Returns the path to the PDF, or None if it was not compiled."""
+    from stitchjob.emit import resume_formats, write_formats
+    formats = resume_formats(args)
+    if formats != ["tex"]:
+        write_formats(resume, tex_path, formats)
+    if "tex" in formats or args.pdf or args.openpdf:
+        return build_resume(resume, tex_path, args)
+    return None
+
+def resume_input_path(args: argparse.Namespace) -> Path:
+    return Path(getattr(args, "base", None) or args.input).resolve()
+
+def resume_source_path(args: argparse.Namespace) -> Path | None:
+    """Return the XML file the resume being built for ARGS was read from."""
+    if getattr(args, "command", None) == "rank":
+        return Path(args.resume)
+    path = getattr(args, "base", None) or getattr(args, "input", None)
+    return Path(path) if path else None
+
+def resume_tex_path(args: argparse.Namespace) -> Path:
+    if getattr(args, "output", None):
+        return Path(args.output).resolve()
+    return resume_input_path(args).with_suffix(".tex")
+
+def build_resume(resume: "Resume", output_path: Path, args: argparse.Namespace) -> Path | None:
+    """Write RESUME to OUTPUT_PATH and, if requested in ARGS, compile it.
+
+    Returns the path to the PDF, or None if it was not compiled."""
+    cache = BuildCache(output_path.parent, force=args.force)
     logging.debug(f"Stitching LaTeX file '{output_path}'")
-    write_tex(output_path, latex_metadata() + resume.to_latex())
+    with span("render"), open_cached_tex(output_path, cache, [RESUME_LATEX_CLASS]) as out:
+        out.write(latex_metadata(args.draft))
+        resume.write_latex(out, format_marker=args.precompile)
+    logging.debug(fragment_stats())
 
     logging.debug(f"Ensuring '{RESUME_LATEX_CLASS.name}' is available")
-    ensure_latex_class_available(output_path)
+    with span("class"):
+        ensure_latex_class_available(output_path)
 
     pdf_path = None
     if args.pdf or args.openpdf:
-        pdf_path = maybe_compile_pdf(output_path)
+        fmt_path = None
+        if args.precompile:
+            with span("format"):
+                fmt_path = ensure_format("stitched", resume_preamble(args.draft),
+                                         [RESUME_LATEX_CLASS])
+        try:
+            pdf_path = maybe_compile_pdf_cached(output_path, cache, out.key, fmt_path,
+                                                [RESUME_LATEX_CLASS])
+        except CannotCompilePDFError as e:
+            from stitchjob.sourcemap import locate_tex_error
+            locate_tex_error(e, resume, output_path, resume_source_path(args))
+            raise
 
-    if args.openpdf and pdf_path:
-        maybe_open_pdf(pdf_path)
-    elif args.openpdf:
-        logging.error("PDF file not generated, cannot open")
+    if args.cache_stats:
+        logging.info(cache.stats())
+    return pdf_path
+
+def resume_preamble(draft: bool = False) -> str:
+    """Return the part of the resume preamble that is the same for everyone."""
+    return latex_metadata(draft) + "\n\\documentclass{stitched}"
 
 def ensure_latex_class_available(tex_path: Path):
     """Ensure that 'stitched.cls' is available in TeX file's directory."""
     cls_src = files("stitchjob") / "stitched.cls"
     cls_dst = tex_path.parent / "stitched.cls"
-    try:
-        shutil.copy(cls_src, cls_dst)
-    except shutil.SameFileError:
-        # If there is already a symlink to stitched.cls in tex_path, don't need
-        # to copy the file.
-        pass
-
-class Resume:
-    def __init__(self, xml_file: Path):
+    if cls_dst.exists() and cls_dst.read_bytes() == cls_src.read_bytes():
+        # Already there, possibly as a symlink; copying again would only
+        # touch the file.
+        return
+    # Not needed by compile_pdf(), which links the class into its scratch
+    # directory, but by anyone running pdflatex on the .tex file directly.
+    # Installed atomically, as parallel builds may be doing the same.
+    install_file(cls_src, cls_dst)
+
+class LatexRenderable:
+    """Base class for parts of the resume that render to LaTeX.
+
+    Subclasses implement `write_latex()`, which streams the LaTeX into a
+    text file or `io.StringIO`; `to_latex()` returns the same as a string.
+
+    The parts are immutable, slotted dataclasses, so that a resume derived
+    from another, such as by `--select`, can share all the parts it keeps
+    with the original; use `dataclasses.replace()` to derive them. Parts
+    compare and hash by what they render (ignoring tags), so that
+    `latex_fragment()` renders identical parts only once."""
+    __slots__ = ()
+
+    def write_latex(self, out: TextIO) -> None:
+        raise NotImplementedError
+
+    def to_latex(self) -> str:
+        out = io.StringIO()
+        self.write_latex(out)
+        return out.getvalue()
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def latex_fragment(part: LatexRenderable) -> str:
+    """Return `part.to_latex()`, rendering (and escaping) each distinct part
+    only once, however many resumes it appears in."""
+    return part.to_latex()
+
+@lru_cache(maxsize=ITEM_CACHE_SIZE)
+def latex_item(item: str) -> str:
+    """Return the LaTeX for an item of an experience, escaping each distinct
+    item only once, so that experiences trimmed to different items are
+    assembled from the same fragments."""
+    return f"\\item {escape_tex(item, smarten_quotes=True)}\n"
+
+def fragment_stats() -> str:
+    fragments = latex_fragment.cache_info()
+    items = latex_item.cache_info()
+    return (f"Fragment cache: {fragments.hits} hit(s), {fragments.misses} miss(es); "
+            f"item cache: {items.hits} hit(s), {items.misses} miss(es)")
+
+@dataclass(frozen=True, slots=True, eq=False, init=False, weakref_slot=True)
+class Resume(LatexRenderable):
+    contact: "Contact"
+    sections: tuple["Section", ...]
+
+    def __init__(self, xml_file: Path | None = None, *, contact: "Contact | None" = None,
+                 sections: Iterable["Section"] = ()):
+        """Parse the resume in XML_FILE or, without it, make one of CONTACT and SECTIONS."""
+        if xml_file is None:
+            object.__setattr__(self, "contact", contact)
+            object.__setattr__(self, "sections", tuple(sections))
+            return
         try:
             root = ET.parse(xml_file).getroot()
-            self.contact = Contact(root)
-            self.sections = [Section.create(sec_el) for sec_el in root.findall("section")]
         except ET.ParseError as e:
             raise CannotParseXMLResumeError(xml_file, str(e)) from e
         except FileNotFoundError as e:
             raise CannotReadResumeFileError(xml_file, "File not found") from e
         except PermissionError as e:
             raise CannotReadResumeFileError(xml_file, "Permission denied") from e
+        self._read(root)
 
-    def to_latex(self) -> str:
-        output = "\n\\documentclass{stitched}"
-        output += "\n" + self.contact.to_latex()
-        output += "\n\\begin{document}"
+    @classmethod
+    def from_string(cls, xml: str | bytes, name: str = "<string>") -> "Resume":
+        """Return the resume in XML; NAME is used in error messages."""
+        try:
+            root = ET.fromstring(xml)
+        except ET.ParseError as e:
+            raise CannotParseXMLResumeError(name, str(e)) from e
+        resume = cls.__new__(cls)
+        resume._read(root)
+        return resume
+
+    def _read(self, root: ET.Element) -> None:
+        object.__setattr__(self, "contact", Contact(root))
+        object.__setattr__(self, "sections", tuple(Section.create(sec_el)
+                                                   for sec_el in root.findall("section")))
+
+    def write_latex(self, out: TextIO, format_marker: bool = False) -> None:
+        """Write the resume to OUT.
+
+        If FORMAT_MARKER is true, mark the end of the fixed part of the
+        preamble for compiling with a precompiled format."""
+        out.write("\n\\documentclass{stitched}")
+        if format_marker:
+            out.write("\n" + FORMAT_MARKER)
+        out.write("\n" + self.contact.to_latex())
+        out.write("\n\\begin{document}")
         for sec in self.sections:
-            output += "\n" + sec.to_latex()
-        output += "\n\n\\end{document}"
-        return output
+            out.write("\n")
+            out.write(latex_fragment(sec))
+        out.write("\n\n\\end{document}")
 
 class CannotParseXMLResumeError(StitchjobException):
     def __init__(self, filename: Path, reason: str = ""):
         super().__init__("Cannot parse XML resume", filename, reason)
 
+@dataclass(frozen=True, slots=True, eq=False, init=False)
 class Contact:
+    values: dict[str, str]
+
     def __init__(self, source: Path | ET.Element):
-        if not isinstance(source, ET.Element):
-            source = ET.parse(source).getroot()
+        if isinstance(source, ET.Element):
+            contact = source.findall("./contact")[0]
+        else:
+            contact = read_contact_element(source)
 
-        self.values = {}
-        contact = source.findall("./contact")[0]
+        values = {}
         for item in contact:
-            self.values[item.tag] = item.text
-        if 'website' in self.values:
-            self.values['website'] = re.sub(r'https*://', "", self.values['website'])
+            values[item.tag] = item.text
+        if 'website' in values:
+            values['website'] = re.sub(r'https*://', "", values['website'])
+        object.__setattr__(self, "values", values)
 
     def __getitem__(self, key: str):
         return self.values[key]
@@ -95,119 +276,183 @@ class Contact:
         output += "\n}\n"
         return output
 
-class Section:
+def read_contact_element(xml_file: Path) -> ET.Element:
+    """Return the `<contact>` element of XML_FILE without parsing the rest.
+
+    The file is parsed incrementally and only up to the end of `<contact>`,
+    so this takes the same time no matter how long the resume is."""
+    with open(xml_file, "rb") as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == "contact":
+                return element
+    raise CannotParseXMLResumeError(xml_file, "No <contact> element")
+
+@dataclass(frozen=True, slots=True)
+class Section(LatexRenderable):
+    type: str | None
+    heading: str
+    children: tuple[LatexRenderable, ...]
+    terms: frozenset[str] = field(default=frozenset(), compare=False)
+    id: str | None = field(default=None, compare=False)
+
     @classmethod
-    def create(cls, element: ET.Element):
+    def create(cls, element: ET.Element) -> "Section":
         section_type = element.attrib.get("type")
         if section_type == "education":
-            return EducationSection(element)
-        return cls(element)
-
-    def __str__(self):
-        return f"Section({self.type=}, {self.heading=}, {len(self.children)})"
+            return EducationSection.from_element(element)
+        return cls.from_element(element)
 
-    def __init__(self, element: ET.Element):
-        self.type = element.attrib.get("type")
-        self.heading = element.attrib.get("heading", "Section")
-        self.children = []
+    @classmethod
+    def from_element(cls, element: ET.Element) -> "Section":
+        children = []
         for child in element:
-            obj = None
             if child.tag == "experience":
-                obj = Experience(child)
+                obj = Experience.from_element(child)
             elif child.tag == "degree":
-                obj = Degree(child)
+                obj = Degree.from_element(child)
             elif child.tag == "skills":
-                obj = SkillSection(child)
+                obj = SkillSection.from_element(child)
             elif child.tag == "description":
-                obj = Description(child)
+                obj = Description(child.text)
             else:
                 raise Exception(f"Don't know how to handle `{child.tag}' child")
-            self.children.append(obj)
+            children.append(obj)
+        return cls(element.attrib.get("type"), element.attrib.get("heading", "Section"),
+                   tuple(children), XmlHelper.terms(element), element.attrib.get("id"))
 
-    def to_latex(self) -> str:
-        output = f"\n\\section{{{escape_tex(self.heading)}}}\n"
+    def __str__(self):
+        return f"Section({self.type=}, {self.heading=}, {len(self.children)})"
+
+    def write_latex(self, out: TextIO) -> None:
+        out.write(f"\n\\section{{{escape_tex(self.heading)}}}\n")
         for child in self.children:
-            output += "\n" + child.to_latex()
-        return output
+            out.write("\n")
+            out.write(latex_fragment(child))
 
+@dataclass(frozen=True, slots=True)
 class EducationSection(Section):
-    def to_latex(self) -> str:
-        output = f"\\section{{{escape_tex(self.heading)}}}"
-        output += "\n\\begin{education}"
+    def write_latex(self, out: TextIO) -> None:
+        out.write(f"\\section{{{escape_tex(self.heading)}}}")
+        out.write("\n\\begin{education}")
         for child in self.children:
-            output += "\n" + child.to_latex()
-        output += "\n\\end{education}"
-        return output
-
-class Experience:
-    def __init__(self, element: ET.Element):
-        self.title = XmlHelper.findtext(element, "title")
-        self.organization = XmlHelper.findtext(element, "organization")
-        self.location = XmlHelper.findtext(element, "location")
-        self.blurb = XmlHelper.findtext(element, "blurb")
-        self.begin = element.attrib.get("begin", "???")
-        self.end = element.attrib.get("end", "???")
-        self.items = [XmlHelper.text(item) for item in element.findall("items/item")]
+            out.write("\n")
+            out.write(latex_fragment(child))
+        out.write("\n\\end{education}")
+
+@dataclass(frozen=True, slots=True)
+class Experience(LatexRenderable):
+    title: str
+    organization: str
+    location: str
+    blurb: str
+    begin: str
+    end: str
+    items: tuple[str, ...]
+    terms: frozenset[str] = field(default=frozenset(), compare=False)
+    item_terms: tuple[frozenset[str], ...] = field(default=(), compare=False)
+    id: str | None = field(default=None, compare=False)
+    item_ids: tuple[str | None, ...] = field(default=(), compare=False)
 
-    def to_latex(self) -> str:
-        output = r"\experience{%(begin)s -- %(end)s}{%(title)s}{%(organization)s}[%(location)s]" % {
+    @classmethod
+    def from_element(cls, element: ET.Element) -> "Experience":
+        items = element.findall("items/item")
+        return cls(
+            title=XmlHelper.findtext(element, "title"),
+            organization=XmlHelper.findtext(element, "organization"),
+            location=XmlHelper.findtext(element, "location"),
+            blurb=XmlHelper.findtext(element, "blurb"),
+            begin=element.attrib.get("begin", "???"),
+            end=element.attrib.get("end", "???"),
+            items=tuple(XmlHelper.text(item) for item in items),
+            terms=XmlHelper.terms(element),
+            item_terms=tuple(XmlHelper.terms(item) for item in items),
+            id=element.attrib.get("id"),
+            item_ids=tuple(item.attrib.get("id") for item in items),
+        )
+
+    def write_latex(self, out: TextIO) -> None:
+        out.write(r"\experience{%(begin)s -- %(end)s}{%(title)s}{%(organization)s}[%(location)s]" % {
             'title': escape_tex(self.title),
             'begin': escape_tex(self.begin),
             'end': escape_tex(self.end),
             'organization': escape_tex(self.organization),
             'location': escape_tex(self.location)
-        }
+        })
         if self.blurb:
-            output += f"\n\\blurb{{{smarten_tex_quotes(escape_tex(self.blurb))}}}"
-        output += "\n\\begin{duties}\n"
+            out.write(f"\n\\blurb{{{escape_tex(self.blurb, smarten_quotes=True)}}}")
+        out.write("\n\\begin{duties}\n")
         for item in self.items:
-            output += f"\\item {smarten_tex_quotes(escape_tex(item))}\n"
-        output += "\\end{duties}\n"
-        return output
+            out.write(latex_item(item))
+        out.write("\\end{duties}\n")
 
-class Degree:
-    def __init__(self, element: ET.Element):
-        self.date = XmlHelper.findtext(element, "date")
-        self.type = XmlHelper.findtext(element, "type")
-        self.field = XmlHelper.findtext(element, "field")
-        self.school = XmlHelper.findtext(element, "school")
-        self.location = XmlHelper.findtext(element, "location")
+@dataclass(frozen=True, slots=True)
+class Degree(LatexRenderable):
+    date: str
+    type: str
+    field: str
+    school: str
+    location: str
 
-    def to_latex(self) -> str:
+    @classmethod
+    def from_element(cls, element: ET.Element) -> "Degree":
+        return cls(*(XmlHelper.findtext(element, tag)
+                     for tag in ("date", "type", "field", "school", "location")))
+
+    def write_latex(self, out: TextIO) -> None:
         date = escape_tex(self.date)
         type = escape_tex(self.type)
         field = escape_tex(self.field)
         school = escape_tex(self.school)
         location = escape_tex(self.location)
 
-        return f"\\degree{{{type}}}{{{field}}}{{{school}}}{{{location}}}{{{date}}}"
+        out.write(f"\\degree{{{type}}}{{{field}}}{{{school}}}{{{location}}}{{{date}}}")
 
-class SkillSection:
-    def __init__(self, element: ET.Element):
-        self.skills = [Skill(skill_el) for skill_el in element.findall("skill")]
+@dataclass(frozen=True, slots=True)
+class SkillSection(LatexRenderable):
+    skills: tuple["Skill", ...]
 
-    def to_latex(self) -> str:
-        output = f"\\begin{{skills}}\n"
+    @classmethod
+    def from_element(cls, element: ET.Element) -> "SkillSection":
+        return cls(tuple(Skill(skill_el.text, XmlHelper.terms(skill_el), skill_el.attrib.get("id"))
+                         for skill_el in element.findall("skill")))
+
+    def write_latex(self, out: TextIO) -> None:
+        out.write("\\begin{skills}\n")
         for skill in self.skills:
-            output += f"\\item {skill.to_latex()}\n"
-        output += "\\end{skills}"
-        return output
+            out.write(f"\\item {skill.to_latex()}\n")
+        out.write("\\end{skills}")
 
+@dataclass(frozen=True, slots=True)
 class Skill:
-    def __init__(self, element: ET.Element):
-        self.name = element.text
+    name: str
+    terms: frozenset[str] = field(default=frozenset(), compare=False)
+    id: str | None = field(default=None, compare=False)
 
     def to_latex(self) -> str:
-        return smarten_tex_quotes(escape_tex(self.name))
+        return escape_tex(self.name, smarten_quotes=True)
 
-class Description:
-    def __init__(self, element: ET.Element):
-        self.text = element.text
+@dataclass(frozen=True, slots=True)
+class Description(LatexRenderable):
+    text: str
 
-    def to_latex(self) -> str:
-        return smarten_tex_quotes(escape_tex(self.text))
+    def write_latex(self, out: TextIO) -> None:
+        out.write(escape_tex(self.text, smarten_quotes=True))
 
 class XmlHelper:
+    NO_TERMS = frozenset()
+
+    @staticmethod
+    def terms(element: ET.Element) -> frozenset[str]:
+        """Return the `tags` and `id` of ELEMENT, lowercased, for `--select`."""
+        tags = element.attrib.get("tags")
+        id = element.attrib.get("id")
+        if tags is None and id is None:
+            return XmlHelper.NO_TERMS
+        terms = parse_tags(tags or "")
+        if id:
+            terms = terms | {id.lower()}
+        return terms
+
     @staticmethod
     def text(element: ET.Element, default: str = "") -> str:
         text = element.text
@@ -221,3 +466,8 @@ class XmlHelper:
         if text:
             return re.sub(r"\s+", " ", text).strip()
         return default
+
+@lru_cache(maxsize=1024)
+def parse_tags(tags: str) -> frozenset[str]:
+    # Cached, so that parts with the same tags share one set
+    return frozenset(re.split(r"[\s,]+", tags.lower())) - {""}
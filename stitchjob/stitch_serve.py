@@ -0,0 +1,293 @@
+"""Long-lived build daemon, so that repeated builds skip start-up costs.
+
+The daemon keeps the letter template compiled, recently used resumes parsed,
+and, with `--precompile`, the LaTeX format built, and accepts jobs as JSON
+over HTTP on a Unix socket or a loopback port (other addresses need
+`--allow-remote`, as jobs are not authenticated):
+
+- `POST /build` runs a `resume` or `letter` command on files, taking some of
+  the arguments of the command line (this is what `stitch --remote` sends),
+  and replies with the paths of the outputs. The resume of a letter and the
+  outputs must be in the directory of the input.
+- `POST /render` builds from XML and Markdown in the request, with the
+  built-in letter template, and replies with the TeX and the base64-encoded
+  PDF.
+- `GET /health` reports queue depth, counts, and latency percentiles.
+"""
+
+import argparse
+import asyncio
+import base64
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import ipaddress
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+from stitchjob.aio import AsyncStitcher
+from stitchjob.latex_format import ensure_format
+from stitchjob.remote import (BUILD_DEFAULTS, JOB_ARGS, open_connection,
+                              outside_input_directory, parse_address)
+from stitchjob.shared import *
+from stitchjob.snapshot import load_resume
+from stitchjob.stitch_letter import (Letter, build_letter, determine_signature_image,
+                                     determine_tex_path, load_template)
+from stitchjob.stitch_resume import (RESUME_LATEX_CLASS, Resume, build_outputs, resume_preamble,
+                                     resume_input_path, resume_variants)
+
+RESUME_CACHE_SIZE = 16
+LATENCY_WINDOW = 1000
+
+def stitch_serve(args: argparse.Namespace) -> None:
+    if not args.allow_remote:
+        check_local_address(args.listen)
+    server = StitchServer(args.jobs or os.cpu_count() or 1, args.precompile)
+    try:
+        asyncio.run(server.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+
+class StitchServer:
+    def __init__(self, workers: int, precompile: bool = False):
+        self.workers = workers
+        self.precompile = precompile
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.stitcher: AsyncStitcher | None = None
+        self.resumes: OrderedDict[tuple, Resume] = OrderedDict()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = {route: deque(maxlen=LATENCY_WINDOW) for route in ("build", "render")}
+        self.started = time.monotonic()
+
+    async def serve(self, address: str) -> None:
+        self.stitcher = AsyncStitcher(self.workers)
+        kind, *where = parse_address(address)
+        if kind == "unix":
+            remove_stale_socket(Path(where[0]))
+            server = await asyncio.start_unix_server(self.handle, where[0])
+        else:
+            server = await asyncio.start_server(self.handle, *where)
+        await asyncio.get_running_loop().run_in_executor(self.pool, self.warm_up)
+        logging.info(f"Listening on {address} with {self.workers} worker(s)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if kind == "unix":
+                Path(where[0]).unlink(missing_ok=True)
+
+    def warm_up(self) -> None:
+        logging.debug("Compiling letter template")
+        load_template()
+        if self.precompile:
+            for draft in (False, True):
+                ensure_format("stitched", resume_preamble(draft), [RESUME_LATEX_CLASS])
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await read_request(reader)
+            status, reply = await self.dispatch(method, path, body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, reply = HTTPStatus.BAD_REQUEST, {"error": f"Bad request: {e}"}
+        payload = json.dumps(reply).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     "Content-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + payload)
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, dict]:
+        if (method, path) == ("GET", "/health"):
+            return HTTPStatus.OK, self.health()
+        if method != "POST" or path not in ("/build", "/render"):
+            return HTTPStatus.NOT_FOUND, {"error": f"No such endpoint: {method} {path}"}
+
+        route = path[1:]
+        job = json.loads(body or b"{}")
+        if not isinstance(job, dict) or job.get("command") not in ("resume", "letter"):
+            return HTTPStatus.BAD_REQUEST, {"error": "Job must have command 'resume' or 'letter'"}
+        start = time.perf_counter()
+        try:
+            if route == "build":
+                reply = await self.build(job)
+            else:
+                reply = await self.render(job)
+        except (StitchjobException, KeyError, TypeError, ValueError) as e:
+            self.failed += 1
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e)}
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"{route} job failed: {e!r}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+        self.completed += 1
+        self.latencies[route].append(time.perf_counter() - start)
+        return HTTPStatus.OK, reply
+
+    async def build(self, job: dict) -> dict:
+        check_job(job)
+        args = argparse.Namespace(**{**BUILD_DEFAULTS, **job, "openpdf": False})
+        if self.precompile:
+            args.precompile = True
+        with self.lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        outputs = await loop.run_in_executor(self.pool, self.run_build, args)
+        tex_path, pdf_path = outputs[-1]
+        reply = {"tex": str(tex_path), "pdf": str(pdf_path) if pdf_path else None}
+        if len(outputs) > 1:
+            reply["outputs"] = [{"tex": str(tex), "pdf": str(pdf) if pdf else None}
+                                for tex, pdf in outputs]
+        return reply
+
+    def run_build(self, args: argparse.Namespace) -> list[tuple[Path, Path | None]]:
+        """Build the job in ARGS, like `stitch_resume()` or `stitch_letter()` would,
+        returning the .tex and PDF (if compiled) of each output.
+
+        Runs on a worker thread."""
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            if args.command == "resume":
+                # The selection index is kept with the cached resume, so
+                # only the query and overlays are evaluated for each build
+                resume = self.resume(resume_input_path(args))
+                return [(tex_path, build_outputs(variant, tex_path, args))
+                        for variant, tex_path in resume_variants(resume, args)]
+            letter = Letter.from_file(Path(args.input))
+            letter.contact = self.resume(Path(args.resume).resolve()).contact
+            letter.signature_image = determine_signature_image(args, letter)
+            return [(determine_tex_path(args).resolve(), build_letter(letter, args))]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def resume(self, path: Path) -> Resume:
+        """Return the parsed resume at PATH, reusing it if the file is unchanged."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError as e:
+            raise CannotReadResumeFileError(path, "File not found") from e
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.resumes:
+                self.resumes.move_to_end(key)
+                return self.resumes[key]
+        resume = load_resume(path)
+        with self.lock:
+            self.resumes[key] = resume
+            if len(self.resumes) > RESUME_CACHE_SIZE:
+                self.resumes.popitem(last=False)
+        return resume
+
+    async def render(self, job: dict) -> dict:
+        pdf = job.get("pdf", True)
+        draft = job.get("draft", False)
+        if job["command"] == "resume":
+            output = await self.stitcher.stitch_resume(job["xml"], pdf=pdf, draft=draft)
+        else:
+            # Templates run Python, so the daemon only uses its own
+            if job.get("template_dir"):
+                raise RejectedJobError("job", "Cannot set template_dir")
+            signature = job.get("signature_image")
+            if signature:
+                signature = (signature["name"], base64.b64decode(signature["data"]))
+            output = await self.stitcher.stitch_letter(
+                job["markdown"], job["resume_xml"], signature, pdf=pdf, draft=draft)
+        return {"tex": output.tex,
+                "pdf": base64.b64encode(output.pdf).decode() if output.pdf else None}
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "uptime": round(time.monotonic() - self.started, 1),
+            "workers": self.workers,
+            "queue_depth": self.queued + self.stitcher.queued,
+            "running": self.running + self.stitcher.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_ms": {route: percentiles(latencies)
+                           for route, latencies in self.latencies.items()},
+        }
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    """Read an HTTP request, returning its method, path, and body."""
+    method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path.partition("?")[0], body
+
+def check_job(job: dict) -> None:
+    """Raise RejectedJobError unless JOB sets only JOB_ARGS, and reads its
+    resume and writes its outputs in the directory of its input."""
+    unknown = sorted(set(job) - set(JOB_ARGS))
+    if unknown:
+        raise RejectedJobError(job.get("input") or "job", f"Cannot set {', '.join(unknown)}")
+    if not job.get("input"):
+        raise RejectedJobError("job", "No input")
+    if job.get("command") == "letter" and not job.get("resume"):
+        raise RejectedJobError(job["input"], "No resume")
+    outside = outside_input_directory(job)
+    if outside:
+        raise RejectedJobError(outside, "Not in the directory of the input, "
+                               f"'{Path(job['input']).resolve().parent}'")
+
+def check_local_address(address: str) -> None:
+    """Raise CannotStartServerError unless ADDRESS is a Unix socket or a
+    loopback address."""
+    kind, *where = parse_address(address)
+    if kind == "unix" or where[0] == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(where[0]).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise CannotStartServerError(address, "Not a loopback address; use --allow-remote "
+                                 "to accept unauthenticated jobs from the network")
+
+def percentiles(latencies: deque[float]) -> dict:
+    """Return the count and the 50th, 90th, and 99th percentile of LATENCIES in ms."""
+    ordered = sorted(latencies)
+    result = {"count": len(ordered)}
+    for p in (50, 90, 99):
+        if ordered:
+            result[f"p{p}"] = round(ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000, 1)
+        else:
+            result[f"p{p}"] = None
+    return result
+
+def remove_stale_socket(path: Path) -> None:
+    """Remove the Unix socket at PATH left behind by a daemon that is gone."""
+    if not path.exists():
+        return
+    try:
+        open_connection(f"unix:{path}", timeout=1).close()
+    except OSError:
+        path.unlink()
+    else:
+        raise CannotStartServerError(path, "Another daemon is listening there")
+
+class CannotStartServerError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Cannot start stitch daemon", filename, reason)
+
+class RejectedJobError(StitchjobException):
+    def __init__(self, filename: str | Path, reason: str = ""):
+        super().__init__("Rejected job", filename, reason)
@@ -0,0 +1,231 @@
+import argparse
+import ctypes
+import ctypes.util
+import logging
+import os
+from pathlib import Path
+import select
+import struct
+import time
+from typing import Iterable, Iterator
+
+from stitchjob.shared import *
+from stitchjob.stitch_letter import (Letter, build_letter, determine_signature_image,
+                                     load_template)
+from stitchjob.stitch_resume import RESUME_LATEX_CLASS, Resume, build_resume
+
+def stitch_watch(args: argparse.Namespace) -> None:
+    session = WatchSession(args)
+    session.rebuild(session.inputs())
+
+    watcher = make_watcher(session.inputs(), args.poll, args.interval)
+    logging.info(f"Watching {len(watcher.paths)} file(s) for changes; press Ctrl-C to stop")
+    try:
+        for changed in debounced_changes(watcher, args.debounce):
+            session.rebuild(changed)
+            if set(session.inputs()) != watcher.paths:
+                # The letter may have started using a different signature image
+                watcher.close()
+                watcher = make_watcher(session.inputs(), args.poll, args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+class WatchSession:
+    """Parsed inputs kept in memory between rebuilds of a resume and letter."""
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.resume_path = Path(args.resume).resolve()
+        self.letter_path = Path(args.letter).resolve() if args.letter else None
+        if self.letter_path and not self.letter_path.exists():
+            logging.info(f"Letter '{self.letter_path}' not found, building only the resume")
+            self.letter_path = None
+        self.resume: Resume | None = None
+        self.letter: Letter | None = None
+        self.template = None
+
+    def inputs(self) -> dict[Path, str]:
+        """Return the files the outputs depend on, mapped to their roles."""
+        inputs = {self.resume_path: "resume", Path(RESUME_LATEX_CLASS).resolve(): "class"}
+        if self.letter_path:
+            inputs[self.letter_path] = "letter"
+            if self.template:
+                inputs[Path(self.template.filename).resolve()] = "template"
+            if self.letter and self.letter.signature_image:
+                signature = self.letter_path.parent / self.letter.signature_image
+                inputs[signature.resolve()] = "signature"
+        return inputs
+
+    def rebuild(self, changed: Iterable[Path]) -> set[str]:
+        """Reload whatever CHANGED and rebuild the affected outputs.
+
+        Returns the outputs that were rebuilt, "resume" and/or "letter"."""
+        inputs = self.inputs()
+        roles = {inputs[path] for path in changed if path in inputs}
+        targets = set()
+        try:
+            if "resume" in roles or self.resume is None:
+                old_contact = self.resume.contact.values if self.resume else None
+                self.resume = Resume(self.resume_path)
+                targets.add("resume")
+                if self.resume.contact.values != old_contact:
+                    targets.add("letter")
+            if "class" in roles:
+                targets.add("resume")
+            if self.letter_path:
+                if "template" in roles or self.template is None:
+                    self.template = load_template(template_dirs=self.args.template_dir or ())
+                    targets.add("letter")
+                if "letter" in roles or self.letter is None:
+                    self.letter = Letter.from_file(self.letter_path)
+                    targets.add("letter")
+                if "signature" in roles:
+                    targets.add("letter")
+            else:
+                targets.discard("letter")
+
+            for target in ("resume", "letter"):
+                if target in targets:
+                    start = time.perf_counter()
+                    self.build(target)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    logging.info(f"Rebuilt {target} in {elapsed:.0f} ms")
+        except Exception as e:
+            # Keep watching; most likely a file is in the middle of an edit
+            logging.error(f"Rebuild failed: {e}")
+        return targets
+
+    def build(self, target: str) -> None:
+        if target == "resume":
+            build_resume(self.resume, self.resume_path.with_suffix(".tex"), self.build_args())
+        else:
+            args = self.build_args(input=self.letter_path, resume=self.resume_path,
+                                   output=None, signature=self.args.signature,
+                                   signature_image=self.args.signature_image,
+                                   template_dir=self.args.template_dir)
+            self.letter.contact = self.resume.contact
+            self.letter.signature_image = determine_signature_image(args, self.letter)
+            build_letter(self.letter, args, self.template)
+
+    def build_args(self, **kwargs) -> argparse.Namespace:
+        return argparse.Namespace(pdf=self.args.pdf, openpdf=False, force=False,
+                                  cache_stats=False, draft=self.args.draft,
+                                  precompile=False, **kwargs)
+
+def debounced_changes(watcher: "PollingWatcher | InotifyWatcher",
+                      debounce: float) -> Iterator[set[Path]]:
+    """Yield sets of changed files, once no more changes come for DEBOUNCE seconds."""
+    while True:
+        changed = watcher.wait(None)
+        while more := watcher.wait(debounce):
+            changed |= more
+        yield changed
+
+def make_watcher(paths: Iterable[Path], poll: bool = False,
+                 interval: float = 0.5) -> "PollingWatcher | InotifyWatcher":
+    """Return an inotify watcher for PATHS if possible, a polling one otherwise."""
+    if not poll:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            logging.debug(f"Cannot use inotify, polling for changes instead: {e}")
+    return PollingWatcher(paths, interval)
+
+class PollingWatcher:
+    """Detect changes to files by checking their size and modification time."""
+    def __init__(self, paths: Iterable[Path], interval: float = 0.5):
+        self.paths = {Path(path) for path in paths}
+        self.interval = interval
+        self.state = {path: self._stat(path) for path in self.paths}
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        """Return files changed since the last call, waiting up to TIMEOUT seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                stat = self._stat(path)
+                if stat != self.state[path]:
+                    self.state[path] = stat
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is None:
+                time.sleep(self.interval)
+            elif (remaining := deadline - time.monotonic()) > 0:
+                time.sleep(min(self.interval, remaining))
+            else:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _stat(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+class InotifyWatcher:
+    """Detect changes to files with Linux inotify.
+
+    The directories containing the files are watched rather than the files
+    themselves, since many editors save by replacing the file."""
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, paths: Iterable[Path]):
+        self.paths = {Path(path) for path in paths}
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        for directory in {path.parent for path in self.paths}:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"Cannot watch '{directory}'")
+            self.dirs[wd] = directory
+
+    def wait(self, timeout: float | None) -> set[Path]:
+        """Return files changed since the last call, waiting up to TIMEOUT seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _read_events(self) -> set[Path]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.dirs and name:
+                path = self.dirs[wd] / os.fsdecode(name)
+                if path in self.paths:
+                    changed.add(path)
+        return changed
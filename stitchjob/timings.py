@@ -0,0 +1,134 @@
+"""Lightweight timing of build phases.
+
+Phases are marked with `with span("name"):` and nest. Spans with the same
+name under the same parent are merged, so a span around a function called
+thousands of times adds up to a single entry with a call count. Until
+`enable()` is called, `span()` returns a shared no-op context manager, and hot
+paths can check `enabled` to skip even that.
+
+Each thread nests its spans in its own stack, so spans opened on worker
+threads (by `letter --merge` or the daemon) start at the top level.
+"""
+
+import argparse
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+import json
+import logging
+from pathlib import Path
+import threading
+import time
+from typing import ContextManager, Iterator
+
+enabled = False
+
+NULL_SPAN = nullcontext()
+
+@dataclass
+class Span:
+    name: str
+    path: tuple[str, ...]
+    start: float
+    seconds: float = 0.0
+    count: int = 0
+
+_origin = 0.0
+_spans: dict[tuple[str, ...], Span] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+def _stack() -> list[tuple[str, ...]]:
+    """Return the paths of the spans open on this thread."""
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+class _Timer:
+    __slots__ = ("span", "started", "stack")
+
+    def __init__(self, name: str):
+        self.stack = _stack()
+        path = (self.stack[-1] if self.stack else ()) + (name,)
+        with _lock:
+            self.span = _spans.get(path)
+            if self.span is None:
+                self.span = _spans[path] = Span(name, path, time.perf_counter() - _origin)
+
+    def __enter__(self):
+        self.stack.append(self.span.path)
+        self.started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        with _lock:
+            self.span.seconds += seconds
+            self.span.count += 1
+        self.stack.pop()
+        return False
+
+def span(name: str) -> ContextManager:
+    """Return a context manager timing the phase NAME, if timings are enabled."""
+    if not enabled:
+        return NULL_SPAN
+    return _Timer(name)
+
+def enable() -> None:
+    """Start recording spans, discarding any recorded before."""
+    global enabled, _origin
+    enabled = True
+    _origin = time.perf_counter()
+    with _lock:
+        _spans.clear()
+    _stack().clear()
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+def spans() -> list[Span]:
+    """Return the recorded spans, parents before their children."""
+    with _lock:
+        return list(_spans.values())
+
+def report() -> str:
+    """Return a table of recorded spans, indented by nesting."""
+    lines = ["Timings:"]
+    for s in spans():
+        label = "  " * len(s.path) + s.name
+        calls = f"  ({s.count} calls)" if s.count > 1 else ""
+        lines.append(f"{label:<28} {s.seconds * 1000:9.1f} ms{calls}")
+    return "\n".join(lines)
+
+def write_json(path: Path) -> None:
+    data = [{**asdict(s), "path": "/".join(s.path)} for s in spans()]
+    Path(path).write_text(json.dumps({"spans": data}, indent=2) + "\n", encoding="utf-8")
+
+@contextmanager
+def instrumented(args: argparse.Namespace) -> Iterator[None]:
+    """Time and/or profile the body according to the `--timings`,
+    `--timings-json`, and `--profile` options in ARGS."""
+    profiler = None
+    if args.timings or args.timings_json:
+        enable()
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with span(args.command):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logging.info(f"Wrote profile to '{args.profile}'")
+        if enabled:
+            disable()
+            if args.timings:
+                logging.info(report())
+            if args.timings_json:
+                write_json(args.timings_json)
+                logging.info(f"Wrote timings to '{args.timings_json}'")
@@ -1,8 +1,16 @@
+import os
 from pathlib import Path
 import shutil
 
 import pytest
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    """Keep snapshots, compiled templates, and other caches out of the user's."""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path
+
 @pytest.fixture(scope="session")
 def test_data_session(tmp_path_factory):
     src = Path(__file__).parent / "data"
@@ -50,6 +58,34 @@ def isolated_project(tmp_path):
 
     return tmp_path
 
+@pytest.fixture
+def fake_pdflatex(tmp_path, monkeypatch):
+    """Return a function that puts a `pdflatex` running SCRIPT first on PATH."""
+    def install(script: str) -> Path:
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir(exist_ok=True)
+        path = bin_dir / "pdflatex"
+        path.write_text(script)
+        path.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        return path
+    return install
+
+def process_alive(pid: int) -> bool:
+    """Return whether PID is running; a killed process whose parent is gone
+    may linger as a zombie until reaped."""
+    if not Path("/proc").is_dir():
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except FileNotFoundError:
+        return False
+    return stat.rpartition(")")[2].split()[0] != "Z"
+
 def pytest_addoption(parser):
     parser.addoption(
         "--runslow", action="store_true", default=False, help="Run tests marked as slow"
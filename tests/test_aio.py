@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from conftest import process_alive
+from stitchjob.aio import *
+from stitchjob.stitch_resume import CannotParseXMLResumeError, Resume
+
+def test_stitch_resume_from_string_without_pdf(test_data_session):
+    xml = (test_data_session / "resume.xml").read_text()
+    output = asyncio.run(AsyncStitcher().stitch_resume(xml, pdf=False))
+    resume = Resume(test_data_session / "resume.xml")
+    assert output.tex == latex_metadata() + resume.to_latex()
+    assert output.pdf is None
+
+def test_stitch_letter_from_string_without_pdf(test_data_session):
+    markdown = (test_data_session / "letter.md").read_text()
+    xml = (test_data_session / "resume.xml").read_text()
+    output = asyncio.run(AsyncStitcher().stitch_letter(markdown, xml, ("sig.png", b"PNG"),
+                                                       pdf=False, draft=True))
+    assert "Riley K. Chen" in output.tex
+    assert "{sig.png}" in output.tex
+    assert output.tex.startswith(latex_metadata(draft=True))
+
+def test_stitch_resume_with_invalid_xml_raises_exception():
+    with pytest.raises(CannotParseXMLResumeError):
+        asyncio.run(AsyncStitcher().stitch_resume("<resume><contact>", pdf=False))
+
+def test_compile_returns_pdf(test_data_session, fake_pdflatex):
+    fake_pdflatex(FAKE_PDFLATEX)
+    xml = (test_data_session / "resume.xml").read_text()
+    output = asyncio.run(AsyncStitcher().stitch_resume(xml))
+    assert output.pdf.startswith(b"%PDF")
+    assert b"stitched.cls" in output.pdf
+
+def test_compile_failure_raises_exception(fake_pdflatex):
+    fake_pdflatex(FAKE_PDFLATEX)
+    with pytest.raises(CannotCompilePDFError, match="Undefined control sequence"):
+        asyncio.run(AsyncStitcher().compile("FAIL"))
+
+def test_compile_timeout_kills_pdflatex(fake_pdflatex, tmp_path):
+    fake_pdflatex(FAKE_PDFLATEX)
+    with pytest.raises(CannotCompilePDFError, match="Timed out"):
+        asyncio.run(AsyncStitcher(timeout=0.5).compile(f"SLEEP {tmp_path}"))
+    assert not process_alive(int((tmp_path / "pid").read_text()))
+
+def test_compile_timeout_defaults_to_latex_timeout(fake_pdflatex, tmp_path, monkeypatch):
+    fake_pdflatex(FAKE_PDFLATEX)
+    monkeypatch.setattr(pdflatex_limits, "timeout", 0.5)
+    with pytest.raises(CannotCompilePDFError, match="Timed out after 0.5 s"):
+        asyncio.run(AsyncStitcher().compile(f"SLEEP {tmp_path}"))
+
+def test_compile_keeps_last_lines_of_log(fake_pdflatex, monkeypatch):
+    fake_pdflatex(FAKE_PDFLATEX)
+    monkeypatch.setattr(pdflatex_limits, "log_lines", 2)
+    with pytest.raises(CannotCompilePDFError) as e:
+        asyncio.run(AsyncStitcher().compile("FAIL"))
+    assert e.value.log[0] == "l.1 FAIL"
+    assert "-halt-on-error" in e.value.log[1]
+    assert e.value.tex_error.line == 1
+
+def test_cancelled_compile_kills_pdflatex(fake_pdflatex, tmp_path):
+    fake_pdflatex(FAKE_PDFLATEX)
+    async def cancel_compile():
+        task = asyncio.create_task(AsyncStitcher().compile(f"SLEEP {tmp_path}"))
+        while not (tmp_path / "pid").exists():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancel_compile())
+    assert not process_alive(int((tmp_path / "pid").read_text()))
+
+def test_concurrency_is_limited(fake_pdflatex, tmp_path):
+    fake_pdflatex(FAKE_PDFLATEX)
+    async def compile_many():
+        stitcher = AsyncStitcher(concurrency=2)
+        await asyncio.gather(*(stitcher.compile(f"COUNT {tmp_path}") for _ in range(6)))
+    asyncio.run(compile_many())
+    assert max(int(n) for n in (tmp_path / "running").read_text().split()) == 2
+
+# --- Helper Functions --- #
+
+# Stands in for pdflatex, acting on the first word of the document
+FAKE_PDFLATEX = """#!/bin/sh
+for arg; do tex=$arg; done
+command="$0 $*"
+set -- $(cat "$tex")
+case "$1" in
+  FAIL) printf '%s\n' "! Undefined control sequence." "l.1 FAIL" "$command"; exit 1;;
+  SLEEP) echo $$ > "$2/pid.tmp"; mv "$2/pid.tmp" "$2/pid"; exec sleep 30;;
+  COUNT) mkdir "$2/lock.$$"; ls -d "$2"/lock.* | wc -l >> "$2/running"; sleep 0.2
+         rmdir "$2/lock.$$";;
+esac
+echo "%PDF-1.5 $(ls)" > "${tex%.tex}.pdf"
+"""
@@ -0,0 +1,51 @@
+from stitchjob.cache import *
+
+def test_build_key_depends_on_file_contents(tmp_path):
+    path = tmp_path / "stitched.cls"
+    path.write_text("one")
+    key = build_key("tex", path)
+    assert build_key("tex", path) == key
+    path.write_text("two")
+    assert build_key("tex", path) != key
+
+def test_unchanged_tex_is_not_rewritten(tmp_path):
+    tex_path = tmp_path / "resume.tex"
+    cache = BuildCache(tmp_path)
+    with open_cached_tex(tex_path, cache) as out:
+        out.write("\\documentclass{stitched}")
+    mtime = tex_path.stat().st_mtime_ns
+
+    cache = BuildCache(tmp_path)
+    with open_cached_tex(tex_path, cache) as out:
+        out.write("\\documentclass{stitched}")
+    assert tex_path.stat().st_mtime_ns == mtime
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+def test_changed_tex_is_rewritten(tmp_path):
+    tex_path = tmp_path / "resume.tex"
+    with open_cached_tex(tex_path, BuildCache(tmp_path)) as out:
+        out.write("old")
+    cache = BuildCache(tmp_path)
+    with open_cached_tex(tex_path, cache) as out:
+        out.write("new")
+    assert tex_path.read_text() == "new"
+    assert (cache.hits, cache.misses) == (0, 1)
+
+def test_edited_output_is_not_fresh(tmp_path):
+    tex_path = tmp_path / "resume.tex"
+    with open_cached_tex(tex_path, BuildCache(tmp_path)) as out:
+        out.write("generated")
+    tex_path.write_text("edited by hand")
+    with open_cached_tex(tex_path, BuildCache(tmp_path)) as out:
+        out.write("generated")
+    assert tex_path.read_text() == "generated"
+
+def test_force_bypasses_cache(tmp_path):
+    tex_path = tmp_path / "resume.tex"
+    with open_cached_tex(tex_path, BuildCache(tmp_path)) as out:
+        out.write("same")
+    cache = BuildCache(tmp_path, force=True)
+    with open_cached_tex(tex_path, cache) as out:
+        out.write("same")
+    assert cache.misses == 1
@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 import subprocess
+import sys
 
 import pytest
 
@@ -52,3 +53,31 @@ def test_make_example_resume_pdf(isolated_project):
     assert result.returncode == 0
     assert (isolated_project / target).exists()
 
+# --- Startup --- #
+
+LETTER_ONLY_MODULES = {"mako", "frontmatter", "yaml", "stitchjob.stitch_letter"}
+
+# Modules imported by `import_module()` are not reported by -X importtime, but
+# their own imports are; stitchjob.cache is imported only by subcommands.
+
+def test_stitch_resume_help_imports_no_subcommand_modules():
+    modules = imported_modules(["resume", "--help"])
+    assert "stitchjob.shared" in modules
+    assert "stitchjob.cache" not in modules
+    assert not LETTER_ONLY_MODULES & modules
+
+def test_stitch_resume_does_not_import_letter_dependencies(test_data):
+    modules = imported_modules(["resume", str(test_data / "resume.xml")])
+    assert "stitchjob.cache" in modules
+    assert not LETTER_ONLY_MODULES & modules
+
+# --- Helper Functions --- #
+
+def imported_modules(argv: list[str]) -> set[str]:
+    """Return modules imported by `stitch ARGV`, per `python -X importtime`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "stitchjob.stitch", *argv],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return {line.rpartition("|")[2].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")}
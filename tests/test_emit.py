@@ -0,0 +1,89 @@
+import argparse
+import json
+
+import pytest
+
+from stitchjob.emit import *
+from stitchjob.stitch_resume import Resume, stitch_resume
+
+RESUME = """<resume>
+  <contact><name>Plain Text</name><email>p@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Summary"><description>Builds \\emph{fast} tools &amp; more.</description></section>
+  <section heading="Skills"><skills><skill>Python</skill><skill>C &amp; C++</skill></skills></section>
+  <section heading="Experience">
+    <experience begin="2021" end="present">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <blurb>Makers of \\textbf{anvils}</blurb>
+      <items><item>Cut builds from 10 to 2 minutes ($\\rightarrow$ 5$\\times$ faster)</item></items>
+    </experience>
+  </section>
+  <section type="education" heading="Education">
+    <degree><date>2015</date><type>B.S.</type><field>Physics</field><school>State</school><location>Town</location></degree>
+  </section>
+</resume>"""
+
+@pytest.mark.parametrize("text, markup, expected", [
+    ("\\emph{fast} \\textbf{very}", False, "fast very"),
+    ("\\emph{fast} & <b>", True, "<em>fast</em> &amp; &lt;b&gt;"),
+    ("$\\leftarrow$ 2019 -- 2021", False, "← 2019 – 2021"),
+    ("one\\\\ two", False, "one\ntwo"),
+    ("\\textbf{\\emph{nested}}", True, "<strong><em>nested</em></strong>"),
+    ("Won $500 prize", False, "Won $500 prize"),
+    ("$\\sim$40% of $5 units", True, "∼40% of $5 units"),
+    (None, False, ""),
+])
+def test_plain_text(text, markup, expected):
+    assert plain_text(text, markup) == expected
+
+def test_parse_formats():
+    assert parse_formats("tex, TXT,json,txt") == ["tex", "txt", "json"]
+    with pytest.raises(argparse.ArgumentTypeError, match="pdf"):
+        parse_formats("txt,pdf")
+
+def test_emit_resume_text():
+    text = emit_resume(Resume.from_string(RESUME), ["txt"])["txt"]
+    assert text.startswith("PLAIN TEXT\np@example.com | 555 | Here\n")
+    assert "Builds fast tools & more." in text
+    assert "Python · C & C++" in text
+    assert "Engineer — Acme, Remote (2021 – present)\n  Makers of anvils\n" in text
+    assert "  - Cut builds from 10 to 2 minutes (→ 5× faster)" in text
+    assert "B.S. in Physics, State, Town (2015)" in text
+
+def test_emit_resume_json():
+    data = json.loads(emit_resume(Resume.from_string(RESUME), ["json"])["json"])
+    assert data["contact"]["name"] == "Plain Text"
+    assert [section["heading"] for section in data["sections"]] == [
+        "Summary", "Skills", "Experience", "Education"]
+    experience = data["sections"][2]["children"][0]
+    assert experience["kind"] == "experience"
+    assert experience["items"] == ["Cut builds from 10 to 2 minutes (→ 5× faster)"]
+    assert data["sections"][3]["children"][0]["field"] == "Physics"
+
+def test_emit_resume_html():
+    page = emit_resume(Resume.from_string(RESUME), ["html"])["html"]
+    assert "<title>Plain Text</title>" in page
+    assert "<p>Builds <em>fast</em> tools &amp; more.</p>" in page
+    assert "<li>C &amp; C++</li>" in page
+    assert page.count("<section>") == page.count("</section>") == 4
+
+def test_emit_resume_walks_once_for_all_formats():
+    outputs = emit_resume(Resume.from_string(RESUME), ["tex", "txt", "json", "html"])
+    assert list(outputs) == ["txt", "json", "html"]
+
+def test_stitch_resume_formats(tmp_path):
+    xml_path = tmp_path / "resume.xml"
+    xml_path.write_text(RESUME)
+    stitch_resume(format_args(xml_path, ["txt", "json"]))
+    assert (tmp_path / "resume.txt").exists()
+    assert (tmp_path / "resume.json").exists()
+    assert not (tmp_path / "resume.tex").exists()
+    stitch_resume(format_args(xml_path, ["tex", "html"]))
+    assert (tmp_path / "resume.tex").exists()
+    assert (tmp_path / "resume.html").exists()
+
+# --- Helper Functions --- #
+
+def format_args(xml_path, formats) -> argparse.Namespace:
+    return argparse.Namespace(input=str(xml_path), format=formats, output=None, snapshot=False,
+                              pdf=False, openpdf=False, draft=False, precompile=False,
+                              force=False, cache_stats=False)
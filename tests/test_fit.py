@@ -0,0 +1,76 @@
+import argparse
+
+import pytest
+
+from stitchjob.fit import *
+from stitchjob.shared import count_pdf_pages
+from stitchjob.stitch_resume import Resume
+
+RESUME = """<resume>
+  <contact><name>Long</name><email>l@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Skills"><skills><skill>Python</skill><skill>Writing</skill></skills></section>
+  <section heading="Experience">
+    <experience begin="2021" end="present">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <items><item>A1</item><item>A2</item><item>A3</item><item>A4</item><item>A5</item></items>
+    </experience>
+    <experience begin="2018" end="2021">
+      <title>Developer</title><organization>Initech</organization><location>Austin</location>
+      <items><item>B1</item><item>B2</item><item>B3</item></items>
+    </experience>
+  </section>
+</resume>"""
+
+def test_drop_order_takes_from_longest_experience_first():
+    resume = Resume.from_string(RESUME)
+    assert drop_order(resume) == [(1, 0, 4), (1, 0, 3), (1, 1, 2), (1, 0, 2),
+                                  (1, 1, 1), (1, 0, 1)]
+
+def test_estimate_heights_decrease():
+    resume = Resume.from_string(RESUME)
+    heights = estimate_heights(resume, drop_order(resume))
+    assert len(heights) == 7
+    assert heights == sorted(heights, reverse=True)
+
+@pytest.mark.parametrize("guess", range(0, 7))
+def test_search_finds_fewest_items_from_any_guess(guess):
+    pages = {n: 3 if n < 2 else 2 if n < 5 else 1 for n in range(7)}
+    runs = []
+    counter = lambda n: runs.append(n) or pages[n]
+    assert search(counter, guess, 6, 2) == 2
+    assert search(counter, guess, 6, 5) == 0
+    assert search(counter, guess, 6, 0) == 6
+
+def test_count_pdf_pages_reads_wrapped_output(tmp_path, fake_pdflatex):
+    fake_pdflatex(FAKE_PDFLATEX)
+    tex_path = tmp_path / "resume.tex"
+    tex_path.write_text("\\item one\n" * 9)
+    assert count_pdf_pages(tex_path) == 3
+
+def test_fit_resume_drops_fewest_items(fake_pdflatex, caplog):
+    fake_pdflatex(FAKE_PDFLATEX)
+    caplog.set_level(logging.INFO)
+    fitted = fit_resume(Resume.from_string(RESUME), 2, fit_args())
+    experiences = fitted.sections[1].children
+    assert experiences[0].items == ("A1", "A2", "A3")
+    assert experiences[1].items == ("B1", "B2", "B3")
+    assert "by dropping 2 item(s)" in caplog.text
+
+def test_fit_resume_that_cannot_fit(fake_pdflatex, caplog):
+    fake_pdflatex(FAKE_PDFLATEX)
+    fitted = fit_resume(Resume.from_string(RESUME), 0, fit_args())
+    assert [len(exp.items) for exp in fitted.sections[1].children] == [1, 1]
+    assert "Cannot fit resume" in caplog.text
+
+# --- Helper Functions --- #
+
+# Stands in for pdflatex, setting four \items per page
+FAKE_PDFLATEX = """#!/bin/sh
+for arg; do tex=$arg; done
+items=$(grep -c '^\\\\item' "$tex")
+echo "Output written on /a/long/scratch/directory/to/make/pdflatex/wrap/the/line/$tex"
+echo ".pdf ($(( (items + 3) / 4 )) pages, 1234 bytes)."
+"""
+
+def fit_args() -> argparse.Namespace:
+    return argparse.Namespace(input="resume.xml", draft=False, precompile=False)
@@ -0,0 +1,33 @@
+import io
+
+from stitchjob.latex_format import *
+from stitchjob.stitch_resume import RESUME_LATEX_CLASS, Resume, resume_preamble
+
+def test_format_marker_follows_documentclass(test_data_session):
+    resume = Resume(test_data_session / "resume.xml")
+    out = io.StringIO()
+    resume.write_latex(out, format_marker=True)
+    assert out.getvalue().startswith("\n\\documentclass{stitched}\n" + FORMAT_MARKER + "\n")
+
+def test_ensure_format_is_built_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr("stitchjob.latex_format.tex_version", lambda: "pdfTeX 3.141592653")
+    calls = []
+
+    def fake_run(command, cwd, **kwargs):
+        calls.append(command)
+        assert (cwd / "stitched.cls").exists()
+        jobname = next(arg for arg in command if arg.startswith("-jobname="))[9:]
+        (cwd / f"{jobname}.fmt").touch()
+        return []
+
+    monkeypatch.setattr("stitchjob.latex_format.run_supervised", fake_run)
+    fmt_path = ensure_format("stitched", resume_preamble(), [RESUME_LATEX_CLASS])
+    assert fmt_path.with_suffix(".fmt").exists()
+    assert "mylatex.ltx" in calls[0]
+    assert ensure_format("stitched", resume_preamble(), [RESUME_LATEX_CLASS]) == fmt_path
+    assert len(calls) == 1
+
+def test_ensure_format_without_tex(monkeypatch):
+    monkeypatch.setattr("stitchjob.latex_format.tex_version", lambda: None)
+    assert ensure_format("stitched", resume_preamble()) is None
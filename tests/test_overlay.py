@@ -0,0 +1,132 @@
+import argparse
+
+import pytest
+
+from stitchjob.overlay import *
+from stitchjob.stitch_resume import Resume, stitch_resume
+
+MASTER = """<resume>
+  <contact><name>Master</name><email>m@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Summary"><description>Generalist.</description></section>
+  <section heading="Skills">
+    <skills>
+      <skill>Python</skill>
+      <skill id="rust">Rust</skill>
+      <skill>Writing</skill>
+    </skills>
+  </section>
+  <section heading="Experience" id="work">
+    <experience begin="2021" end="present" id="acme">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <items>
+        <item>Rewrote billing</item>
+        <item id="builds">Moved builds</item>
+        <item id="talk">Spoke at PyCon</item>
+      </items>
+    </experience>
+    <experience begin="2018" end="2021" id="initech">
+      <title>Developer</title><organization>Initech</organization><location>Austin</location>
+      <items><item>Built forms</item></items>
+    </experience>
+  </section>
+</resume>"""
+
+def test_drop_by_id_and_path():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(drop=["talk", "section[2]/skills[1]/skill[3]",
+                                                  "section[1]"]))
+    assert [section.heading for section in variant.sections] == ["Skills", "Experience"]
+    assert [skill.name for skill in variant.sections[0].children[0].skills] == ["Python", "Rust"]
+    assert variant.sections[1].children[0].items == ("Rewrote billing", "Moved builds")
+    assert variant.sections[1].children[0].item_ids == (None, "builds")
+
+def test_order_moves_parts_ahead_of_siblings():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(order=["work", "initech", "talk", "builds"]))
+    assert [section.heading for section in variant.sections] == ["Experience", "Summary", "Skills"]
+    assert [exp.organization for exp in variant.sections[0].children] == ["Initech", "Acme"]
+    assert variant.sections[0].children[1].items == ("Spoke at PyCon", "Moved builds",
+                                                     "Rewrote billing")
+
+def test_replace_text_and_fields():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(replace={
+        "builds": "Moved builds to Bazel",
+        "rust": "Rust (async)",
+        "acme": {"title": "Staff Engineer"},
+        "section[1]/description[1]": "Backend engineer.",
+        "work": {"heading": "Work"},
+    }))
+    acme = variant.sections[2].children[0]
+    assert acme.title == "Staff Engineer"
+    assert acme.items[1] == "Moved builds to Bazel"
+    assert variant.sections[1].children[0].skills[1].name == "Rust (async)"
+    assert variant.sections[0].children[0].text == "Backend engineer."
+    assert variant.sections[2].heading == "Work"
+    # The master is unchanged
+    assert resume.sections[2].children[0].title == "Engineer"
+
+def test_untouched_parts_are_shared():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(drop=["talk"]))
+    assert variant.sections[0] is resume.sections[0]
+    assert variant.sections[2].children[1] is resume.sections[2].children[1]
+    assert apply_overlay(resume, Overlay()) is resume
+
+def test_paths_refer_to_master():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(drop=["section[1]"],
+                                            replace={"section[3]/*[2]/item[1]": "Built APIs"}))
+    assert variant.sections[1].children[1].items == ("Built APIs",)
+
+def test_parts_left_empty_are_dropped():
+    resume = Resume.from_string(MASTER)
+    variant = apply_overlay(resume, Overlay(drop=["section[3]/experience[1]/item[1]", "builds",
+                                                  "talk", "section[2]/skills[1]/skill[1]",
+                                                  "rust", "section[2]/skills[1]/skill[3]"]))
+    assert [section.heading for section in variant.sections] == ["Summary", "Experience"]
+    assert [exp.organization for exp in variant.sections[1].children] == ["Initech"]
+
+@pytest.mark.parametrize("overlay", [
+    Overlay(drop=["nonexistent"]),
+    Overlay(drop=["section[9]"]),
+    Overlay(drop=["section[1]/bogus"]),
+    Overlay(replace={"acme": {"salary": "lots"}}),
+    Overlay(replace={"talk": ["not", "text"]}),
+    Overlay(replace={"section[2]/skills[1]": "Python, Rust"}),
+    Overlay(order=["talk", "section[3]/experience[1]/item[3]"]),
+])
+def test_invalid_overlays(overlay):
+    with pytest.raises(CannotApplyOverlayError):
+        apply_overlay(Resume.from_string(MASTER), overlay)
+
+def test_overlay_from_file(tmp_path):
+    path = tmp_path / "job.yml"
+    path.write_text("drop: [talk]\nreplace:\n  acme:\n    title: Lead\n")
+    assert Overlay.from_file(path) == Overlay(drop=["talk"], replace={"acme": {"title": "Lead"}})
+    path.write_text("remove: [talk]\n")
+    with pytest.raises(CannotApplyOverlayError, match="Unknown key"):
+        Overlay.from_file(path)
+    with pytest.raises(CannotApplyOverlayError, match="File not found"):
+        Overlay.from_file(tmp_path / "missing.yml")
+
+def test_stitch_resume_builds_each_overlay(tmp_path):
+    base = tmp_path / "master.xml"
+    base.write_text(MASTER)
+    (tmp_path / "backend.yml").write_text("drop: [initech]\n")
+    (tmp_path / "frontend.yml").write_text("drop: [acme]\n")
+    stitch_resume(overlay_args(base, [tmp_path / "backend.yml", tmp_path / "frontend.yml"]))
+    backend = (tmp_path / "backend.tex").read_text()
+    frontend = (tmp_path / "frontend.tex").read_text()
+    assert "Acme" in backend and "Initech" not in backend
+    assert "Initech" in frontend and "Acme" not in frontend
+    assert not (tmp_path / "master.tex").exists()
+
+# --- Helper Functions --- #
+
+def overlay_args(base, overlays) -> argparse.Namespace:
+    return argparse.Namespace(input="resume/resume.xml", base=str(base),
+                              overlay=[str(path) for path in overlays], output=None,
+                              select=None, fit_pages=None, snapshot=False, pdf=False,
+                              openpdf=False, draft=False, precompile=False, force=False,
+                              cache_stats=False)
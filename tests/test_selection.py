@@ -0,0 +1,108 @@
+import argparse
+
+import pytest
+
+from stitchjob.selection import *
+from stitchjob.stitch_resume import Resume, stitch_resume
+
+TAGGED_RESUME = """<resume>
+  <contact><name>Tagged</name><email>t@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Summary"><description>Always here.</description></section>
+  <section heading="Skills">
+    <skills>
+      <skill tags="python">Python</skill>
+      <skill tags="rust, infra">Rust</skill>
+      <skill>Writing</skill>
+    </skills>
+  </section>
+  <section type="professional" heading="Experience">
+    <experience begin="2021" end="present" tags="python backend">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <items>
+        <item>Rewrote billing</item>
+        <item tags="infra">Moved builds</item>
+        <item id="talk">Spoke at PyCon</item>
+      </items>
+    </experience>
+    <experience begin="2018" end="2021" tags="frontend">
+      <title>Developer</title><organization>Initech</organization><location>Austin</location>
+      <items><item>Built forms</item></items>
+    </experience>
+  </section>
+  <section heading="Volunteering" tags="community">
+    <experience begin="2015" end="2018">
+      <title>Mentor</title><organization>Club</organization><location>Austin</location>
+      <items><item>Taught kids</item></items>
+    </experience>
+  </section>
+</resume>"""
+
+def test_parse_query_precedence():
+    assert parse_query("a or b and not c") == \
+        ("or", ("term", "a"), ("and", ("term", "b"), ("not", ("term", "c"))))
+    assert parse_query("(A or b) and c") == \
+        ("and", ("or", ("term", "a"), ("term", "b")), ("term", "c"))
+
+@pytest.mark.parametrize("query", ["", "python and", "(python", "python)", "and python",
+                                   "python backend"])
+def test_parse_query_invalid(query):
+    with pytest.raises(InvalidSelectionError):
+        parse_query(query)
+
+def test_select_keeps_matching_and_untagged_parts():
+    selected = select_resume(Resume.from_string(TAGGED_RESUME), "python and not infra")
+    assert headings(selected) == ["Summary", "Skills", "Experience"]
+    assert [skill.name for skill in selected.sections[1].children[0].skills] == ["Python", "Writing"]
+    experiences = selected.sections[2].children
+    assert [exp.organization for exp in experiences] == ["Acme"]
+    assert experiences[0].items == ("Rewrote billing", "Spoke at PyCon")
+
+def test_select_matches_id_and_inherited_tags():
+    selected = select_resume(Resume.from_string(TAGGED_RESUME), "talk or community")
+    assert headings(selected) == ["Summary", "Skills", "Experience", "Volunteering"]
+    assert selected.sections[2].children[0].items == ("Spoke at PyCon",)
+    assert selected.sections[3].children[0].items == ("Taught kids",)
+
+def test_select_leaves_resume_unchanged():
+    resume = Resume.from_string(TAGGED_RESUME)
+    before = resume.to_latex()
+    select_resume(resume, "frontend")
+    assert resume.to_latex() == before
+    assert resume.sections[2].children[0].items == ("Rewrote billing", "Moved builds",
+                                                     "Spoke at PyCon")
+
+def test_select_indexes_resume_once():
+    resume = Resume.from_string(TAGGED_RESUME)
+    select_resume(resume, "python")
+    index = resume_index(resume)
+    select_resume(resume, "infra")
+    assert resume_index(resume) is index
+
+def test_select_shares_unchanged_parts():
+    resume = Resume.from_string(TAGGED_RESUME)
+    selected = select_resume(resume, "python")
+    assert selected.sections[0] is resume.sections[0]
+    assert selected.sections[2].children[0] is resume.sections[2].children[0]
+    with pytest.raises(AttributeError):
+        selected.sections[2].children[0].items = ()
+
+def test_select_unknown_tag_warns(caplog):
+    selected = select_resume(Resume.from_string(TAGGED_RESUME), "cobol")
+    assert "cobol" in caplog.text
+    assert headings(selected) == ["Summary", "Skills"]
+
+def test_stitch_resume_with_select(tmp_path):
+    input_path = tmp_path / "master.xml"
+    input_path.write_text(TAGGED_RESUME)
+    output_path = tmp_path / "acme.tex"
+    stitch_resume(argparse.Namespace(input=input_path, output=output_path, select="frontend",
+                                     pdf=False, openpdf=False, force=False, cache_stats=False,
+                                     draft=False, precompile=False))
+    tex = output_path.read_text()
+    assert "Initech" in tex and "Acme" not in tex
+    assert not input_path.with_suffix(".tex").exists()
+
+# --- Helper Functions --- #
+
+def headings(resume: Resume) -> list[str]:
+    return [section.heading for section in resume.sections]
@@ -1,3 +1,9 @@
+import random
+import time
+
+import pytest
+
+from conftest import process_alive
 from stitchjob.shared import *
 
 def test_escape_tex_special_characters():
@@ -10,3 +16,137 @@ def test_smarten_tex_quotes():
     text = "some 'single' and \"double\" quotes"
     smartened = smarten_tex_quotes(text)
     assert smartened == "some `single' and ``double'' quotes"
+
+def test_escape_tex_leaves_math_alone():
+    text = "Cut costs by $\\sim$40% & $5 per unit"
+    assert escape_tex(text) == r"Cut costs by $\sim$40\% \& \$5 per unit"
+
+def test_escape_tex_smarten_quotes():
+    text = "the 'best' way to 50%"
+    assert escape_tex(text, smarten_quotes=True) == "the `best' way to 50\\%"
+
+def test_escape_tex_matches_reference_implementation():
+    rng = random.Random(2025)
+    alphabet = "ab \n$&%#_~^\\{}\"'"
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert escape_tex(text) == reference_escape_tex(text)
+        assert (escape_tex(text, smarten_quotes=True)
+                == reference_smarten_tex_quotes(reference_escape_tex(text)))
+
+def test_open_tex_removes_incomplete_file(tmp_path):
+    tex_path = tmp_path / "partial.tex"
+    with pytest.raises(RuntimeError):
+        with open_tex(tex_path) as out:
+            out.write("\\documentclass")
+            raise RuntimeError("interrupted")
+    assert not tex_path.exists()
+
+def test_compile_pdf_runs_in_scratch_directory(tmp_path, monkeypatch):
+    tex_path = tmp_path / "resume.tex"
+    tex_path.write_text("\\documentclass{stitched}")
+    cls_path = tmp_path / "assets" / "stitched.cls"
+    cls_path.parent.mkdir()
+    cls_path.write_text("% class")
+    seen = {}
+
+    def fake_run(command, cwd, env, **kwargs):
+        seen["cwd"] = cwd
+        seen["files"] = sorted(path.name for path in cwd.iterdir())
+        seen["texinputs"] = env["TEXINPUTS"]
+        for suffix in (".aux", ".log", ".pdf"):
+            (cwd / "resume").with_suffix(suffix).write_text("output")
+        return []
+
+    monkeypatch.setattr("stitchjob.shared.run_supervised", fake_run)
+    pdf_path = compile_pdf(tex_path, assets=[cls_path])
+    assert pdf_path.read_text() == "output"
+    assert seen["cwd"] != tmp_path
+    assert seen["files"] == ["resume.tex", "stitched.cls"]
+    assert seen["texinputs"].startswith(str(tmp_path))
+    assert not seen["cwd"].exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["assets", "resume.pdf", "resume.tex"]
+
+def test_install_file_replaces_destination(tmp_path):
+    (tmp_path / "new").write_text("new")
+    (tmp_path / "old").write_text("old")
+    install_file(tmp_path / "new", tmp_path / "old")
+    assert (tmp_path / "old").read_text() == "new"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new", "old"]
+
+def test_make_temp_file_is_unique_per_call(tmp_path):
+    dst = tmp_path / "out" / "resume.tex"
+    first, second = make_temp_file(dst), make_temp_file(dst)
+    assert first != second
+    assert first.parent == dst.parent
+    assert first.name.startswith(".resume.tex.")
+    assert first.stat().st_mode & 0o777 == 0o666 & ~UMASK
+
+def test_run_supervised_keeps_last_lines(tmp_path):
+    log = run_supervised(["sh", "-c", "for i in $(seq 1000); do echo line $i; done"],
+                         cwd=tmp_path, limits=PdflatexLimits(log_lines=10))
+    assert log == [f"line {i}" for i in range(991, 1001)]
+
+def test_run_supervised_extracts_first_error(tmp_path):
+    script = ("printf '%s\\n' '! Undefined control sequence.' 'l.7 \\item Built \\foo' "
+              "'! Second error.'; seq 500; exit 1")
+    with pytest.raises(CannotCompilePDFError, match="Undefined control sequence") as e:
+        run_supervised(["sh", "-c", script], cwd=tmp_path, name="resume.tex",
+                       limits=PdflatexLimits(log_lines=5))
+    assert e.value.tex_error == TexError("Undefined control sequence.", 7, "\\item Built \\foo")
+    assert e.value.log == ["496", "497", "498", "499", "500"]
+    assert "line 7" in str(e.value)
+
+def test_run_supervised_timeout_kills_process_group(tmp_path):
+    script = f"sleep 30 & echo $! > {tmp_path}/pid; wait"
+    with pytest.raises(CannotCompilePDFError, match="Timed out") as e:
+        run_supervised(["sh", "-c", script], cwd=tmp_path, limits=PdflatexLimits(timeout=0.5))
+    assert e.value.timed_out
+    time.sleep(0.1)
+    assert not process_alive(int((tmp_path / "pid").read_text()))
+
+def test_run_supervised_limits_memory(tmp_path):
+    resource = pytest.importorskip("resource")
+    if not hasattr(resource, "prlimit"):
+        pytest.skip("prlimit() not available")
+    log = run_supervised(["sh", "-c", "sleep 0.5; ulimit -v"], cwd=tmp_path,
+                         limits=PdflatexLimits(memory=512))
+    assert log == [str(512 * 1024)]
+
+def test_run_supervised_without_command(tmp_path):
+    with pytest.raises(CannotCompilePDFError, match="Cannot run"):
+        run_supervised(["no-such-pdflatex"], cwd=tmp_path)
+
+def test_parse_tex_error_with_shortened_line():
+    error = parse_tex_error(["This is pdfTeX", "! LaTeX Error: File `x.sty' not found.", "",
+                             "Type X to quit.", "l.1234 ...long line with \\usepackage{x}"])
+    assert error == TexError("LaTeX Error: File `x.sty' not found.", 1234,
+                             "...long line with \\usepackage{x}")
+    assert parse_tex_error(["Output written on resume.pdf"]) is None
+
+# --- Helper Functions --- #
+
+def reference_escape_tex(text: str) -> str:
+    """Original multi-pass implementation of `escape_tex()`."""
+    special = ['&', '%', '#', '_', '~', '^']
+    replacement = {'&': r'\&', '%': r'\%', '#': r'\#', '_': r'\_',
+                   '~': r'\textasciitilde{}', '^': r'\^{}'}
+
+    def escape(segment):
+        for char in special:
+            segment = segment.replace(char, replacement[char])
+        return segment.replace('$', r'\$')
+
+    parts = []
+    last_end = 0
+    for match in re.finditer(r'\$(.+?)\$', text):
+        parts.append(escape(text[last_end:match.start()]))
+        parts.append(match.group(0))
+        last_end = match.end()
+    parts.append(escape(text[last_end:]))
+    return ''.join(parts)
+
+def reference_smarten_tex_quotes(text: str) -> str:
+    text = re.sub(r'"(.+?)"', r"``\1''", text)
+    text = re.sub(r"'(.+?)'", r"`\1'", text)
+    return text
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from stitchjob.snapshot import *
+from stitchjob.stitch_resume import CannotParseXMLResumeError
+
+def test_load_resume_writes_and_uses_snapshot(resume_path, cache_home, caplog):
+    caplog.set_level(logging.DEBUG)
+    first = load_resume(resume_path)
+    assert len(snapshots(cache_home)) == 1
+    second = load_resume(resume_path)
+    assert "Loaded resume from snapshot" in caplog.text
+    assert second is not first
+    assert second.to_latex() == first.to_latex()
+
+def test_snapshot_invalidated_by_content_with_same_size_and_mtime(resume_path, cache_home):
+    load_resume(resume_path)
+    stat = resume_path.stat()
+    resume_path.write_text(resume_path.read_text().replace("Riley", "Rilez"))
+    os.utime(resume_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_resume(resume_path).contact["name"].startswith("Rilez")
+
+def test_corrupt_snapshot_is_replaced(resume_path, cache_home):
+    load_resume(resume_path)
+    snapshots(cache_home)[0].write_bytes(b"not a pickle")
+    assert load_resume(resume_path).contact["name"].startswith("Riley")
+    assert load_resume(resume_path).contact["name"].startswith("Riley")
+
+def test_no_snapshot(resume_path, cache_home):
+    load_resume(resume_path, use_snapshot=False)
+    assert snapshots(cache_home) == []
+
+def test_load_resume_errors(tmp_path, cache_home):
+    with pytest.raises(CannotReadResumeFileError):
+        load_resume(tmp_path / "missing.xml")
+    invalid = tmp_path / "invalid.xml"
+    invalid.write_text("<resume><contact>")
+    with pytest.raises(CannotParseXMLResumeError):
+        load_resume(invalid)
+
+def test_least_recently_used_snapshots_are_pruned(tmp_path, cache_home):
+    for n in range(3):
+        path = tmp_path / f"resume{n}.xml"
+        path.write_text(f"<resume><contact><name>R{n}</name></contact></resume>")
+        load_resume(path)
+    oldest = snapshots(cache_home)[0]
+    os.utime(oldest, ns=(0, 0))
+    prune_snapshots(oldest.parent, keep=2)
+    assert len(snapshots(cache_home)) == 2
+    assert oldest not in snapshots(cache_home)
+
+# --- Helper Functions --- #
+
+@pytest.fixture
+def resume_path(test_data):
+    return test_data / "resume.xml"
+
+def snapshots(cache_home):
+    return sorted((cache_home / "stitchjob" / "snapshots").glob("*.pickle"))
@@ -0,0 +1,65 @@
+import argparse
+
+import pytest
+
+from stitchjob.sourcemap import *
+from stitchjob.stitch_resume import stitch_resume
+
+RESUME = """<resume>
+  <contact><name>Broken</name><email>b@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Experience">
+    <experience begin="2021" end="present">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <items>
+        <item>Rewrote billing</item>
+        <item>Moved builds
+          to \\foo spot instances</item>
+      </items>
+    </experience>
+  </section>
+</resume>"""
+
+def test_match_field_prefers_field_spanning_error():
+    resume = Resume.from_string(RESUME)
+    line = "\\experience{2021 -- present}{Engineer}{Acme}[Remote]"
+    assert match_field(resume, line, "\\experience{2021 -- present}{Engin") \
+        == Field("title", "Engineer")
+    assert match_field(resume, line, "...present}{Engineer}{Acme}[Rem") \
+        == Field("location", "Remote")
+    assert match_field(resume, "\\item Moved builds to \\foo spot instances") \
+        == Field("item", "Moved builds to \\foo spot instances")
+    assert match_field(resume, "\\begin{duties}") is None
+
+def test_find_xml_line(tmp_path):
+    xml_path = tmp_path / "resume.xml"
+    xml_path.write_text(RESUME)
+    assert find_xml_line(xml_path, Field("item", "Moved builds to \\foo spot instances")) == 8
+    assert find_xml_line(xml_path, Field("section", "Experience", "heading")) == 3
+    assert find_xml_line(xml_path, Field("item", "Not there")) is None
+
+def test_failed_build_names_xml_source(tmp_path, fake_pdflatex):
+    fake_pdflatex(FAKE_PDFLATEX)
+    xml_path = tmp_path / "resume.xml"
+    xml_path.write_text(RESUME)
+    with pytest.raises(CannotCompilePDFError) as e:
+        stitch_resume(build_args(xml_path))
+    assert e.value.tex_error.message == "Undefined control sequence."
+    assert e.value.tex_error.source == "<item> at resume.xml:8"
+    assert str(e.value).endswith("in <item> at resume.xml:8")
+
+# --- Helper Functions --- #
+
+# Stands in for pdflatex, failing at the first \foo like pdflatex would
+FAKE_PDFLATEX = """#!/bin/sh
+for arg; do tex=$arg; done
+line=$(grep -n 'foo' "$tex" | head -n 1)
+[ -z "$line" ] && exit 0
+printf '%s\\n' '! Undefined control sequence.' \\
+    "l.${line%%:*} ${line#*:}" | sed 's/foo .*/foo/'
+exit 1
+"""
+
+def build_args(xml_path) -> argparse.Namespace:
+    return argparse.Namespace(input=str(xml_path), output=None, snapshot=False, pdf=True,
+                              openpdf=False, draft=False, precompile=False, force=False,
+                              cache_stats=False)
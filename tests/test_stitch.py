@@ -31,3 +31,13 @@ def test_stitch_resume_prints_debug_messages(test_data, capsys):
     main(["--verbose", "resume", str(test_data / "resume.xml")])
     out, _ = capsys.readouterr()
     assert "DEBUG: Parsing resume XML file" in out
+
+def test_stitch_resume_draft_skips_tagging(test_data):
+    input_path = test_data / "resume.xml"
+    main(["resume", "--draft", str(input_path)])
+    tex = input_path.with_suffix(".tex").read_text()
+    assert r"\DocumentMetadata" not in tex
+    assert r"\providecommand\tagtool" in tex
+
+    main(["resume", "--final", str(input_path)])
+    assert r"\DocumentMetadata" in input_path.with_suffix(".tex").read_text()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import logging
+
+import pytest
+
+from stitchjob.stitch_batch import *
+
+def test_read_toml_manifest(tmp_path):
+    path = tmp_path / "jobs.toml"
+    path.write_text('[[job]]\ncommand = "resume"\ninput = "resume.xml"\npdf = true\n')
+    jobs = read_manifest(path)
+    assert len(jobs) == 1
+    assert jobs[0].command == "resume"
+    assert jobs[0].input == tmp_path / "resume.xml"
+    assert jobs[0].pdf is True
+
+def test_read_json_manifest(tmp_path):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps([{"command": "letter", "input": "letter.md",
+                                 "resume": "resume.xml"}]))
+    jobs = read_manifest(path)
+    assert jobs[0].resume == tmp_path / "resume.xml"
+
+def test_read_csv_manifest(tmp_path):
+    path = tmp_path / "jobs.csv"
+    path.write_text("command,input,resume,pdf\n"
+                    "resume,resume.xml,,no\n"
+                    "letter,letter.md,resume.xml,yes\n")
+    jobs = read_manifest(path)
+    assert [job.command for job in jobs] == ["resume", "letter"]
+    assert jobs[0].resume is None
+    assert jobs[1].pdf is True
+
+def test_read_csv_manifest_with_false_flags(tmp_path):
+    path = tmp_path / "jobs.csv"
+    path.write_text("command,input,pdf,draft,force\n"
+                    "resume,resume.xml,no,false,no\n"
+                    "resume,resume.xml,0,yes,yes\n")
+    jobs = read_manifest(path)
+    assert (jobs[0].pdf, jobs[0].draft, jobs[0].force) == (False, False, False)
+    assert (jobs[1].pdf, jobs[1].draft, jobs[1].force) == (False, True, True)
+
+def test_manifest_with_unknown_key_raises_exception(tmp_path):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps([{"command": "resume", "input": "r.xml", "color": "red"}]))
+    with pytest.raises(CannotReadManifestError):
+        read_manifest(path)
+
+def test_stitch_batch_builds_all_jobs(test_data):
+    manifest = test_data / "jobs.json"
+    manifest.write_text(json.dumps([
+        {"command": "resume", "input": "resume.xml"},
+        {"command": "letter", "input": "letter.md", "resume": "resume.xml"},
+    ]))
+    stitch_batch(argparse.Namespace(manifest=manifest, jobs=2, pdf=False, force=False))
+    assert (test_data / "resume.tex").exists()
+    assert (test_data / "letter.tex").exists()
+
+def test_stitch_batch_exits_on_failed_job(test_data, caplog):
+    caplog.set_level(logging.INFO)
+    manifest = test_data / "jobs.json"
+    manifest.write_text(json.dumps([
+        {"command": "resume", "input": "resume.xml"},
+        {"command": "resume", "input": "missing.xml"},
+    ]))
+    with pytest.raises(SystemExit):
+        stitch_batch(argparse.Namespace(manifest=manifest, jobs=1, pdf=False, force=False))
+    assert (test_data / "resume.tex").exists()
+    assert "1 succeeded, 1 failed" in caplog.text
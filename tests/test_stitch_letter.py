@@ -1,9 +1,12 @@
 import argparse
+import os
 from pathlib import Path
+import time
 
 import pytest
 
 from stitchjob.stitch_letter import *
+from stitchjob.stitch_resume import Resume
 
 def test_example_letter_parsed_correctly(test_data_session, tmp_path):
     letter = Letter.from_file(test_data_session / "letter.md")
@@ -74,6 +77,85 @@ def test_stitch_letter_signature_image_from_metadata(test_data):
     stitch_letter(args)
     assert text_in_tex_file(args, "\\includegraphics[height=2em]{mysig.png}")
 
+def test_load_template_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    template_lookup.cache_clear()
+    template = load_template()
+    assert load_template() is template
+    assert Path(template.filename) == LETTER_TEMPLATE
+    assert list((tmp_path / "stitchjob" / "mako").rglob("letter.mako.py"))
+
+def test_load_template_from_user_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "letter.mako").write_text("Custom letter for ${letter.metadata['company']}")
+    template = load_template(template_dirs=[template_dir])
+    assert render_tex(Letter(metadata={"company": "R&D"}, content=""), template) == r"Custom letter for R\&D"
+
+    (template_dir / "letter.mako").write_text("Edited letter")
+    os.utime(template_dir / "letter.mako", (0, time.time() + 10))
+    assert load_template(template_dirs=[template_dir]).render() == "Edited letter"
+
+def test_compiled_template_is_replaced_when_contents_change(tmp_path):
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    template_path = template_dir / "letter.mako"
+    template_path.write_text("Old letter")
+    template_lookup.cache_clear()
+    assert load_template(template_dirs=[template_dir]).render() == "Old letter"
+
+    # As from an upgrade whose files keep an older modification time
+    template_path.write_text("New letter")
+    os.utime(template_path, (0, 0))
+    template_lookup.cache_clear()
+    assert load_template(template_dirs=[template_dir]).render() == "New letter"
+
+def test_merge_builds_letter_per_row(test_data):
+    merge_path = test_data / "recipients.csv"
+    merge_path.write_text("company,recipient,output\n"
+                          "Acme & Co.,Jane Doe,\n"
+                          "Acme & Co.,,\n"
+                          "Initech,Bill,initech-letter\n")
+    args = default_args(test_data)
+    args.merge = merge_path
+    args.jobs = 2
+    args.openpdf = False
+    stitch_letter(args)
+    acme = (test_data / "letter-acme-co.tex").read_text()
+    assert "Jane Doe" in acme and r"Acme \& Co." in acme
+    assert "Hiring Committee" in (test_data / "letter-acme-co-2.tex").read_text()
+    assert "Bill" in (test_data / "initech-letter.tex").read_text()
+    index = (test_data / "letter-merge.csv").read_text().splitlines()
+    assert len(index) == 4
+    assert all(",ok," in line for line in index[1:])
+
+def test_merge_records_failed_rows(test_data):
+    merge_path = test_data / "recipients.csv"
+    merge_path.write_text("company,signature_image\nGood,\nBad,missing.png\n")
+    args = default_args(test_data)
+    args.merge = merge_path
+    args.jobs = 1
+    args.openpdf = False
+    with pytest.raises(SystemExit):
+        stitch_letter(args)
+    assert (test_data / "letter-good.tex").exists()
+    assert not (test_data / "letter-bad.tex").exists()
+    index = (test_data / "letter-merge.csv").read_text()
+    assert "failed,Signature image not found" in index
+
+def test_merge_writes_index_to_new_output_directory(test_data):
+    merge_path = test_data / "recipients.csv"
+    merge_path.write_text("company,signature_image\nBad,missing.png\n")
+    args = default_args(test_data)
+    args.merge = merge_path
+    args.output = test_data / "letters"
+    args.jobs = 1
+    args.openpdf = False
+    with pytest.raises(SystemExit):
+        stitch_letter(args)
+    assert "failed,Signature image not found" in (test_data / "letters" / "letter-merge.csv").read_text()
+
 # --- Helper Functions --- #
 
 def default_args(dir: Path) -> argparse.Namespace:
@@ -85,7 +167,11 @@ def default_args(dir: Path) -> argparse.Namespace:
         signature = False,
         signature_image = dir / "signature.png",
         output = None,
-        pdf = False
+        pdf = False,
+        force = False,
+        cache_stats = False,
+        draft = False,
+        template_dir = None
     )
     return args
 
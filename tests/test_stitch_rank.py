@@ -0,0 +1,89 @@
+import argparse
+import logging
+
+import pytest
+
+from stitchjob.stitch_rank import *
+
+MASTER = """<resume>
+  <contact><name>Master</name><email>m@example.com</email><phone>555</phone><location>Here</location></contact>
+  <section heading="Summary"><description>Engineer who writes software.</description></section>
+  <section heading="Skills"><skills><skill>Python</skill><skill>Knitting</skill></skills></section>
+  <section heading="Experience">
+    <experience begin="2021" end="present">
+      <title>Engineer</title><organization>Acme</organization><location>Remote</location>
+      <items>
+        <item>Baked bread for the office</item>
+        <item>Built Kubernetes clusters for the data platform</item>
+        <item>Wrote Python services on Kubernetes</item>
+      </items>
+    </experience>
+  </section>
+</resume>"""
+
+POSTING = "Backend engineer: Python, Kubernetes, data platform."
+
+def test_tokenize_drops_latex_and_stopwords():
+    assert tokenize(r"Wrote \emph{C++} and C# for the 30\% speedup") == \
+        ["wrote", "c++", "c#", "30", "speedup"]
+
+def test_rank_scores_relevant_parts_higher(master, cache_home):
+    np = pytest.importorskip("numpy")
+    index = RankIndex.load(master)
+    scores = index.score(POSTING)
+    ranked = [index.texts[n] for n in np.argsort(-scores, kind="stable")]
+    assert set(ranked[:2]) == {"Built Kubernetes clusters for the data platform",
+                               "Wrote Python services on Kubernetes"}
+    assert scores[index.texts.index("Baked bread for the office")] == 0
+    assert scores[index.texts.index("Knitting")] == 0
+
+def test_rank_index_is_cached_by_content(master, cache_home):
+    pytest.importorskip("numpy")
+    RankIndex.load(master)
+    cached = list((cache_home / "stitchjob" / "rank").glob("*.npz"))
+    assert len(cached) == 1
+    master.write_text(MASTER.replace("Baked bread", "Brewed coffee"))
+    index = RankIndex.load(master)
+    assert "Brewed coffee for the office" in index.texts
+    assert len(list((cache_home / "stitchjob" / "rank").glob("*.npz"))) == 2
+
+def test_stitch_rank_keeps_best_items(master, cache_home, tmp_path, caplog):
+    pytest.importorskip("numpy")
+    caplog.set_level(logging.INFO)
+    posting = tmp_path / "acme.txt"
+    posting.write_text(POSTING)
+    stitch_rank(argparse.Namespace(posting=posting, resume=master, top=3, keep=2,
+                                   output=None, pdf=False, openpdf=False, draft=False,
+                                   force=False, precompile=False, cache_stats=False))
+    assert "Wrote Python services on Kubernetes" in caplog.text
+    tex = posting.with_suffix(".tex").read_text()
+    assert "Built Kubernetes clusters" in tex
+    assert tex.index("Built Kubernetes clusters") < tex.index("Wrote Python services")
+    assert "Baked bread" not in tex
+    assert "Knitting" in tex
+
+def test_rank_index_is_rebuilt_when_cache_is_corrupt(master, cache_home):
+    pytest.importorskip("numpy")
+    RankIndex.load(master)
+    cached, = (cache_home / "stitchjob" / "rank").glob("*.npz")
+    cached.write_bytes(cached.read_bytes()[:100])
+    index = RankIndex.load(master)
+    assert "Baked bread for the office" in index.texts
+
+def test_prune_resume_drops_experiences_left_without_items(master):
+    np = pytest.importorskip("numpy")
+    index = RankIndex.load(master)
+    resume = load_resume(master)
+    pruned = prune_resume(resume, index, np.zeros(len(index.units)), 0)
+    assert not any(isinstance(child, Experience)
+                   for section in pruned.sections for child in section.children)
+    assert any(isinstance(child, SkillSection)
+               for section in pruned.sections for child in section.children)
+
+# --- Helper Functions --- #
+
+@pytest.fixture
+def master(tmp_path):
+    path = tmp_path / "master.xml"
+    path.write_text(MASTER)
+    return path
@@ -1,3 +1,5 @@
+from dataclasses import replace
+import io
 import xml.etree.ElementTree as ET
 
 import pytest
@@ -14,6 +16,60 @@ def test_resume_with_invalid_xml(tmp_path):
     with pytest.raises(CannotParseXMLResumeError):
         resume = Resume(path)
 
+def test_contact_from_file_stops_after_contact(tmp_path):
+    path = tmp_path / "resume.xml"
+    path.write_text("<resume><contact><name>Early</name></contact><section>Oops</resume>")
+    assert Contact(path)['name'] == "Early"
+    with pytest.raises(CannotParseXMLResumeError):
+        Resume(path)
+
+def test_contact_from_file_without_contact(tmp_path):
+    path = tmp_path / "resume.xml"
+    path.write_text("<resume><section heading='Skills'/></resume>")
+    with pytest.raises(CannotParseXMLResumeError):
+        Contact(path)
+
+def test_contact_from_file_matches_resume(test_data_session):
+    path = test_data_session / "resume.xml"
+    assert Contact(path).values == Resume(path).contact.values
+
 def test_latex_class_is_accessible(test_data):
     ensure_latex_class_accessible(test_data)
-    assert (test_data / RESUME_LATEX_CLASS).exists()
\ No newline at end of file
+    assert (test_data / RESUME_LATEX_CLASS).exists()
+
+def test_write_latex_streams_same_output_as_to_latex(test_data_session):
+    resume = Resume(test_data_session / "resume.xml")
+    out = io.StringIO()
+    resume.write_latex(out)
+    assert out.getvalue() == resume.to_latex()
+    assert r"\experience{Feb. 2023 -- present}" in out.getvalue()
+
+def test_parts_compare_by_rendered_content():
+    xml = """<resume><contact><name>N</name></contact>
+      <section heading="A"><skills><skill tags="x">Python</skill></skills></section>
+      <section heading="A"><skills><skill>Python</skill></skills></section></resume>"""
+    resume = Resume.from_string(xml)
+    assert resume.sections[0] == resume.sections[1]
+    assert hash(resume.sections[0]) == hash(resume.sections[1])
+    assert resume.sections[0] is not resume.sections[1]
+
+def test_identical_fragments_are_rendered_once(test_data_session):
+    latex_fragment.cache_clear()
+    first = Resume(test_data_session / "resume.xml").to_latex()
+    misses = latex_fragment.cache_info().misses
+    second = Resume(test_data_session / "resume.xml").to_latex()
+    assert second == first
+    assert latex_fragment.cache_info().misses == misses
+    assert "hit(s)" in fragment_stats()
+
+def test_trimmed_experiences_reuse_rendered_items(test_data_session):
+    resume = Resume(test_data_session / "resume.xml")
+    experience = next(child for sec in resume.sections for child in sec.children
+                      if isinstance(child, Experience) and len(child.items) > 1)
+    experience.to_latex()
+    misses = latex_item.cache_info().misses
+    trimmed = replace(experience, items=experience.items[1:])
+    assert latex_fragment(trimmed) == experience.to_latex().replace(
+        latex_item(experience.items[0]), "")
+    assert latex_item.cache_info().misses == misses
+
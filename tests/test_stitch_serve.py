@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+from stitchjob.remote import open_connection, run_remote, send
+from stitchjob.stitch_serve import *
+
+def test_health_reports_queue_and_latency(daemon):
+    status, reply = send(open_connection(daemon), "GET", "/health")
+    assert status == 200
+    assert reply["queue_depth"] == 0
+    assert set(reply["latency_ms"]["build"]) == {"count", "p50", "p90", "p99"}
+
+def test_build_job_writes_tex(daemon, test_data):
+    status, reply = send(open_connection(daemon), "POST", "/build",
+                         {"command": "resume", "input": str(test_data / "resume.xml")})
+    assert status == 200
+    assert reply == {"tex": str(test_data / "resume.tex"), "pdf": None}
+    assert "{Graduate Assistant}{UC Berkeley Library}" in (test_data / "resume.tex").read_text()
+    _, health = send(open_connection(daemon), "GET", "/health")
+    assert health["completed"] == 1
+    assert health["latency_ms"]["build"]["count"] == 1
+
+def test_build_job_with_missing_input_fails(daemon, test_data):
+    status, reply = send(open_connection(daemon), "POST", "/build",
+                         {"command": "resume", "input": str(test_data / "missing.xml")})
+    assert status == 422
+    assert "missing.xml" in reply["error"]
+
+@pytest.mark.parametrize("extra, error", [
+    ({"signature_image": "/etc/passwd"}, "Cannot set signature_image"),
+    ({"resume": "/etc/resume.xml"}, "Not in the directory of the input"),
+    ({"output": "out/../../evil.tex"}, "Not in the directory of the input"),
+    ({"overlay": ["/tmp/evil.yml"]}, "Not in the directory of the input"),
+])
+def test_build_job_is_confined_to_input_directory(daemon, test_data, extra, error):
+    if "output" in extra:
+        extra = {"output": str(test_data / extra["output"])}
+    status, reply = send(open_connection(daemon), "POST", "/build",
+                         {"command": "resume", "input": str(test_data / "resume.xml"), **extra})
+    assert status == 422
+    assert error in reply["error"]
+    assert not (test_data.parent / "evil.tex").exists()
+
+@pytest.mark.parametrize("address, allowed", [
+    ("127.0.0.1:8765", True), ("localhost:8765", True), ("::1:8765", True),
+    ("unix:/tmp/stitch.sock", True), ("0.0.0.0:8765", False), ("example.com:80", False),
+])
+def test_check_local_address(address, allowed):
+    if allowed:
+        check_local_address(address)
+    else:
+        with pytest.raises(CannotStartServerError, match="--allow-remote"):
+            check_local_address(address)
+
+def test_render_job_returns_tex(daemon, test_data):
+    status, reply = send(open_connection(daemon), "POST", "/render",
+                         {"command": "letter", "pdf": False,
+                          "markdown": (test_data / "letter.md").read_text(),
+                          "resume_xml": (test_data / "resume.xml").read_text()})
+    assert status == 200
+    assert "Riley K. Chen" in reply["tex"]
+    assert reply["pdf"] is None
+
+def test_build_letter_uses_resume_of_job(daemon, test_data):
+    resume = test_data / "resume.xml"
+    resume.write_text(resume.read_text().replace("Riley K. Chen", "Other Person"))
+    status, reply = send(open_connection(daemon), "POST", "/build",
+                         {"command": "letter", "input": str(test_data / "letter.md"),
+                          "resume": str(resume)})
+    assert status == 200
+    assert "Other Person" in Path(reply["tex"]).read_text()
+    status, reply = send(open_connection(daemon), "POST", "/build",
+                         {"command": "letter", "input": str(test_data / "letter.md")})
+    assert status == 422
+    assert "No resume" in reply["error"]
+
+def test_render_job_rejects_template_dir(daemon, test_data):
+    status, reply = send(open_connection(daemon), "POST", "/render",
+                         {"command": "letter", "pdf": False, "template_dir": [str(test_data)],
+                          "markdown": (test_data / "letter.md").read_text(),
+                          "resume_xml": (test_data / "resume.xml").read_text()})
+    assert status == 422
+    assert "template_dir" in reply["error"]
+
+def test_remote_letter_outside_input_directory_builds_locally(daemon, test_data):
+    args = remote_args(daemon, test_data)
+    args.command, args.input = "letter", test_data / "letter.md"
+    args.resume = test_data.parent / "resume.xml"
+    assert not run_remote(args)
+
+def test_unknown_endpoint(daemon):
+    status, _ = send(open_connection(daemon), "GET", "/nowhere")
+    assert status == 404
+
+def test_parsed_resume_is_reused_until_changed(test_data):
+    server = StitchServer(workers=1)
+    path = test_data / "resume.xml"
+    resume = server.resume(path)
+    assert server.resume(path) is resume
+    path.write_text(path.read_text().replace("Riley", "Rylee"))
+    assert server.resume(path).contact["name"] == "Rylee K. Chen"
+
+def test_remote_build(daemon, test_data):
+    args = remote_args(daemon, test_data)
+    assert run_remote(args)
+    assert (test_data / "resume.tex").exists()
+
+def test_remote_builds_locally_with_unsupported_options(daemon, test_data):
+    args = remote_args(daemon, test_data)
+    args.fit_pages = 1
+    assert not run_remote(args)
+    assert not (test_data / "resume.tex").exists()
+
+def test_remote_falls_back_when_daemon_is_down(tmp_path, test_data):
+    args = remote_args(f"unix:{tmp_path / 'nobody.sock'}", test_data)
+    assert not run_remote(args)
+    assert not (test_data / "resume.tex").exists()
+
+# --- Helper Functions --- #
+
+@pytest.fixture
+def daemon(tmp_path):
+    """Run a daemon on a Unix socket in a background thread."""
+    socket_path = tmp_path / "stitch.sock"
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    future = asyncio.run_coroutine_threadsafe(
+        StitchServer(workers=2).serve(f"unix:{socket_path}"), loop)
+    deadline = time.monotonic() + 10
+    while not socket_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield f"unix:{socket_path}"
+    future.cancel()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+def remote_args(address: str, dir) -> argparse.Namespace:
+    return argparse.Namespace(remote=address, command="resume", input=dir / "resume.xml",
+                              pdf=False, openpdf=False, precompile=False, draft=False,
+                              force=False, cache_stats=False, verbose=False)
@@ -0,0 +1,77 @@
+import argparse
+import sys
+
+import pytest
+
+from stitchjob.stitch_watch import *
+
+def test_polling_watcher_detects_change(tmp_path):
+    path = tmp_path / "resume.xml"
+    path.write_text("one")
+    watcher = PollingWatcher([path], interval=0.01)
+    assert watcher.wait(0) == set()
+    path.write_text("two, longer")
+    assert watcher.wait(1) == {path}
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Requires inotify")
+def test_inotify_watcher_detects_replaced_file(tmp_path):
+    path = tmp_path / "letter.md"
+    path.write_text("one")
+    watcher = InotifyWatcher([path])
+    try:
+        (tmp_path / "unrelated.txt").write_text("ignored")
+        assert watcher.wait(0.1) == set()
+        temp = tmp_path / "letter.md.tmp"
+        temp.write_text("two")
+        temp.replace(path)
+        assert watcher.wait(1) == {path}
+    finally:
+        watcher.close()
+
+def test_debounced_changes_collects_burst(tmp_path):
+    paths = [tmp_path / "a", tmp_path / "b"]
+    for path in paths:
+        path.write_text("")
+    watcher = PollingWatcher(paths, interval=0.01)
+    for path in paths:
+        path.write_text("changed")
+    assert next(debounced_changes(watcher, 0.05)) == set(paths)
+
+def test_session_rebuilds_only_affected_outputs(test_data):
+    session = WatchSession(watch_args(test_data))
+    assert session.rebuild(session.inputs()) == {"resume", "letter"}
+    assert (test_data / "resume.tex").exists()
+    assert (test_data / "letter.tex").exists()
+
+    resume_path = test_data / "resume.xml"
+    resume_path.write_text(resume_path.read_text().replace("reducing onboarding", "cutting onboarding"))
+    assert session.rebuild([resume_path.resolve()]) == {"resume"}
+
+    resume_path.write_text(resume_path.read_text().replace("415-555-2938", "415-555-0000"))
+    assert session.rebuild([resume_path.resolve()]) == {"resume", "letter"}
+    assert "415-555-0000" in (test_data / "letter.tex").read_text()
+
+    letter_path = test_data / "letter.md"
+    assert session.rebuild([letter_path.resolve()]) == {"letter"}
+
+def test_session_survives_broken_input(test_data, caplog):
+    session = WatchSession(watch_args(test_data))
+    session.rebuild(session.inputs())
+    resume_path = test_data / "resume.xml"
+    resume_path.write_text("<resume><contact>")
+    session.rebuild([resume_path.resolve()])
+    assert "Rebuild failed" in caplog.text
+    assert session.resume is not None
+
+# --- Helper Functions --- #
+
+def watch_args(dir: Path) -> argparse.Namespace:
+    return argparse.Namespace(
+        resume = dir / "resume.xml",
+        letter = dir / "letter.md",
+        signature = False,
+        signature_image = dir / "signature.png",
+        pdf = False,
+        draft = False,
+        template_dir = None,
+    )
@@ -0,0 +1,71 @@
+import json
+import threading
+
+import pytest
+
+from stitchjob import timings
+from stitchjob.timings import *
+
+@pytest.fixture
+def recording():
+    timings.enable()
+    yield
+    timings.disable()
+
+def test_span_is_noop_when_disabled():
+    assert span("anything") is NULL_SPAN
+
+def test_nested_spans_with_same_name_are_merged(recording):
+    with span("build"):
+        for _ in range(3):
+            with span("escape"):
+                pass
+    assert [(s.path, s.count) for s in spans()] == [
+        (("build",), 1), (("build", "escape"), 3)]
+
+def test_spans_on_threads_nest_separately(recording):
+    barrier = threading.Barrier(2)
+
+    def work(name):
+        with span(name):
+            barrier.wait()
+            with span("pdflatex"):
+                barrier.wait()
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted((s.path, s.count) for s in spans()) == [
+        (("a",), 1), (("a", "pdflatex"), 1), (("b",), 1), (("b", "pdflatex"), 1)]
+
+def test_escape_tex_is_timed(recording):
+    from stitchjob.shared import escape_tex
+    with span("render"):
+        assert escape_tex("R&D") == r"R\&D"
+    assert spans()[-1].path == ("render", "escape")
+
+def test_report_indents_children(recording):
+    with span("resume"):
+        with span("parse"):
+            pass
+    lines = report().splitlines()
+    assert lines[1].startswith("  resume")
+    assert lines[2].startswith("    parse")
+
+def test_stitch_writes_timings_json_and_profile(test_data):
+    from stitchjob.stitch import main
+    from stitchjob.stitch_resume import latex_fragment, latex_item
+    # Rendered fragments of the resume may be cached by earlier tests
+    latex_fragment.cache_clear()
+    latex_item.cache_clear()
+    main(["--timings-json", str(test_data / "timings.json"),
+          "--profile", str(test_data / "stitch.prof"),
+          "resume", str(test_data / "resume.xml")])
+    data = json.loads((test_data / "timings.json").read_text())
+    paths = [s["path"] for s in data["spans"]]
+    assert "resume/parse" in paths
+    assert "resume/render/escape" in paths
+    assert (test_data / "stitch.prof").stat().st_size > 0
+    assert not timings.enabled